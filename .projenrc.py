@@ -28,7 +28,10 @@ project = PythonComponent(
     ),
     projenrc_python_options=ProjenrcOptions(projen_version=">=0.91"),
     dev_deps=[
+        "boto3",
         "pyfakefs",
+        "pytest-benchmark",
+        "pyyaml",
         "numpy",
         "hallcor.pulumi-projen-project-types",
     ],
@@ -40,7 +43,28 @@ project.test_task.prepend_exec(
     condition="if [ -d 'node_modules' ]; then exit 1; else exit 0; fi",
 )
 
+project.add_task(
+    "bench",
+    description="Run the benchmarks",
+    exec="pytest tests/benchmarks --benchmark-only",
+)
+# Timings depend on the machine, so baselines are recorded and compared
+# locally (in .benchmarks) rather than committed
+project.add_task(
+    "bench:baseline",
+    description="Record a benchmark baseline on this machine",
+    exec="pytest tests/benchmarks --benchmark-only --benchmark-save=baseline",
+)
+project.add_task(
+    "bench:compare",
+    description="Run the benchmarks and fail when they are slower than the "
+    "baseline recorded on this machine",
+    exec="pytest tests/benchmarks --benchmark-only"
+    " --benchmark-compare --benchmark-compare-fail=mean:25%",
+)
+
 project.add_git_ignore("node_modules")
+project.add_git_ignore(".benchmarks")
 project.add_git_ignore("examples/**/sdks")
 
 project.synth()
@@ -1,15 +1,27 @@
 from pulumi.provider.experimental import component_provider_host
 from pulumi_lambda_builders.build_custom import BuildCustomMake
 from pulumi_lambda_builders.build_dotnet import BuildDotnet
-from pulumi_lambda_builders.build_go import BuildGo
+from pulumi_lambda_builders.build_go import BuildGo, BuildGoHandlers
 from pulumi_lambda_builders.build_java import BuildJava
-from pulumi_lambda_builders.build_nodejs import BuildNodejs
+from pulumi_lambda_builders.build_many import BuildMany
+from pulumi_lambda_builders.build_nodejs import BuildNodejs, BuildNodejsBundle
 from pulumi_lambda_builders.build_python import BuildPython
 from pulumi_lambda_builders.build_rust import BuildRust
 from pulumi_lambda_builders.build_ruby import BuildRuby
-
+from pulumi_lambda_builders.cache import get_cache
+from pulumi_lambda_builders.scheduler import start_scheduler
 
 if __name__ == "__main__":
+    # Start the scheduler that every component submits its build to. It limits
+    # the builds running at the same time to the configured CPU and memory
+    # budgets (see PULUMI_LAMBDA_BUILDERS_CPU_BUDGET and
+    # PULUMI_LAMBDA_BUILDERS_MEMORY_BUDGET_MB).
+    start_scheduler()
+
+    # Remove what builds killed in earlier runs left in the cache, and evict
+    # entries over PULUMI_LAMBDA_BUILDERS_CACHE_MAX_SIZE_MB.
+    get_cache().collect_garbage()
+
     # Call the component provider host. This will discover any ComponentResource
     # subclasses in this package, infer their schema and host a provider that
     # allows constructing these components from a Pulumi program.
@@ -20,8 +32,11 @@ if __name__ == "__main__":
             BuildCustomMake,
             BuildDotnet,
             BuildGo,
+            BuildGoHandlers,
             BuildJava,
+            BuildMany,
             BuildNodejs,
+            BuildNodejsBundle,
             BuildPython,
             BuildRust,
             BuildRuby,
@@ -0,0 +1,6 @@
+import sys
+
+from pulumi_lambda_builders.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+# The earliest timestamp that can be stored in a zip file. Every entry uses it
+# so that rebuilding unchanged code produces a byte for byte identical zip.
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def write_zip(src_dir: str, zip_path: str) -> str:
+    """Writes the contents of src_dir to a reproducible zip file
+
+    Entries are added in sorted order with a fixed timestamp and normalized
+    permissions (0755 for executables, 0644 for everything else), so the zip
+    only changes when the content of src_dir changes. The zip is written to a
+    temporary file first and then moved to zip_path.
+
+    :param src_dir: the directory to archive
+    :param zip_path: where to write the zip file
+    :returns: zip_path
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(zip_path)), suffix=".zip.tmp"
+    )
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for rel in _sorted_files(src_dir):
+                path = os.path.join(src_dir, rel)
+                info = zipfile.ZipInfo(rel.replace(os.sep, "/"), date_time=ZIP_EPOCH)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.create_system = 3
+                mode = 0o755 if os.access(path, os.X_OK) else 0o644
+                info.external_attr = (0o100000 | mode) << 16
+                with open(path, "rb") as src, zf.open(info, "w") as dest:
+                    shutil.copyfileobj(src, dest, _CHUNK_SIZE)
+        os.replace(tmp_path, zip_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return zip_path
+
+
+def _sorted_files(root: str):
+    files = []
+    for dirpath, _, filenames in os.walk(root, followlinks=True):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path):
+                files.append(os.path.relpath(path, root))
+    return sorted(files, key=lambda p: p.replace(os.sep, "/"))
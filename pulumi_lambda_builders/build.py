@@ -0,0 +1,150 @@
+import os
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional
+
+import pulumi
+from pulumi.asset import FileArchive
+
+from pulumi_lambda_builders.cache import BuildFn, get_cache
+from pulumi_lambda_builders.scheduler import LIGHT, BuildWeight, get_scheduler
+from pulumi_lambda_builders.tracing import span
+
+
+class PreparedBuild:
+    """A build whose inputs have been validated and fingerprinted
+
+    Preparing a build is cheap: it resolves paths and hashes the inputs but
+    does not run the builder. The build itself only runs when `run` is called,
+    and not at all when the cache already contains an artifact for `key`.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        build: BuildFn,
+        zip_archive: Optional[bool] = False,
+        weight: BuildWeight = LIGHT,
+        layer: Optional["PreparedBuild"] = None,
+        dependencies: Optional["PreparedBuild"] = None,
+        workspace: Optional[str] = None,
+    ) -> None:
+        self.key = key
+        """The fingerprint of the build inputs, used as the cache key"""
+        self.zip_archive = zip_archive
+        self.weight = weight
+        """The resources the build needs, used to schedule it"""
+        self.layer = layer
+        """A separate build of the dependencies to publish as a Lambda layer"""
+        self.dependencies = dependencies
+        """The cached install of the dependencies this build uses, if any.
+        Builds with the same dependencies key share it"""
+        self.workspace = workspace
+        """The name of the cache workspace the build uses, if any. It is held
+        while the build runs, see `BuildCache.workspace`"""
+        self._build = build
+
+    def cached(self) -> Optional[FileArchive]:
+        """Returns the archive for this build if it is already in the local or
+        the remote cache"""
+        artifact_dir = get_cache().fetch(self.key)
+        if not artifact_dir:
+            return None
+        return self._archive(artifact_dir)
+
+    def run(self) -> FileArchive:
+        """Returns the archive for this build, building it on a cache miss
+
+        The builder only runs once the scheduler has capacity for its weight.
+        The workspace is locked first, so builds that wait for the workspace
+        do not hold any of the scheduler's budget.
+        """
+
+        def build(artifacts_dir: str, scratch_dir: str) -> None:
+            with ExitStack() as stack:
+                with span("queue"):
+                    if self.workspace is not None:
+                        stack.enter_context(get_cache().workspace(self.workspace))
+                    stack.enter_context(get_scheduler().reserve(self.weight))
+                with span("build"):
+                    self._build(artifacts_dir, scratch_dir)
+
+        return self._archive(get_cache().build(self.key, build))
+
+    def run_shared(self) -> FileArchive:
+        """Returns the archive for this build like `run`, for builds that other
+        builds also run from within their own build, e.g. the dependencies
+        builds with the same requirements share
+
+        Those builds wait for the key lock of this build while they hold
+        their budget, so this build reserves its budget before the cache
+        takes the key lock. In the order of `run`, each could wait for the
+        other forever once the budget is used up.
+        """
+        cache = get_cache()
+        artifact_dir = cache.lookup(self.key)
+        if artifact_dir is None:
+            with ExitStack() as stack:
+                with span("queue"):
+                    stack.enter_context(get_scheduler().reserve(self.weight))
+                with span("build"):
+                    artifact_dir = cache.build(self.key, self._build)
+        return self._archive(artifact_dir)
+
+    def asset(self) -> pulumi.Output[FileArchive]:
+        """Returns the archive for this build as a component output
+
+        The build runs on the scheduler's worker pool and the output resolves once it
+        finishes, so the components in a program build concurrently. During a
+        preview the builder is never run. The output is the cached archive if
+        there is one, and unknown otherwise.
+        """
+        if pulumi.runtime.is_dry_run():
+            cached = self.cached()
+            if cached is None:
+                return _unknown()
+            return pulumi.Output.from_input(cached)
+        return pulumi.Output.from_input(get_scheduler().run(self.run))
+
+    def _archive(self, artifact_dir: str) -> FileArchive:
+        if self.zip_archive:
+            return FileArchive(get_cache().archive(self.key))
+        return FileArchive(artifact_dir)
+
+
+class PreparedBundle(PreparedBuild):
+    """A build that produces a separate archive for each of several entries
+
+    The build writes the code of every entry to a subdirectory of the
+    artifacts directory named after the entry. `run`, `cached` and `asset`
+    return a dict of entry name to archive instead of a single archive.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        build: BuildFn,
+        entries: List[str],
+        zip_archive: Optional[bool] = False,
+        weight: BuildWeight = LIGHT,
+    ) -> None:
+        super().__init__(key, build, zip_archive, weight)
+        self.entries = entries
+        """The names of the entries, which are also their subdirectories"""
+
+    def _archive(self, artifact_dir: str) -> Dict[str, FileArchive]:  # type: ignore[override]
+        if self.zip_archive:
+            cache = get_cache()
+            return {
+                name: FileArchive(cache.archive(self.key, name))
+                for name in self.entries
+            }
+        return {
+            name: FileArchive(os.path.join(artifact_dir, name)) for name in self.entries
+        }
+
+
+def _unknown() -> pulumi.Output[Any]:
+    async def value(v: Any) -> Any:
+        return v
+
+    return pulumi.Output(set(), value(None), value(False))
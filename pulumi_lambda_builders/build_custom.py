@@ -1,13 +1,18 @@
 import pulumi
 from enum import Enum
-from typing import Optional, TypedDict
-import tempfile
+from typing import Dict, Optional, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from pulumi.asset import FileArchive
 from aws_lambda_builders.exceptions import (
     LambdaBuilderError,
 )
 
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.cache import build_key
+from pulumi_lambda_builders.fingerprint import hash_tree
+from pulumi_lambda_builders.scheduler import MEDIUM
+from pulumi_lambda_builders.tracing import span, traced
+
 
 class Architecture(Enum):
     ARM_64 = "arm64"
@@ -29,10 +34,24 @@ class BuildCustomMakeArgs(TypedDict):
     architecture: Optional[str]
     """The Lambda architecture to build for"""
 
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildCustomMake(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -41,36 +60,52 @@ class BuildCustomMake(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildCustomMake", name, {}, opts)
-        result = build_go(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_custom_make(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def build_go(args: BuildCustomMakeArgs) -> FileArchive:
+    return prepare_custom_make(args).run()
+
+
+def prepare_custom_make(args: BuildCustomMakeArgs) -> PreparedBuild:
     builder = LambdaBuilder("provided", None, None)
-    tmp_dir = tempfile.mkdtemp()
     arch = args.get("architecture") or "x86_64"
 
     # TODO: add extra validation
 
-    try:
-        builder.build(
-            source_dir=args.get("code"),
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            build_in_source=True,
-            manifest_path=None,
-            runtime="provided",
-            architecture=arch,
-            options={
-                "build_logical_id": args.get("make_target_id"),
-            },
-        )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build code: {err}")
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        try:
+            with span("compile"):
+                builder.build(
+                    source_dir=args.get("code"),
+                    artifacts_dir=artifacts_dir,
+                    scratch_dir=scratch_dir,
+                    build_in_source=True,
+                    manifest_path=None,
+                    runtime="provided",
+                    architecture=arch,
+                    options={
+                        "build_logical_id": args.get("make_target_id"),
+                    },
+                )
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build code: {err}")
 
-    return FileArchive(tmp_dir)
+    key = build_key(
+        "provided/make",
+        arch,
+        args.get("make_target_id"),
+        hash_tree(args.get("code")),
+    )
+    return PreparedBuild(key, run, args.get("zip_archive"), weight=MEDIUM)
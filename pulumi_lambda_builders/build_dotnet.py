@@ -1,19 +1,39 @@
 import pulumi
+import os
+import platform
 from enum import Enum
-from typing import Dict, Optional, TypedDict
-import tempfile
+from typing import Any, Dict, List, Optional, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from pulumi.asset import FileArchive
 from aws_lambda_builders.exceptions import (
     LambdaBuilderError,
 )
 
+from aws_lambda_builders.validator import SUPPORTED_RUNTIMES
+
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.cache import BuildCache, build_key, get_cache
+from pulumi_lambda_builders.fingerprint import hash_tree
+from pulumi_lambda_builders.scheduler import HEAVY
+from pulumi_lambda_builders.tracing import span, traced
+from pulumi_lambda_builders.utils import subprocess_environment
+
 
 class Architecture(Enum):
     ARM_64 = "arm64"
     X86_64 = "x86_64"
 
 
+class PublishMode(Enum):
+    DEFAULT = "default"
+    READY_TO_RUN = "ready_to_run"
+    NATIVE_AOT = "native_aot"
+
+
+NATIVE_AOT_RUNTIME = "provided.al2023"
+"""The Lambda runtime Native AOT functions run on"""
+
+
 class BuildDotnetArgs(TypedDict):
     code: str
     """The path to the code to build
@@ -21,7 +41,8 @@ class BuildDotnetArgs(TypedDict):
     """
 
     runtime: str
-    """Dotnet version to build dependencies for."""
+    """Dotnet version to build dependencies for. Must be `provided.al2023`
+    when publish_mode is `native_aot`"""
 
     build_options: Optional[Dict[str, str]]
     """Additional command line flags to pass to the dotnet build command
@@ -31,10 +52,37 @@ class BuildDotnetArgs(TypedDict):
     architecture: Optional[str]
     """The Lambda architecture to build for"""
 
+    publish_mode: Optional[str]
+    """How to compile the function ahead of time to reduce cold starts
+
+    - `default`: publish IL that is compiled just in time
+    - `ready_to_run`: publish ReadyToRun assemblies, which contain precompiled
+      code next to the IL
+    - `native_aot`: publish a native `bootstrap` executable for the
+      `provided.al2023` runtime. The project must set its `AssemblyName` to
+      `bootstrap`, and can only be built on a Linux machine of the same
+      architecture as the function
+    :default: default
+    """
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildDotnet(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -43,34 +91,169 @@ class BuildDotnet(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildDotnet", name, {}, opts)
-        result = build_dotnet(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_dotnet(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def build_dotnet(args: BuildDotnetArgs) -> FileArchive:
+    return prepare_dotnet(args).run()
+
+
+def prepare_dotnet(args: BuildDotnetArgs) -> PreparedBuild:
+    with span("validate_args"):
+        validate_args(args)
     builder = LambdaBuilder("dotnet", "cli-package", None)
-    tmp_dir = tempfile.mkdtemp()
     arch = args.get("architecture") or "x86_64"
+    mode = args.get("publish_mode") or PublishMode.DEFAULT.value
+    cache = get_cache()
+
+    options: Dict[str, str] = dict(args.get("build_options") or {})
+    msbuild_parameters = publish_msbuild_parameters(
+        mode, arch, options.pop("--msbuild-parameters", None)
+    )
+    if msbuild_parameters is not None:
+        options["--msbuild-parameters"] = msbuild_parameters
+    if mode == PublishMode.NATIVE_AOT.value:
+        options.setdefault("--function-runtime", NATIVE_AOT_RUNTIME)
+
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        try:
+            with span("compile"), subprocess_environment(nuget_environment(cache)):
+                builder.build(
+                    source_dir=args.get("code"),
+                    artifacts_dir=artifacts_dir,
+                    scratch_dir=scratch_dir,
+                    manifest_path=None,
+                    runtime=args.get("runtime"),
+                    architecture=arch,
+                    options=options,
+                )
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build code: {err}")
+        if mode == PublishMode.NATIVE_AOT.value and not os.path.isfile(
+            os.path.join(artifacts_dir, "bootstrap")
+        ):
+            raise ValueError(
+                "Native AOT build did not produce a bootstrap executable, "
+                "set the AssemblyName of the project to bootstrap"
+            )
+
+    key = build_key(
+        "dotnet/cli-package",
+        args.get("runtime"),
+        arch,
+        mode,
+        options,
+        hash_tree(args.get("code"), excludes=("bin", "obj")),
+    )
+    return PreparedBuild(key, run, args.get("zip_archive"), weight=HEAVY)
+
 
-    # TODO: add extra validation
-    options = args.get("build_options")
-
-    try:
-        builder.build(
-            source_dir=args.get("code"),
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            manifest_path=None,
-            runtime=args.get("runtime"),
-            architecture=arch,
-            options=options,
+def publish_msbuild_parameters(
+    mode: str, architecture: str, extra: Optional[str]
+) -> Optional[str]:
+    """Returns the `--msbuild-parameters` for a publish mode
+
+    The cli-package workflow already passes `--msbuild-parameters` to select
+    the runtime identifier. Options are appended after it and replace it, so
+    the runtime identifier is repeated here.
+    """
+    properties = {
+        PublishMode.DEFAULT.value: [],
+        PublishMode.READY_TO_RUN.value: ["/p:PublishReadyToRun=true"],
+        PublishMode.NATIVE_AOT.value: ["/p:PublishAot=true", "/p:StripSymbols=true"],
+    }[mode]
+    if not properties and extra is None:
+        return None
+    rid = "linux-arm64" if architecture == Architecture.ARM_64.value else "linux-x64"
+    return " ".join([f"--runtime {rid}", *properties, *([extra] if extra else [])])
+
+
+def nuget_environment(cache: BuildCache) -> Dict[str, str]:
+    """Returns the environment that points the NuGet global packages folder
+    into the build cache
+
+    ReadyToRun and Native AOT builds restore the runtime packs and compilers
+    for the target runtime identifier, which are shared by every project
+    through this folder. An existing NUGET_PACKAGES is kept.
+    """
+    return {"NUGET_PACKAGES": os.path.join(cache.root, "nuget")}
+
+
+def validate_args(args: BuildDotnetArgs):
+    errors: List[pulumi.InputPropertyErrorDetails] = []
+    validate_publish_mode(args, errors)
+    for error in errors:
+        print(f"Invalid argument for {error['property_path']}: {error['reason']}")
+    if errors:
+        raise pulumi.InputPropertiesError("Invalid arguments", errors)
+
+
+def validate_publish_mode(
+    args: Dict[str, Any], errors: List[pulumi.InputPropertyErrorDetails]
+):
+    modes = [mode.value for mode in PublishMode]
+    mode = args.get("publish_mode") or PublishMode.DEFAULT.value
+    if mode not in modes:
+        errors.append(
+            {
+                "property_path": "publish_mode",
+                "reason": f"Publish mode must be one of {', '.join(modes)}",
+            }
         )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build code: {err}")
+        return
+
+    arch = args.get("architecture") or Architecture.X86_64.value
+    if arch not in [Architecture.ARM_64.value, Architecture.X86_64.value]:
+        errors.append(
+            {
+                "property_path": "architecture",
+                "reason": f"Architecture must be one of {Architecture.ARM_64.value}, {Architecture.X86_64.value}",
+            }
+        )
+        return
+
+    runtime = args.get("runtime")
+    if mode == PublishMode.NATIVE_AOT.value:
+        if runtime != NATIVE_AOT_RUNTIME:
+            errors.append(
+                {
+                    "property_path": "runtime",
+                    "reason": f"Runtime must be {NATIVE_AOT_RUNTIME} for Native AOT",
+                }
+            )
+        # The Native AOT compiler does not cross compile between operating
+        # systems or architectures
+        if platform.system() != "Linux" or host_architecture() != arch:
+            errors.append(
+                {
+                    "property_path": "architecture",
+                    "reason": f"Native AOT can only build for {arch} on a Linux {arch} machine",
+                }
+            )
+    else:
+        dotnet_runtimes = [r for r in SUPPORTED_RUNTIMES if r.startswith("dotnet")]
+        if runtime not in dotnet_runtimes:
+            errors.append(
+                {
+                    "property_path": "runtime",
+                    "reason": f"Runtime must be one of {', '.join(dotnet_runtimes)}",
+                }
+            )
+
 
-    return FileArchive(tmp_dir)
+def host_architecture() -> str:
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return Architecture.ARM_64.value
+    return Architecture.X86_64.value
@@ -1,7 +1,9 @@
 import pulumi
+import os
+import shutil
+import subprocess
 from enum import Enum
-from typing import Optional, TypedDict
-import tempfile
+from typing import Dict, List, Optional, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from pulumi.asset import FileArchive
 from aws_lambda_builders.exceptions import (
@@ -9,6 +11,15 @@ from aws_lambda_builders.exceptions import (
     UnsupportedArchitectureError,
 )
 
+from aws_lambda_builders.utils import get_goarch
+
+from pulumi_lambda_builders.build import PreparedBuild, PreparedBundle
+from pulumi_lambda_builders.cache import BuildCache, build_key, get_cache
+from pulumi_lambda_builders.fingerprint import hash_tree
+from pulumi_lambda_builders.scheduler import MEDIUM
+from pulumi_lambda_builders.tracing import span, traced
+from pulumi_lambda_builders.utils import subprocess_environment
+
 
 class Architecture(Enum):
     ARM_64 = "arm64"
@@ -22,10 +33,43 @@ class BuildGoArgs(TypedDict):
     architecture: Optional[str]
     """The Lambda architecture to build for"""
 
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
+
+class BuildGoHandlersArgs(TypedDict):
+    code: str
+    """The path to the Go module to build"""
+
+    handlers: Optional[List[str]]
+    """The main packages to build, relative to code, e.g. `cmd/get`. Every
+    package gets its own asset, named after the last element of its path
+    :default: every package directly below `cmd`
+    """
+
+    architecture: Optional[str]
+    """The Lambda architecture to build for"""
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of each handler as its asset
+    :default: false
+    """
+
 
 class BuildGo(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -34,36 +78,159 @@ class BuildGo(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildGo", name, {}, opts)
-        result = build_go(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_go(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
+            }
+        )
+
+
+class BuildGoHandlers(pulumi.ComponentResource):
+    """Builds several main packages of one Go module with a single `go build`
+
+    Packages shared between the handlers are only compiled once.
+    """
+
+    assets: pulumi.Output[Dict[str, FileArchive]]
+    """The built `bootstrap` of each handler, by handler name. This is unknown
+    during a preview unless the code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
+
+    def __init__(
+        self,
+        name: str,
+        args: BuildGoHandlersArgs,
+        opts: Optional[pulumi.ResourceOptions] = None,
+    ) -> None:
+        super().__init__("lambda-builders:index:BuildGoHandlers", name, {}, opts)
+        with traced(name) as trace:
+            build = prepare_go_handlers(args)
+            self.assets = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.assets.apply(lambda _: trace.totals())
+        self.register_outputs(
+            {
+                "assets": self.assets,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def build_go(args: BuildGoArgs) -> FileArchive:
+    return prepare_go(args).run()
+
+
+def prepare_go(args: BuildGoArgs) -> PreparedBuild:
     builder = LambdaBuilder("go", "modules", None)
-    tmp_dir = tempfile.mkdtemp()
     arch = args.get("architecture") or "x86_64"
+    cache = get_cache()
 
-    try:
-        builder.build(
-            source_dir=args.get("code"),
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            manifest_path=None,
-            build_in_source=True,
-            runtime="provided",
-            architecture=arch,
-        )
-    except UnsupportedArchitectureError as err:
-        print(err)
-        raise ValueError("Unsupported architecture")
-    # The only two input properties are code & architecture & lambda_builders only throws a specific
-    # error for architecture. The rest of the errors we can return as generic errors
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build Go code: {err}")
-
-    return FileArchive(tmp_dir)
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        try:
+            with span("compile"), subprocess_environment(go_environment(cache)):
+                builder.build(
+                    source_dir=args.get("code"),
+                    artifacts_dir=artifacts_dir,
+                    scratch_dir=scratch_dir,
+                    manifest_path=None,
+                    build_in_source=True,
+                    runtime="provided",
+                    architecture=arch,
+                )
+        except UnsupportedArchitectureError as err:
+            print(err)
+            raise ValueError("Unsupported architecture")
+        # The only two input properties are code & architecture & lambda_builders only throws a specific
+        # error for architecture. The rest of the errors we can return as generic errors
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build Go code: {err}")
+
+    key = build_key("go/modules", arch, hash_tree(args.get("code")))
+    return PreparedBuild(key, run, args.get("zip_archive"), weight=MEDIUM)
+
+
+def build_go_handlers(args: BuildGoHandlersArgs) -> Dict[str, FileArchive]:
+    return prepare_go_handlers(args).run()
+
+
+def prepare_go_handlers(args: BuildGoHandlersArgs) -> PreparedBundle:
+    arch = args.get("architecture") or "x86_64"
+    code = os.path.abspath(args.get("code"))
+    cache = get_cache()
+
+    handlers = args.get("handlers") or find_handlers(code)
+    if not handlers:
+        raise ValueError(f"No handlers found in {os.path.join(code, 'cmd')}")
+    names = [os.path.basename(os.path.normpath(handler)) for handler in handlers]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Handler names must be unique, got {', '.join(names)}")
+
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        go = shutil.which("go")
+        if go is None:
+            raise ValueError("Cannot find go. go must be installed to build Go code")
+        # With a directory as the output, go build writes every main package
+        # to a binary named after the package's directory
+        bin_dir = os.path.join(scratch_dir, "bin")
+        packages = [f"./{os.path.normpath(handler)}" for handler in handlers]
+        with span("compile"):
+            result = subprocess.run(
+                [go, "build", "-o", bin_dir + os.sep, *packages],
+                cwd=code,
+                env={
+                    **go_environment(cache),
+                    **os.environ,
+                    "GOOS": "linux",
+                    "GOARCH": get_goarch(arch),
+                },
+                capture_output=True,
+                text=True,
+            )
+        if result.returncode != 0:
+            raise ValueError(f"Failed to build Go code: {result.stderr.strip()}")
+        for name in names:
+            os.makedirs(os.path.join(artifacts_dir, name))
+            os.rename(
+                os.path.join(bin_dir, name),
+                os.path.join(artifacts_dir, name, "bootstrap"),
+            )
+
+    key = build_key("go/handlers", arch, sorted(handlers), hash_tree(code))
+    return PreparedBundle(key, run, names, args.get("zip_archive"), weight=MEDIUM)
+
+
+def find_handlers(code: str) -> List[str]:
+    """Returns the directories below `cmd` that contain Go files"""
+    cmd = os.path.join(code, "cmd")
+    if not os.path.isdir(cmd):
+        return []
+    return [
+        f"cmd/{name}"
+        for name in sorted(os.listdir(cmd))
+        if os.path.isdir(os.path.join(cmd, name))
+        and any(f.endswith(".go") for f in os.listdir(os.path.join(cmd, name)))
+    ]
+
+
+def go_environment(cache: BuildCache) -> Dict[str, str]:
+    """Returns the environment that points the Go build and module caches into
+    the build cache. An existing GOCACHE or GOMODCACHE is kept"""
+    return {
+        "GOCACHE": os.path.join(cache.root, "go", "build"),
+        "GOMODCACHE": os.path.join(cache.root, "go", "mod"),
+    }
@@ -1,14 +1,26 @@
 import pulumi
 import os
+import shutil
 from enum import Enum
-from typing import Optional, TypedDict
-import tempfile
+from typing import Dict, Optional, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from pulumi.asset import FileArchive
 from aws_lambda_builders.exceptions import (
     LambdaBuilderError,
 )
 
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.cache import build_key, get_cache
+from pulumi_lambda_builders.fingerprint import fingerprint, hash_tree
+from pulumi_lambda_builders.java import (
+    dependencies_digest,
+    is_unresolved_dependency,
+    launcher_search_paths,
+    remove_stale_gradle_output,
+)
+from pulumi_lambda_builders.scheduler import HEAVY
+from pulumi_lambda_builders.tracing import span, traced
+
 
 class Architecture(Enum):
     ARM_64 = "arm64"
@@ -28,10 +40,31 @@ class BuildJavaArgs(TypedDict):
     :default: x86_64
     """
 
+    offline: Optional[bool]
+    """Build without network access, using only dependencies that have already
+    been downloaded
+    :default: enabled once a build has resolved the dependencies declared in
+    the current build files, and retried online if the offline build fails
+    """
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildJava(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -40,17 +73,25 @@ class BuildJava(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildJava", name, {}, opts)
-        result = build_java(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_java(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def build_java(args: BuildJavaArgs) -> FileArchive:
-    tmp_dir = tempfile.mkdtemp()
+    return prepare_java(args).run()
+
+
+def prepare_java(args: BuildJavaArgs) -> PreparedBuild:
     arch = args.get("architecture") or "x86_64"
 
     # TODO: add extra validation
@@ -73,16 +114,74 @@ def build_java(args: BuildJavaArgs) -> FileArchive:
         )
 
     builder = LambdaBuilder("java", dependency_manager, None)
-    try:
-        builder.build(
-            source_dir=args.get("code"),
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            manifest_path=manifest_path,
-            runtime=args.get("runtime"),
-            architecture=arch,
-        )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build code: {err}")
-
-    return FileArchive(tmp_dir)
+    code = os.path.abspath(args.get("code"))
+    cache = get_cache()
+    resolved_record = build_key(
+        f"java/{dependency_manager}-resolved",
+        dependencies_digest(code, dependency_manager),
+    )
+
+    def build(artifacts_dir: str, scratch_dir: str, offline: bool) -> None:
+        try:
+            with span("compile"):
+                builder.build(
+                    source_dir=args.get("code"),
+                    artifacts_dir=artifacts_dir,
+                    scratch_dir=scratch_dir,
+                    manifest_path=manifest_path,
+                    runtime=args.get("runtime"),
+                    architecture=arch,
+                    executable_search_paths=launcher_search_paths(
+                        cache, dependency_manager, offline
+                    ),
+                )
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build code: {err}")
+
+    workspace = None
+    if dependency_manager == "gradle":
+        # Gradle keeps its build directory and project cache in the scratch
+        # directory. Reusing it between builds of the same project lets Gradle
+        # skip up to date tasks and compile incrementally.
+        workspace = f"java-gradle-{fingerprint(code)}"
+
+    def build_in_workspace(artifacts_dir: str, scratch_dir: str, offline: bool):
+        if workspace is None:
+            # The Maven workflow copies the source into the scratch directory,
+            # so reusing it would keep files that were deleted from the source
+            build(artifacts_dir, scratch_dir, offline)
+            return
+        workspace_dir = cache.workspace_path(workspace)
+        remove_stale_gradle_output(workspace_dir)
+        build(artifacts_dir, workspace_dir, offline)
+
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        offline = args.get("offline")
+        if offline is None:
+            offline = cache.load_record(resolved_record) is not None
+        try:
+            build_in_workspace(artifacts_dir, scratch_dir, offline)
+        except ValueError as err:
+            if (
+                args.get("offline") is not None
+                or not offline
+                or not is_unresolved_dependency(str(err))
+            ):
+                raise
+            # A dependency is missing even though the build files did not
+            # change, e.g. the local repository was cleaned
+            shutil.rmtree(artifacts_dir)
+            os.makedirs(artifacts_dir)
+            build_in_workspace(artifacts_dir, scratch_dir, False)
+        cache.save_record(resolved_record, {"dependency_manager": dependency_manager})
+
+    key = build_key(
+        f"java/{dependency_manager}",
+        args.get("runtime"),
+        arch,
+        os.path.basename(manifest_path),
+        hash_tree(args.get("code"), excludes=(".gradle", "build", "target")),
+    )
+    return PreparedBuild(
+        key, run, args.get("zip_archive"), weight=HEAVY, workspace=workspace
+    )
@@ -0,0 +1,244 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypedDict
+
+import pulumi
+from pulumi.asset import FileArchive
+
+from pulumi_lambda_builders.build import PreparedBuild, _unknown
+from pulumi_lambda_builders.build_nodejs import (
+    BuildNodejsArgs,
+    check_bundle_size,
+    prepare_nodejs,
+)
+from pulumi_lambda_builders.build_python import BuildPythonArgs, prepare_python
+from pulumi_lambda_builders.scheduler import get_scheduler
+from pulumi_lambda_builders.tracing import flush, span, traced
+
+
+class BuildFunctionArgs(TypedDict):
+    python: Optional[BuildPythonArgs]
+    """Build the function with BuildPython"""
+
+    nodejs: Optional[BuildNodejsArgs]
+    """Build the function with BuildNodejs"""
+
+
+class BuildManyArgs(TypedDict):
+    functions: Dict[str, BuildFunctionArgs]
+    """Map of function names to their build. Set exactly one of `python` and
+    `nodejs` for every function"""
+
+
+class BuildMany(pulumi.ComponentResource):
+    assets: pulumi.Output[Dict[str, FileArchive]]
+    """The built code asset of every function, by function name. This is
+    unknown during a preview unless every function has already been built"""
+
+    layer_assets: pulumi.Output[Dict[str, FileArchive]]
+    """The dependency layer of every Python function with
+    `dependencies_layer`, by function name"""
+
+    dependency_groups: pulumi.Output[Dict[str, List[str]]]
+    """The names of the functions that share each set of dependencies, by the
+    fingerprint of the dependencies. Every set is installed once"""
+
+    fingerprints: pulumi.Output[Dict[str, str]]
+    """The fingerprint of the build inputs of every function"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, summed over every function. Phases
+    nest, so the values overlap"""
+
+    def __init__(
+        self,
+        name: str,
+        args: BuildManyArgs,
+        opts: Optional[pulumi.ResourceOptions] = None,
+    ) -> None:
+        super().__init__("lambda-builders:index:BuildMany", name, {}, opts)
+        with traced(name) as trace:
+            batch = prepare_many(args)
+            assets = batch.assets()
+        self.assets = assets.apply(lambda a: a[0])
+        self.layer_assets = assets.apply(lambda a: a[1])
+        self.dependency_groups = pulumi.Output.from_input(batch.dependency_groups())
+        self.fingerprints = pulumi.Output.from_input(
+            {name: build.key for name, build in batch.builds.items()}
+        )
+        self.timings = assets.apply(lambda _: trace.totals())
+        self.register_outputs(
+            {
+                "assets": self.assets,
+                "layer_assets": self.layer_assets,
+                "dependency_groups": self.dependency_groups,
+                "fingerprints": self.fingerprints,
+                "timings": self.timings,
+            }
+        )
+
+
+Archives = Tuple[Dict[str, FileArchive], Dict[str, FileArchive]]
+"""The code archives and the layer archives of a batch, by function name"""
+
+
+class PreparedBatch:
+    """The prepared builds of many functions, grouped by their dependencies
+
+    Every distinct set of dependencies is installed once, before the builds
+    that use it start. The groups build in parallel on the scheduler.
+    """
+
+    def __init__(
+        self, builds: Dict[str, PreparedBuild], functions: Dict[str, BuildFunctionArgs]
+    ) -> None:
+        self.builds = builds
+        self.functions = functions
+
+    def groups(self) -> List[Tuple[Optional[PreparedBuild], List[str]]]:
+        """Returns the shared dependency build of every group and the names of
+        its functions. Functions without cached dependencies form one group
+        without a dependency build"""
+        groups: Dict[Optional[str], Tuple[Optional[PreparedBuild], List[str]]] = {}
+        for name, build in self.builds.items():
+            key = build.dependencies.key if build.dependencies else None
+            groups.setdefault(key, (build.dependencies, []))[1].append(name)
+        return list(groups.values())
+
+    def dependency_groups(self) -> Dict[str, List[str]]:
+        return {
+            dependencies.key: names
+            for dependencies, names in self.groups()
+            if dependencies is not None
+        }
+
+    def run(self) -> Archives:
+        """Builds every function and returns their archives"""
+        return asyncio.run(self.run_async())
+
+    def run_async(self) -> Awaitable[Archives]:
+        # The builds are submitted from the coroutine, so keep the context of
+        # the caller (e.g. the current build trace) for them
+        context = contextvars.copy_context()
+        scheduler = get_scheduler()
+
+        def submit(fn: Any) -> Awaitable[Any]:
+            return context.run(scheduler.run, fn)
+
+        async def run_group(
+            dependencies: Optional[PreparedBuild], names: List[str]
+        ) -> List[Tuple[str, FileArchive, Optional[FileArchive]]]:
+            if dependencies is not None:
+                await submit(dependencies.run_shared)
+            return await asyncio.gather(
+                *(submit(lambda name=name: self._run_function(name)) for name in names)
+            )
+
+        async def run_all() -> Archives:
+            try:
+                results = await asyncio.gather(
+                    *(
+                        run_group(dependencies, names)
+                        for dependencies, names in self.groups()
+                    )
+                )
+            finally:
+                # Write the trace of the whole batch at once
+                flush()
+            assets: Dict[str, FileArchive] = {}
+            layers: Dict[str, FileArchive] = {}
+            for group in results:
+                for name, asset, layer in group:
+                    assets[name] = asset
+                    if layer is not None:
+                        layers[name] = layer
+            return (
+                {name: assets[name] for name in self.builds},
+                {name: layers[name] for name in self.builds if name in layers},
+            )
+
+        return run_all()
+
+    def cached(self) -> Optional[Archives]:
+        """Returns the archives if every function is already in the cache"""
+        assets: Dict[str, FileArchive] = {}
+        layers: Dict[str, FileArchive] = {}
+        for name, build in self.builds.items():
+            asset = build.cached()
+            if asset is None:
+                return None
+            assets[name] = asset
+            if build.layer is not None:
+                layer = build.layer.cached()
+                if layer is None:
+                    return None
+                layers[name] = layer
+        return assets, layers
+
+    def assets(self) -> pulumi.Output[Archives]:
+        """Returns the archives as a component output
+
+        As with a single build, nothing is built during a preview.
+        """
+        if pulumi.runtime.is_dry_run():
+            cached = self.cached()
+            if cached is None:
+                return _unknown()
+            return pulumi.Output.from_input(cached)
+        return pulumi.Output.from_input(self.run_async())
+
+    def _run_function(
+        self, name: str
+    ) -> Tuple[str, FileArchive, Optional[FileArchive]]:
+        build = self.builds[name]
+        asset = build.run()
+        layer = build.layer.run() if build.layer is not None else None
+        nodejs = self.functions[name].get("nodejs")
+        if nodejs is not None:
+            check_bundle_size(nodejs, build.key)
+        return name, asset, layer
+
+
+def validate_args(args: BuildManyArgs):
+    errors: List[pulumi.InputPropertyErrorDetails] = []
+    functions = args.get("functions") or {}
+    if not functions:
+        errors.append(
+            {
+                "property_path": "functions",
+                "reason": "At least one function is required",
+            }
+        )
+    for name, function in functions.items():
+        languages = [k for k in ["python", "nodejs"] if function.get(k) is not None]
+        if len(languages) != 1:
+            errors.append(
+                {
+                    "property_path": f"functions.{name}",
+                    "reason": "Exactly one of python and nodejs must be set",
+                }
+            )
+
+    for error in errors:
+        print(f"Invalid argument for {error['property_path']}: {error['reason']}")
+    if errors.__len__() > 0:
+        raise pulumi.InputPropertiesError("Invalid arguments", errors)
+
+
+def build_many(args: BuildManyArgs) -> Dict[str, FileArchive]:
+    return prepare_many(args).run()[0]
+
+
+def prepare_many(args: BuildManyArgs) -> PreparedBatch:
+    with span("validate_args"):
+        validate_args(args)
+    functions = args.get("functions")
+    builds: Dict[str, PreparedBuild] = {}
+    for name, function in functions.items():
+        python = function.get("python")
+        nodejs = function.get("nodejs")
+        if python is not None:
+            builds[name] = prepare_python(python)
+        elif nodejs is not None:
+            builds[name] = prepare_nodejs(nodejs)
+    return PreparedBatch(builds, functions)
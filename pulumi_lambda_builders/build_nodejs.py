@@ -1,9 +1,11 @@
 import pulumi
 from enum import Enum
+import json
 import os
 import re
-from typing import Optional, Optional, List, TypedDict
-import tempfile
+import shutil
+import time
+from typing import Any, Dict, Optional, List, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from aws_lambda_builders.validator import SUPPORTED_RUNTIMES
 from pulumi.asset import FileArchive
@@ -11,7 +13,36 @@ from aws_lambda_builders.exceptions import (
     LambdaBuilderError,
 )
 
-from pulumi_lambda_builders.utils import find_up
+from pulumi_lambda_builders.build import PreparedBuild, PreparedBundle
+from pulumi_lambda_builders.cache import (
+    BuildCache,
+    build_key,
+    entry_record,
+    get_cache,
+)
+from pulumi_lambda_builders.esbuild import (
+    METAFILE_NAME,
+    bundle_sizes,
+    entry_outputs,
+    inputs_unchanged,
+    metafile_inputs,
+    read_metafile,
+    snapshot_inputs,
+)
+from pulumi_lambda_builders.fingerprint import hash_optional_file, hash_tree
+from pulumi_lambda_builders.npm import (
+    can_cache_node_modules,
+    install_node_modules,
+    node_modules_installer,
+    node_modules_key,
+)
+from pulumi_lambda_builders.scheduler import LIGHT
+from pulumi_lambda_builders.tracing import span, traced
+from pulumi_lambda_builders.discovery import find_manifest
+
+PROJECT_CONFIG_FILES = ["package.json", "package-lock.json", "tsconfig.json"]
+"""Files in the project directory that change the bundle without being listed
+as an input in esbuild's metafile"""
 
 
 class Architecture(Enum):
@@ -68,10 +99,41 @@ class BuildNodejsArgs(TypedDict):
     :default: The target is determined from the runtime
     """
 
+    max_bundle_size: Optional[int]
+    """The maximum size of the bundle in bytes, without source maps. The
+    build fails when the bundle is larger, listing the largest packages in it
+    """
+
+    bundle_report_path: Optional[str]
+    """Path to write a JSON report of the bundle size to, with the size of
+    every output file and the bytes each package contributed
+    """
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildNodejs(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
+
+    bundle_size: pulumi.Output[int]
+    """The size of the bundle in bytes, without source maps"""
+
+    package_sizes: pulumi.Output[Dict[str, int]]
+    """The bytes each npm package contributed to the bundle. The project's
+    own code is listed as '.'"""
 
     def __init__(
         self,
@@ -80,18 +142,170 @@ class BuildNodejs(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildNodejs", name, {}, opts)
-
-        result = build_nodejs(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_nodejs(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
+        sizes = self.asset.apply(lambda _: check_bundle_size(args, build.key))
+        self.bundle_size = sizes.apply(lambda s: s["bundle_size"])
+        self.package_sizes = sizes.apply(lambda s: s["packages"])
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
+                "bundle_size": self.bundle_size,
+                "package_sizes": self.package_sizes,
+            }
+        )
+
+
+class BuildNodejsBundleArgs(TypedDict):
+    entries: Dict[str, str]
+    """Map of entry names to the path of their entry file (JavaScript or
+    TypeScript). Every entry gets its own asset with the same name. Names may
+    only contain letters, digits, '_', '-' and '.'
+    """
+
+    runtime: str
+    """Node.js version to build dependencies for."""
+
+    package_json_path: Optional[str]
+    """Path to the package.json file to use for installing dependencies
+    :default: the path is found by walking up parent directories searching for
+    a package.json file
+    """
+
+    node_modules_path: Optional[str]
+    """Path to the node_modules directory.
+    :default: The path will be assumed to be in the same directory as the package-lock.json file
+    """
+
+    external: Optional[List[str]]
+    """Specifies the list of packages to omit from the build
+    :default: ["@aws-sdk/*", "@smithy/*"]
+    """
+
+    architecture: Optional[str]
+    """The Lambda architecture to build for"""
+
+    minify: Optional[bool]
+    """Whether to minify the output"""
+
+    format: Optional[str]
+    """This sets the output format for the generated JavaScript files.
+    There are currently three possible values that can be configured: iife, cjs, and esm.
+    """
+
+    target: Optional[str]
+    """This sets the target environment for the generated JavaScript files.
+    :default: The target is determined from the runtime
+    """
+
+    splitting: Optional[bool]
+    """Move code shared between entries into separate chunks instead of
+    duplicating it in every entry. Each asset includes the chunks its entry
+    imports. Only supported with the 'esm' format
+    :default: false
+    """
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of each entry as its asset
+    :default: false
+    """
+
+
+class BuildNodejsBundle(pulumi.ComponentResource):
+    """Bundles several entries of one package in a single esbuild run
+
+    Modules shared between the entries, including node_modules, are only
+    parsed once instead of once per entry.
+    """
+
+    assets: pulumi.Output[Dict[str, FileArchive]]
+    """The built code asset of each entry, by entry name. This is unknown
+    during a preview unless the code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
+
+    def __init__(
+        self,
+        name: str,
+        args: BuildNodejsBundleArgs,
+        opts: Optional[pulumi.ResourceOptions] = None,
+    ) -> None:
+        super().__init__("lambda-builders:index:BuildNodejsBundle", name, {}, opts)
+        with traced(name) as trace:
+            build = prepare_nodejs_bundle(args)
+            self.assets = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.assets.apply(lambda _: trace.totals())
+        self.register_outputs(
+            {
+                "assets": self.assets,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def validate_args(args: BuildNodejsArgs):
     errors: List[pulumi.InputPropertyErrorDetails] = []
+    validate_runtime_and_architecture(args, errors)
+    validate_entry(args.get("entry"), "entry", errors)
+    max_bundle_size = args.get("max_bundle_size")
+    if max_bundle_size is not None and max_bundle_size <= 0:
+        errors.append(
+            {
+                "property_path": "max_bundle_size",
+                "reason": "Max bundle size must be a positive number of bytes",
+            }
+        )
+    raise_errors(errors)
+
+
+def validate_bundle_args(args: BuildNodejsBundleArgs):
+    errors: List[pulumi.InputPropertyErrorDetails] = []
+    validate_runtime_and_architecture(args, errors)
+
+    entries = args.get("entries") or {}
+    if not entries:
+        errors.append(
+            {
+                "property_path": "entries",
+                "reason": "At least one entry is required",
+            }
+        )
+    for name, entry in entries.items():
+        if not re.match(r"^[\w.-]+$", name) or name in (".", ".."):
+            errors.append(
+                {
+                    "property_path": f"entries.{name}",
+                    "reason": "Entry names may only contain letters, digits, '_', '-' and '.'",
+                }
+            )
+        validate_entry(entry, f"entries.{name}", errors)
+
+    if args.get("splitting") and args.get("format") != "esm":
+        errors.append(
+            {
+                "property_path": "splitting",
+                "reason": "Code splitting is only supported with the 'esm' format",
+            }
+        )
+    raise_errors(errors)
+
+
+def validate_runtime_and_architecture(
+    args: Dict[str, Any], errors: List[pulumi.InputPropertyErrorDetails]
+):
     nodejs_runtimes = [
         runtime
         for runtime in SUPPORTED_RUNTIMES
@@ -118,21 +332,27 @@ def validate_args(args: BuildNodejsArgs):
                 }
             )
 
-    if not re.search(r"\.(js|ts)$", args.get("entry")):
+
+def validate_entry(
+    entry: str, property_path: str, errors: List[pulumi.InputPropertyErrorDetails]
+):
+    if not re.search(r"\.(js|ts)$", entry):
         errors.append(
             {
-                "property_path": "entry",
+                "property_path": property_path,
                 "reason": "Entry file must be a JavaScript or TypeScript file",
             }
         )
-    if not os.path.exists(os.path.abspath(args.get("entry"))):
+    if not os.path.exists(os.path.abspath(entry)):
         errors.append(
             {
-                "property_path": "entry",
-                "reason": f"Cannot find entry file at {args.get('entry')}",
+                "property_path": property_path,
+                "reason": f"Cannot find entry file at {entry}",
             }
         )
 
+
+def raise_errors(errors: List[pulumi.InputPropertyErrorDetails]):
     for error in errors:
         print(f"Invalid argument for {error['property_path']}: {error['reason']}")
     if errors.__len__() > 0:
@@ -140,25 +360,51 @@ def validate_args(args: BuildNodejsArgs):
 
 
 def build_nodejs(args: BuildNodejsArgs) -> FileArchive:
-    tmp_dir = tempfile.mkdtemp()
+    build = prepare_nodejs(args)
+    archive = build.run()
+    check_bundle_size(args, build.key)
+    return archive
+
+
+def build_nodejs_bundle(args: BuildNodejsBundleArgs) -> Dict[str, FileArchive]:
+    return prepare_nodejs_bundle(args).run()
+
 
+def prepare_nodejs(args: BuildNodejsArgs) -> PreparedBuild:
     args["architecture"] = args.get("architecture") or Architecture.X86_64.value
+    with span("validate_args"):
+        validate_args(args)
+    return prepare_esbuild(args, {"": args.get("entry")})
+
+
+def prepare_nodejs_bundle(args: BuildNodejsBundleArgs) -> PreparedBundle:
+    args["architecture"] = args.get("architecture") or Architecture.X86_64.value
+    with span("validate_args"):
+        validate_bundle_args(args)
+    return prepare_esbuild(args, args.get("entries"))  # type: ignore[return-value]
+
 
+def prepare_esbuild(args: Dict[str, Any], entries: Dict[str, str]) -> PreparedBuild:
+    """Prepares a single esbuild run that bundles every entry
+
+    With a single unnamed entry ("") the bundle is written straight to the
+    artifacts directory. Otherwise every entry's output, and the chunks it
+    imports, are copied to a subdirectory named after the entry.
+    """
     default_externals = ["@aws-sdk/*", "@smithy/*"]
     externals = args.get("external") or default_externals
 
-    validate_args(args)
-
-    manifest_file = find_lock_file(args.get("package_json_path"))
+    with span("find_manifest"):
+        manifest_file = find_lock_file(args.get("package_json_path"))
     if not manifest_file:
         raise pulumi.InputPropertyError(
             "lock_file_path",
             "Cannot find package.json file. Please provide the path to the file",
         )
     project_dir = os.path.dirname(manifest_file)
-    relative_entry_path = os.path.relpath(
-        os.path.abspath(args.get("entry")), project_dir
-    )
+    names = sorted(entries)
+    entry_paths = {name: os.path.abspath(entries[name]) for name in names}
+    bundle = names != [""]
 
     target = args.get("target")
     if not target:
@@ -177,8 +423,17 @@ def build_nodejs(args: BuildNodejsArgs) -> FileArchive:
     if os.path.exists(node_modules_path):
         download_dependencies = False
 
-    options = {
-        "entry_points": [relative_entry_path],
+    # Install from the node_modules cache instead of running npm ci in place
+    install_from_cache = download_dependencies and can_cache_node_modules(
+        os.path.join(project_dir, "package-lock.json")
+    )
+    if install_from_cache:
+        download_dependencies = False
+
+    options: Dict[str, Any] = {
+        "entry_points": [
+            os.path.relpath(entry_paths[name], project_dir) for name in names
+        ],
         "external": externals,
         "minify": args.get("minify") or True,
         "format": args.get("format") or "cjs",
@@ -186,7 +441,7 @@ def build_nodejs(args: BuildNodejsArgs) -> FileArchive:
     }
 
     if download_dependencies == True:
-        found = find_up("package-lock.json", os.getcwd())
+        found = find_manifest("package-lock.json", os.getcwd())
         if found is None:
             pulumi.warn(
                 "node_modules not found and package-lock.json not found, installing dependencies using npm install --production"
@@ -196,25 +451,199 @@ def build_nodejs(args: BuildNodejsArgs) -> FileArchive:
     if args.get("format") == "esm":
         options["out_extensions"] = [".js=.mjs"]
 
+    if args.get("splitting"):
+        options["splitting"] = True
+
     builder = LambdaBuilder("nodejs", "npm-esbuild", None)
-    try:
-        builder.build(
-            source_dir=project_dir,
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            manifest_path=manifest_file,
-            download_dependencies=download_dependencies,
-            dependencies_dir=node_modules_path,
-            # TODO: I think this is what we want, but do we let the user config?
-            build_in_source=True,
-            runtime=args.get("runtime"),
-            architecture=args.get("architecture") or Architecture.X86_64.value,
-            options=options,
+    builder_id = "nodejs/npm-esbuild-bundle" if bundle else "nodejs/npm-esbuild"
+    cache = get_cache()
+    inputs_record = build_key(
+        f"{builder_id}-inputs",
+        args.get("runtime"),
+        args.get("architecture"),
+        options,
+        names,
+        project_dir,
+        [
+            hash_optional_file(os.path.join(project_dir, name))
+            for name in PROJECT_CONFIG_FILES
+        ],
+    )
+
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        metafile = os.path.join(scratch_dir, METAFILE_NAME)
+        outdir = os.path.join(scratch_dir, "out") if bundle else artifacts_dir
+        started = time.time_ns()
+        if install_from_cache and not os.path.isdir(node_modules_path):
+            with span("install_dependencies"):
+                install_node_modules(
+                    cache, project_dir, node_modules_path, args.get("architecture")
+                )
+        try:
+            with span("bundle"):
+                builder.build(
+                    source_dir=project_dir,
+                    artifacts_dir=outdir,
+                    scratch_dir=scratch_dir,
+                    manifest_path=manifest_file,
+                    download_dependencies=download_dependencies,
+                    dependencies_dir=node_modules_path,
+                    # TODO: I think this is what we want, but do we let the user config?
+                    build_in_source=True,
+                    runtime=args.get("runtime"),
+                    architecture=args.get("architecture") or Architecture.X86_64.value,
+                    options={**options, "metafile": metafile},
+                )
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build Nodejs code: {err}")
+        if bundle:
+            with span("copy"):
+                split_bundle(
+                    read_metafile(metafile),
+                    project_dir,
+                    outdir,
+                    artifacts_dir,
+                    entry_paths,
+                )
+        elif os.path.isfile(metafile):
+            cache.save_record(
+                bundle_size_record(key),
+                bundle_sizes(read_metafile(metafile), project_dir, outdir),
+                shared=True,
+            )
+        record_inputs(cache, inputs_record, key, metafile, project_dir, started)
+
+    with span("check_inputs"):
+        key = previous_build(cache, inputs_record)
+    if key is None:
+        key = build_key(
+            builder_id,
+            args.get("runtime"),
+            args.get("architecture"),
+            options,
+            names,
+            hash_tree(project_dir),
+        )
+    if bundle:
+        return PreparedBundle(key, run, names, args.get("zip_archive"), weight=LIGHT)
+    dependencies = None
+    if install_from_cache:
+        dependencies = PreparedBuild(
+            node_modules_key(project_dir, args.get("architecture")),
+            node_modules_installer(project_dir),
+            weight=LIGHT,
+        )
+    return PreparedBuild(
+        key, run, args.get("zip_archive"), weight=LIGHT, dependencies=dependencies
+    )
+
+
+def split_bundle(
+    metafile: Dict[str, Any],
+    project_dir: str,
+    outdir: str,
+    artifacts_dir: str,
+    entry_paths: Dict[str, str],
+) -> None:
+    """Copies the output of each entry to a subdirectory of artifacts_dir"""
+    outputs = entry_outputs(metafile, project_dir, outdir)
+    for name, entry_path in entry_paths.items():
+        files = outputs.get(os.path.normpath(entry_path))
+        if not files:
+            raise ValueError(f"esbuild did not produce an output for entry {name}")
+        for rel in files:
+            dest = os.path.join(artifacts_dir, name, rel)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(os.path.join(outdir, rel), dest)
+
+
+def bundle_size_record(key: str) -> str:
+    return entry_record(key, "nodejs-bundle-size")
+
+
+def check_bundle_size(args: BuildNodejsArgs, key: str) -> Dict[str, Any]:
+    """Returns the size report of a build and enforces max_bundle_size
+
+    The report is recorded from esbuild's metafile when the bundle is built,
+    and shared through the remote cache along with the entry, so it is
+    available for cached builds as well. The report is also written to
+    bundle_report_path when it is set.
+    """
+    cache = get_cache()
+    sizes = cache.load_record(bundle_size_record(key), shared=True)
+    if sizes is None:
+        # Built without a metafile, only the total size is known
+        artifact_dir = cache.lookup(key)
+        if not artifact_dir:
+            raise ValueError(f"No build artifact found for {key}")
+        outputs = {
+            os.path.relpath(os.path.join(root, name), artifact_dir): os.path.getsize(
+                os.path.join(root, name)
+            )
+            for root, _, files in os.walk(artifact_dir)
+            for name in files
+            if not name.endswith(".map")
+        }
+        sizes = {
+            "bundle_size": sum(outputs.values()),
+            "outputs": outputs,
+            "packages": {},
+        }
+    # Records are stored with sorted keys, list the largest packages first
+    sizes["packages"] = dict(
+        sorted(sizes["packages"].items(), key=lambda p: (-p[1], p[0]))
+    )
+
+    report_path = args.get("bundle_report_path")
+    if report_path:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(sizes, f, indent=2)
+
+    max_bundle_size = args.get("max_bundle_size")
+    if max_bundle_size is not None and sizes["bundle_size"] > max_bundle_size:
+        largest = ", ".join(
+            f"{name} ({size} bytes)"
+            for name, size in list(sizes["packages"].items())[:5]
         )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build Nodejs code: {err}")
+        raise ValueError(
+            f"Bundle of {args.get('entry')} is {sizes['bundle_size']} bytes, "
+            f"which exceeds max_bundle_size of {max_bundle_size} bytes. "
+            f"Largest packages: {largest or 'unknown'}"
+        )
+    return sizes
+
 
-    return FileArchive(tmp_dir)
+def previous_build(cache: BuildCache, inputs_record: str) -> Optional[str]:
+    """Returns the key of the last build if none of the files it read changed
+
+    After every build the input files listed in esbuild's metafile are
+    recorded. When they are all unchanged the bundle would be identical, so
+    the last build is reused without hashing the rest of the project.
+    """
+    record = cache.load_record(inputs_record)
+    if not record or not cache.lookup(record["key"]):
+        return None
+    if not inputs_unchanged(record["inputs"]):
+        return None
+    return record["key"]
+
+
+def record_inputs(
+    cache: BuildCache,
+    inputs_record: str,
+    key: str,
+    metafile: str,
+    project_dir: str,
+    started: int,
+) -> None:
+    if not os.path.isfile(metafile):
+        return
+    snapshot = snapshot_inputs(metafile_inputs(read_metafile(metafile), project_dir))
+    # A file written while esbuild was running may not match what it bundled
+    if any(mtime_ns >= started for _, mtime_ns, _ in snapshot.values()):
+        return
+    cache.save_record(inputs_record, {"key": key, "inputs": snapshot})
 
 
 def find_lock_file(lock_file_path: Optional[str]) -> Optional[str]:
@@ -230,4 +659,4 @@ def find_lock_file(lock_file_path: Optional[str]) -> Optional[str]:
                 f"Lock file path must be a file, got {lock_file_path}",
             )
         return lock_file_path
-    return find_up("package.json", os.getcwd())
+    return find_manifest("package.json", os.getcwd())
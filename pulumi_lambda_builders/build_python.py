@@ -1,17 +1,25 @@
 import pulumi
 from enum import Enum
 import os
-from typing import List, Optional, TypedDict
-import tempfile
+import shutil
+from typing import Dict, List, Optional, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from pulumi.asset import FileArchive
-from pulumi.log import warn
+from pulumi.log import info, warn
 from aws_lambda_builders.validator import SUPPORTED_RUNTIMES
 from aws_lambda_builders.exceptions import (
     LambdaBuilderError,
 )
 
-from pulumi_lambda_builders.utils import find_up
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.bytecode import compile_bytecode
+from pulumi_lambda_builders.cache import BuildCache, build_key, get_cache
+from pulumi_lambda_builders.fingerprint import hash_optional_file, hash_tree
+from pulumi_lambda_builders.scheduler import LIGHT
+from pulumi_lambda_builders.slim import RUNTIME_PROVIDED_PACKAGES, slim_dependencies
+from pulumi_lambda_builders.tracing import span, traced
+from pulumi_lambda_builders.discovery import find_manifest
+from pulumi_lambda_builders.utils import subprocess_environment
 
 
 class Architecture(Enum):
@@ -35,10 +43,64 @@ class BuildPythonArgs(TypedDict):
     """Path to the requirements.txt file to inspect for a list of dependencies"""
     """Path to the requirements.txt file to inspect for a list of dependencies"""
 
+    dependencies_layer: Optional[bool]
+    """Build the requirements into a separate `layer_asset` laid out for a
+    Lambda layer (under `python/`) and leave them out of `asset`. The layer
+    only changes when requirements.txt changes
+    :default: false
+    """
+
+    slim_dependencies: Optional[bool]
+    """Remove files the function does not need from the installed
+    requirements: the packages the runtime provides (see
+    `provided_packages`), test and documentation directories, `__pycache__`,
+    dist-info RECORD files and the debug symbols of native extensions. The
+    number of bytes removed is logged
+    :default: false
+    """
+
+    provided_packages: Optional[List[str]]
+    """The packages `slim_dependencies` removes because the runtime already
+    provides them
+    :default: ["boto3", "botocore", "s3transfer"]
+    """
+
+    compile_bytecode: Optional[bool]
+    """Compile the code and the requirements to bytecode for the runtime's
+    Python version, so cold starts do not compile them. The interpreter of
+    the runtime (e.g. `python3.12`) must be installed
+    :default: false
+    """
+
+    strip_sources: Optional[bool]
+    """Remove the `.py` files that were compiled to bytecode. Requires
+    `compile_bytecode`. Packages that read their own source files at runtime
+    do not work without them
+    :default: false
+    """
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildPython(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    layer_asset: Optional[pulumi.Output[FileArchive]]
+    """The installed requirements laid out for a Lambda layer. Only set when
+    `dependencies_layer` is enabled and a requirements.txt was found"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -47,11 +109,20 @@ class BuildPython(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildPython", name, {}, opts)
-        result = build_python(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_python(args)
+            self.asset = build.asset()
+            self.layer_asset = build.layer.asset() if build.layer else None
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = pulumi.Output.all(self.asset, self.layer_asset).apply(
+            lambda _: trace.totals()
+        )
         self.register_outputs(
             {
                 "asset": self.asset,
+                "layer_asset": self.layer_asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
@@ -90,6 +161,14 @@ def validate_args(args: BuildPythonArgs):
                 }
             )
 
+    if args.get("strip_sources") and not args.get("compile_bytecode"):
+        errors.append(
+            {
+                "property_path": "strip_sources",
+                "reason": "Stripping sources requires compile_bytecode",
+            }
+        )
+
     for error in errors:
         print(f"Invalid argument for {error['property_path']}: {error['reason']}")
     if errors.__len__() > 0:
@@ -97,20 +176,25 @@ def validate_args(args: BuildPythonArgs):
 
 
 def build_python(args: BuildPythonArgs) -> FileArchive:
+    return prepare_python(args).run()
+
+
+def prepare_python(args: BuildPythonArgs) -> PreparedBuild:
     builder = LambdaBuilder("python", "pip", None)
-    tmp_dir = tempfile.mkdtemp()
     arch = args.get("architecture") or Architecture.X86_64.value
     code = os.path.abspath(args.get("code"))
 
     args["architecture"] = arch
 
-    validate_args(args)
+    with span("validate_args"):
+        validate_args(args)
 
     req = os.path.join(code, "requirements.txt")
     if args.get("requirements_path") is not None:
         req = args.get("requirements_path")
 
-    req = find_up("requirements.txt", code)
+    with span("find_manifest"):
+        req = find_manifest("requirements.txt", code)
     if not req:
         warn(
             "requirements.txt file not found. Continuing the build without dependencies."
@@ -120,16 +204,148 @@ def build_python(args: BuildPythonArgs) -> FileArchive:
         code = os.path.dirname(code)
         warn(f"code path is not a directory, using parent directory {code} instead")
 
-    try:
-        builder.build(
-            source_dir=code,
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.mkdtemp(prefix="lambda_"),
-            manifest_path=req,
-            runtime=args.get("runtime"),
-            architecture=arch,
+    requirements_hash = hash_optional_file(req)
+    slim = None
+    if args.get("slim_dependencies"):
+        slim = sorted(args.get("provided_packages") or RUNTIME_PROVIDED_PACKAGES)
+    deps_key = build_key(
+        "python/pip-dependencies", args.get("runtime"), arch, requirements_hash, slim
+    )
+    use_layer = bool(args.get("dependencies_layer")) and requirements_hash is not None
+    bytecode = {
+        "compile": bool(args.get("compile_bytecode")),
+        "strip_sources": bool(args.get("strip_sources")),
+    }
+
+    def finish(artifacts_dir: str) -> None:
+        if bytecode["compile"]:
+            with span("compile_bytecode"):
+                compile_bytecode(
+                    args.get("runtime"), artifacts_dir, bytecode["strip_sources"]
+                )
+
+    def build(
+        artifacts_dir: str,
+        scratch_dir: str,
+        dependencies_dir: Optional[str],
+        download_dependencies: bool,
+        combine_dependencies: bool = True,
+    ) -> None:
+        # Without downloading, the builder only copies the code and the
+        # installed requirements
+        phase = "install_dependencies" if download_dependencies else "copy"
+        environment = pip_environment(get_cache()) if download_dependencies else {}
+        try:
+            with span(phase), subprocess_environment(environment):
+                builder.build(
+                    source_dir=code,
+                    artifacts_dir=artifacts_dir,
+                    scratch_dir=scratch_dir,
+                    manifest_path=req,
+                    runtime=args.get("runtime"),
+                    architecture=arch,
+                    download_dependencies=download_dependencies,
+                    dependencies_dir=dependencies_dir,
+                    combine_dependencies=combine_dependencies,
+                )
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build Python code: {err}")
+
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        install_and_build(artifacts_dir, scratch_dir)
+        finish(artifacts_dir)
+
+    def install_and_build(artifacts_dir: str, scratch_dir: str) -> None:
+        if use_layer:
+            # The requirements go into the layer, only copy the source
+            build(artifacts_dir, scratch_dir, None, False, False)
+            return
+
+        if requirements_hash is None:
+            build(artifacts_dir, scratch_dir, None, True)
+            return
+
+        # The installed requirements are cached separately from the code, so a
+        # change to the handler code only copies the cached site-packages and
+        # the source instead of running pip again.
+        cache = get_cache()
+        installed = []
+
+        def install(dependencies_dir: str, install_scratch_dir: str) -> None:
+            if slim is not None:
+                # The requirements are slimmed before they are combined
+                # with the code
+                install_dependencies(dependencies_dir, install_scratch_dir)
+                return
+            build(artifacts_dir, scratch_dir, dependencies_dir, True)
+            installed.append(dependencies_dir)
+
+        dependencies_dir = cache.build(deps_key, install)
+        if not installed:
+            build(artifacts_dir, scratch_dir, dependencies_dir, False)
+
+    def install_dependencies(dependencies_dir: str, install_scratch_dir: str) -> None:
+        # The builder always copies the source as well, keep it out of the
+        # dependencies by pointing it at a throwaway directory
+        build(
+            os.path.join(install_scratch_dir, "source"),
+            install_scratch_dir,
+            dependencies_dir,
+            True,
+            False,
+        )
+        if slim is not None:
+            with span("slim"):
+                removed = slim_dependencies(dependencies_dir, slim)
+            info(f"Slimmed the requirements by {removed} bytes")
+
+    def run_layer(artifacts_dir: str, scratch_dir: str) -> None:
+        cache = get_cache()
+        dependencies_dir = cache.build(deps_key, install_dependencies)
+        with span("copy"):
+            shutil.copytree(
+                dependencies_dir, os.path.join(artifacts_dir, "python"), symlinks=True
+            )
+        finish(artifacts_dir)
+
+    dependencies = None
+    if requirements_hash is not None:
+        dependencies = PreparedBuild(
+            deps_key,
+            install_dependencies,
+            weight=LIGHT,
+        )
+
+    layer = None
+    if use_layer:
+        layer = PreparedBuild(
+            build_key("python/pip-layer", deps_key, bytecode),
+            run_layer,
+            args.get("zip_archive"),
+            weight=LIGHT,
         )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build Python code: {err}")
 
-    return FileArchive(tmp_dir)
+    key = build_key(
+        "python/pip",
+        args.get("runtime"),
+        arch,
+        requirements_hash,
+        slim,
+        use_layer,
+        bytecode,
+        hash_tree(code),
+    )
+    return PreparedBuild(
+        key,
+        run,
+        args.get("zip_archive"),
+        weight=LIGHT,
+        layer=layer,
+        dependencies=dependencies,
+    )
+
+
+def pip_environment(cache: BuildCache) -> Dict[str, str]:
+    """Returns the environment that points pip at a wheel and HTTP cache inside
+    the build cache. An existing PIP_CACHE_DIR is kept"""
+    return {"PIP_CACHE_DIR": os.path.join(cache.root, "pip")}
@@ -1,14 +1,19 @@
 import pulumi
 from enum import Enum
 import os
-from typing import Optional, TypedDict
-import tempfile
+from typing import Dict, Optional, TypedDict
 from aws_lambda_builders.builder import LambdaBuilder
 from pulumi.asset import FileArchive
 from aws_lambda_builders.exceptions import (
     LambdaBuilderError,
 )
 
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.cache import build_key
+from pulumi_lambda_builders.fingerprint import hash_tree
+from pulumi_lambda_builders.scheduler import LIGHT
+from pulumi_lambda_builders.tracing import span, traced
+
 
 class Architecture(Enum):
     ARM_64 = "arm64"
@@ -27,10 +32,24 @@ class BuildRubyArgs(TypedDict):
     architecture: Optional[str]
     """The Lambda architecture to build for"""
 
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildRuby(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -39,32 +58,48 @@ class BuildRuby(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildRuby", name, {}, opts)
-        result = build_ruby(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_ruby(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def build_ruby(args: BuildRubyArgs) -> FileArchive:
+    return prepare_ruby(args).run()
+
+
+def prepare_ruby(args: BuildRubyArgs) -> PreparedBuild:
     builder = LambdaBuilder("ruby", "bundler", None)
-    tmp_dir = tempfile.mkdtemp()
     arch = args.get("architecture") or "x86_64"
 
     # TODO: add extra validation
 
-    try:
-        builder.build(
-            source_dir=args.get("code"),
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            manifest_path=None,
-            runtime=args.get("runtime"),
-            architecture=arch,
-        )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build code: {err}")
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        try:
+            with span("install_dependencies"):
+                builder.build(
+                    source_dir=args.get("code"),
+                    artifacts_dir=artifacts_dir,
+                    scratch_dir=scratch_dir,
+                    manifest_path=None,
+                    runtime=args.get("runtime"),
+                    architecture=arch,
+                )
+        except LambdaBuilderError as err:
+            raise ValueError(f"Failed to build code: {err}")
 
-    return FileArchive(tmp_dir)
+    key = build_key(
+        "ruby/bundler",
+        args.get("runtime"),
+        arch,
+        hash_tree(args.get("code"), excludes=(".bundle", "vendor")),
+    )
+    return PreparedBuild(key, run, args.get("zip_archive"), weight=LIGHT)
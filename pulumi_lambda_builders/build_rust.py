@@ -1,12 +1,18 @@
 import pulumi
+import json
+import os
+import shutil
+import subprocess
 from enum import Enum
-from typing import Dict, Optional, TypedDict
-import tempfile
-from aws_lambda_builders.builder import LambdaBuilder
+from typing import Dict, List, Optional, TypedDict
 from pulumi.asset import FileArchive
-from aws_lambda_builders.exceptions import (
-    LambdaBuilderError,
-)
+
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.cache import BuildCache, build_key, get_cache
+from pulumi_lambda_builders.discovery import get_manifest_index
+from pulumi_lambda_builders.fingerprint import fingerprint, hash_tree
+from pulumi_lambda_builders.scheduler import HEAVY
+from pulumi_lambda_builders.tracing import span, traced
 
 
 class Architecture(Enum):
@@ -32,10 +38,31 @@ class BuildRustArgs(TypedDict):
     """Additional flags to pass to cargo when building the code
     The keys should be prefixed with `--` (just like CLI flags)"""
 
+    compiler_cache: Optional[bool]
+    """Compile through sccache with a local disk cache in the build cache
+    directory, so crates that did not change are not compiled again even
+    after the target directory is gone. Requires sccache on the PATH
+    :default: false
+    """
+
+    zip_archive: Optional[bool]
+    """Use a reproducible zip of the built code as the asset
+    :default: false
+    """
+
 
 class BuildRust(pulumi.ComponentResource):
-    asset: FileArchive
-    """The built code asset"""
+    asset: pulumi.Output[FileArchive]
+    """The built code asset. This is unknown during a preview unless the
+    code has already been built"""
+
+    fingerprint: pulumi.Output[str]
+    """The fingerprint of the build inputs, used as the build cache key"""
+
+    timings: pulumi.Output[Dict[str, float]]
+    """Seconds spent in each build phase, e.g. `hash`, `install_dependencies`,
+    `compile` and `archive`. Phases nest, so the values overlap. This is
+    unknown during a preview unless the code has already been built"""
 
     def __init__(
         self,
@@ -44,43 +71,151 @@ class BuildRust(pulumi.ComponentResource):
         opts: Optional[pulumi.ResourceOptions] = None,
     ) -> None:
         super().__init__("lambda-builders:index:BuildRust", name, {}, opts)
-        result = build_rust(args)
-        self.asset = result
+        with traced(name) as trace:
+            build = prepare_rust(args)
+            self.asset = build.asset()
+        self.fingerprint = pulumi.Output.from_input(build.key)
+        self.timings = self.asset.apply(lambda _: trace.totals())
         self.register_outputs(
             {
                 "asset": self.asset,
+                "fingerprint": self.fingerprint,
+                "timings": self.timings,
             }
         )
 
 
 def build_rust(args: BuildRustArgs) -> FileArchive:
-    builder = LambdaBuilder("rust", "cargo", None)
-    tmp_dir = tempfile.mkdtemp()
+    return prepare_rust(args).run()
+
+
+def prepare_rust(args: BuildRustArgs) -> PreparedBuild:
     arch = args.get("architecture") or "x86_64"
 
     # TODO: add extra validation
 
-    options = {}
-    if args.get("binary_name"):
-        options["artifact_executable_name"] = args.get("binary_name")
-    if args.get("cargo_flags"):
-        options["cargo_lambda_flags"] = args.get("cargo_flags")
-
-    try:
-        builder.build(
-            source_dir=args.get("code"),
-            experimental_flags={
-                "experimentalCargoLambda": True,
-            },
-            build_in_source=True,
-            artifacts_dir=tmp_dir,
-            scratch_dir=tempfile.gettempdir(),
-            manifest_path=None,
-            runtime="provided",
-            architecture=arch,
-            options=options,
+    cache = get_cache()
+    code = os.path.abspath(args.get("code"))
+    workspace_root = find_cargo_workspace(code)
+    workspace = f"rust-{fingerprint(workspace_root, arch)}"
+
+    def run(artifacts_dir: str, scratch_dir: str) -> None:
+        cargo = shutil.which("cargo")
+        if cargo is None or shutil.which("cargo-lambda") is None:
+            raise ValueError(
+                "Cannot find cargo-lambda. cargo and cargo-lambda must be installed "
+                "to build Rust code"
+            )
+        # The workspace is locked by PreparedBuild while the build runs
+        target_dir = os.environ.get("CARGO_TARGET_DIR") or cache.workspace_path(
+            workspace
+        )
+        env = {
+            **os.environ,
+            **cargo_environment(cache, target_dir, args.get("compiler_cache")),
+        }
+        binary_name = args.get("binary_name") or find_binary_name(cargo, code, env)
+        with span("compile"):
+            result = subprocess.run(
+                cargo_lambda_command(cargo, arch, args),
+                cwd=code,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+        if result.returncode != 0:
+            raise ValueError(f"Failed to build code: {result.stderr.strip()}")
+        # Every binary of the workspace is written to the shared target/lambda
+        shutil.copy2(
+            os.path.join(target_dir, "lambda", binary_name, "bootstrap"),
+            os.path.join(artifacts_dir, "bootstrap"),
         )
-    except LambdaBuilderError as err:
-        raise ValueError(f"Failed to build code: {err}")
 
-    return FileArchive(tmp_dir)
+    key = build_key(
+        "rust/cargo",
+        arch,
+        args.get("binary_name"),
+        args.get("cargo_flags"),
+        os.path.relpath(code, workspace_root),
+        # The lock file and path dependencies live elsewhere in the workspace
+        hash_tree(workspace_root, excludes=("target",)),
+    )
+    return PreparedBuild(
+        key, run, args.get("zip_archive"), weight=HEAVY, workspace=workspace
+    )
+
+
+def cargo_lambda_command(cargo: str, arch: str, args: BuildRustArgs) -> List[str]:
+    """Returns the `cargo lambda build` command for a release build"""
+    command = [cargo, "lambda", "build", "--release"]
+    if arch == Architecture.ARM_64.value:
+        command.append("--arm64")
+    if args.get("binary_name"):
+        command.extend(["--bin", args.get("binary_name")])
+    for flag, value in (args.get("cargo_flags") or {}).items():
+        command.append(flag)
+        if value:
+            command.append(value)
+    return command
+
+
+def find_binary_name(cargo: str, code: str, env: Dict[str, str]) -> str:
+    """Returns the name of the only binary of the package at code"""
+    result = subprocess.run(
+        [cargo, "metadata", "--no-deps", "--format-version", "1"],
+        cwd=code,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise ValueError(f"Failed to read the Cargo metadata: {result.stderr.strip()}")
+    manifest = os.path.join(code, "Cargo.toml")
+    for package in json.loads(result.stdout)["packages"]:
+        if os.path.realpath(package["manifest_path"]) != os.path.realpath(manifest):
+            continue
+        binaries = [
+            target["name"] for target in package["targets"] if "bin" in target["kind"]
+        ]
+        if len(binaries) == 1:
+            return binaries[0]
+    raise ValueError(
+        f"Cannot find the binary of {code}, set binary_name to the binary to build"
+    )
+
+
+def find_cargo_workspace(code: str) -> str:
+    """Returns the root of the Cargo workspace code belongs to
+
+    This is the closest directory, starting at code, whose Cargo.toml has a
+    `[workspace]` table, or code itself for a standalone package.
+    """
+    for manifest in get_manifest_index().manifests("Cargo.toml", code):
+        with open(manifest) as f:
+            if any(line.strip() == "[workspace]" for line in f):
+                return os.path.dirname(manifest)
+    return code
+
+
+def cargo_environment(
+    cache: BuildCache, target_dir: str, compiler_cache: Optional[bool]
+) -> Dict[str, str]:
+    """Returns the variables cargo-lambda runs with in addition to os.environ
+
+    Every component building from the same workspace for the same architecture
+    shares one target directory in the build cache, so dependencies are only
+    compiled once. Each architecture gets its own directory because
+    cargo-lambda writes the binaries of every target to `target/lambda`. The
+    variables are only passed to cargo-lambda, never set for the process.
+    """
+    env = {"CARGO_TARGET_DIR": target_dir}
+    if compiler_cache:
+        sccache = shutil.which("sccache")
+        if sccache is None:
+            pulumi.warn("sccache not found, building without a compiler cache")
+        else:
+            env["RUSTC_WRAPPER"] = sccache
+            env["SCCACHE_DIR"] = os.environ.get("SCCACHE_DIR") or os.path.join(
+                cache.root, "sccache"
+            )
+    return env
@@ -0,0 +1,57 @@
+import os
+import shutil
+import subprocess
+
+
+def compile_bytecode(runtime: str, root: str, strip_sources: bool = False) -> None:
+    """Compiles every Python file below root to bytecode for runtime
+
+    The files are compiled by the interpreter of the runtime (e.g.
+    `python3.12`), since bytecode is specific to the Python version. The
+    bytecode is written in the `unchecked-hash` mode, so it is used without
+    comparing it to the source: Lambda cannot rewrite stale bytecode on its
+    read-only file system, and the files stay reproducible because they do
+    not embed the source mtime.
+
+    With strip_sources the bytecode is written next to each source file
+    (`module.pyc`), which Python imports when the source is missing, and the
+    sources are removed. Files that fail to compile keep their source.
+    """
+    python = shutil.which(runtime)
+    if python is None:
+        raise ValueError(
+            f"Cannot find {runtime}. {runtime} must be installed to compile bytecode for the {runtime} runtime"
+        )
+    command = [
+        python,
+        "-m",
+        "compileall",
+        "-q",
+        "-j",
+        "0",
+        "--invalidation-mode",
+        "unchecked-hash",
+    ]
+    if strip_sources:
+        command.append("-b")
+    # compileall exits with 1 when a file has a syntax error (e.g. Python 2
+    # files shipped in packages), those files are left as they are
+    result = subprocess.run(
+        [*command, root], capture_output=True, text=True, stdin=subprocess.DEVNULL
+    )
+    if result.returncode not in (0, 1):
+        raise ValueError(f"Failed to compile bytecode: {result.stderr.strip()}")
+    if strip_sources:
+        remove_compiled_sources(root)
+
+
+def remove_compiled_sources(root: str) -> None:
+    """Removes the sources that have bytecode next to them and any __pycache__"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        if "__pycache__" in dirnames:
+            dirnames.remove("__pycache__")
+            shutil.rmtree(os.path.join(dirpath, "__pycache__"))
+        names = set(filenames)
+        for name in filenames:
+            if name.endswith(".py") and f"{name}c" in names:
+                os.unlink(os.path.join(dirpath, name))
@@ -0,0 +1,569 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+from aws_lambda_builders import __version__ as lambda_builders_version
+from pulumi.log import warn
+
+from pulumi_lambda_builders import __version__
+from pulumi_lambda_builders.archive import write_zip
+from pulumi_lambda_builders.fingerprint import fingerprint
+from pulumi_lambda_builders.remote_cache import (
+    get_remote_cache,
+    pack_entry,
+    remote_cache_read_only,
+    unpack_entry,
+)
+from pulumi_lambda_builders.tracing import span
+from pulumi_lambda_builders.utils import default_cache_dir, remove_path, tree_size
+
+CACHE_MAX_SIZE_ENV = "PULUMI_LAMBDA_BUILDERS_CACHE_MAX_SIZE_MB"
+"""Environment variable with the number of MB the cache entries and workspaces
+may use before the least recently used ones are evicted"""
+
+EVICTION_GRACE_SECONDS = 60 * 60
+"""Entries used more recently than this are never evicted, since a deployment
+running at the same time may still reference them"""
+
+ORPHAN_AGE_SECONDS = 24 * 60 * 60
+"""Staging directories and temporary files older than this were left behind by
+a build that was killed, and are removed by `collect_garbage`"""
+
+BuildFn = Callable[[str, str], None]
+"""A function that builds the code into the artifacts directory it is given.
+The second argument is a scratch directory private to this build"""
+
+
+def build_key(builder: str, *inputs: Any) -> str:
+    """Returns the cache key for a build
+
+    :param builder: the identity of the builder, e.g. `python/pip`
+    :param inputs: everything else that influences the build output, e.g. the
+    args, the source tree digest and the manifest digest
+    """
+    return fingerprint(builder, lambda_builders_version, __version__, *inputs)
+
+
+class BuildCache:
+    """A persistent, content addressed store of build artifacts
+
+    Every entry lives in `<root>/entries/<key>` and contains the built code in
+    an `artifact` directory and, once requested, a reproducible `artifact.zip`
+    of that directory. Entries are written to a staging directory first
+    and then renamed into place, so an entry that exists is always complete.
+    The staging directory also holds the scratch directory of the build, so
+    builds running at the same time never share scratch space.
+
+    Every entry records its size in a `size` file, and the mtime of the entry
+    directory is the last time it was used. Workspaces record theirs in a
+    `<name>.size` file next to them, and the mtime of their lock file is the
+    last time they were used. When PULUMI_LAMBDA_BUILDERS_CACHE_MAX_SIZE_MB is
+    set, the least recently used entries and workspaces are evicted after each
+    build to keep them under that size, along with the records of the evicted
+    entries (see `entry_record`). The shared package manager caches (`pip`,
+    `go`, `nuget`, `sccache`), downloaded tools (`bin`), the file index and
+    other records are not counted and never evicted.
+    """
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = os.path.abspath(root or default_cache_dir())
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, "entries", key)
+
+    def artifact_dir(self, key: str) -> str:
+        return os.path.join(self.entry_dir(key), "artifact")
+
+    def zip_path(self, key: str, name: Optional[str] = None) -> str:
+        if name is not None:
+            return os.path.join(self.entry_dir(key), "entries", f"{name}.zip")
+        return os.path.join(self.entry_dir(key), "artifact.zip")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Returns the artifact directory for key if it has already been built
+
+        A hit marks the entry as used, which protects it from eviction.
+        """
+        artifact_dir = self.artifact_dir(key)
+        if os.path.isdir(artifact_dir):
+            self._touch(key)
+            return artifact_dir
+        return None
+
+    def build(self, key: str, build: BuildFn) -> str:
+        """Returns the artifact directory for key, running build on a cache miss
+
+        Concurrent calls for the same key in this process wait for the first
+        one instead of building the same artifact twice. With a remote cache
+        (PULUMI_LAMBDA_BUILDERS_REMOTE_CACHE) a miss is fetched from there
+        before building, and a new build is uploaded to it.
+        """
+        found = self.lookup(key)
+        if found:
+            return found
+        with _key_lock(self.entry_dir(key)):
+            found = self.fetch(key)
+            if found:
+                return found
+            artifact_dir = self._build(key, build)
+            self._upload(key)
+            return artifact_dir
+
+    def fetch(self, key: str) -> Optional[str]:
+        """Returns the artifact directory for key if it is in the local cache
+        or can be downloaded from the remote cache"""
+        found = self.lookup(key)
+        if found:
+            return found
+        remote = get_remote_cache()
+        if remote is None:
+            return None
+        staging = self._staging()
+        try:
+            packed = os.path.join(staging, "artifact.tar.gz")
+            with span("fetch"):
+                if not remote.get(_remote_name(key), packed):
+                    return None
+                unpack_entry(packed, os.path.join(staging, "artifact"))
+            os.unlink(packed)
+            return self._commit(key, staging)
+        except Exception as err:
+            warn(f"Failed to fetch {key} from the remote cache: {err}")
+            return None
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _upload(self, key: str) -> None:
+        remote = get_remote_cache()
+        if remote is None or remote_cache_read_only():
+            return
+        staging = self._staging()
+        try:
+            packed = os.path.join(staging, "artifact.tar.gz")
+            with span("upload"):
+                pack_entry(self.artifact_dir(key), packed)
+                remote.put(_remote_name(key), packed)
+        except Exception as err:
+            warn(f"Failed to upload {key} to the remote cache: {err}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _staging(self) -> str:
+        staging_root = os.path.join(self.root, "tmp")
+        os.makedirs(staging_root, exist_ok=True)
+        return tempfile.mkdtemp(dir=staging_root)
+
+    def _build(self, key: str, build: BuildFn) -> str:
+        staging = self._staging()
+        try:
+            artifact_dir = os.path.join(staging, "artifact")
+            scratch_dir = os.path.join(staging, "scratch")
+            os.makedirs(artifact_dir)
+            os.makedirs(scratch_dir)
+            build(artifact_dir, scratch_dir)
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            return self._commit(key, staging)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @contextmanager
+    def workspace(self, name: str) -> Iterator[str]:
+        """Holds the persistent workspace called name while the block runs
+
+        Workspaces keep state between builds that makes the next build
+        incremental, e.g. compiler output. Unlike entries they are modified in
+        place, so a workspace is locked against other builds, in this process
+        and (where file locks are available) in others, while it is held.
+        """
+        path = self.workspace_path(name)
+        lock_path = f"{path}.lock"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _key_lock(lock_path):
+            with open(lock_path, "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Created once the lock is held, eviction may have removed it
+                os.makedirs(path, exist_ok=True)
+                try:
+                    yield path
+                finally:
+                    if default_max_size_bytes() is not None:
+                        _write_size(f"{path}.size", tree_size(path))
+                    os.utime(lock_path)
+
+    def workspace_path(self, name: str) -> str:
+        return os.path.join(self.root, "workspaces", name)
+
+    def record_path(self, name: str) -> str:
+        return os.path.join(self.root, "records", f"{name}.json")
+
+    def load_record(self, name: str, shared: bool = False) -> Optional[Dict[str, Any]]:
+        """Returns the record stored under name, or None if there is none
+
+        Records are small JSON documents that builders keep next to the cache
+        entries, e.g. the input files of the last build.
+
+        :param shared: fetch the record from the remote cache when it is not
+        stored locally, for records saved with `shared=True`
+        """
+        path = self.record_path(name)
+        if shared and not os.path.isfile(path):
+            self._fetch_record(name)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_record(
+        self, name: str, record: Dict[str, Any], shared: bool = False
+    ) -> None:
+        """Stores record under name
+
+        :param shared: also upload the record to the remote cache, for records
+        that describe an entry and are needed wherever the entry is fetched
+        """
+        path = self.record_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f, sort_keys=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if shared:
+            self._upload_record(name)
+
+    def _fetch_record(self, name: str) -> None:
+        remote = get_remote_cache()
+        if remote is None:
+            return
+        path = self.record_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            if remote.get(_remote_record_name(name), tmp_path):
+                os.replace(tmp_path, path)
+        except Exception as err:
+            warn(f"Failed to fetch record {name} from the remote cache: {err}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _upload_record(self, name: str) -> None:
+        remote = get_remote_cache()
+        if remote is None or remote_cache_read_only():
+            return
+        try:
+            remote.put(_remote_record_name(name), self.record_path(name))
+        except Exception as err:
+            warn(f"Failed to upload record {name} to the remote cache: {err}")
+
+    def archive(self, key: str, name: Optional[str] = None) -> str:
+        """Returns the path to a reproducible zip of the artifact for key
+
+        The zip is written the first time it is requested and reused after that.
+
+        :param name: only zip this subdirectory of the artifact, for builds
+        that produce one artifact per entry
+        """
+        zip_path = self.zip_path(key, name)
+        if not os.path.isfile(zip_path):
+            artifact_dir = self.lookup(key)
+            if not artifact_dir:
+                raise ValueError(f"No build artifact found for {key}")
+            if name is not None:
+                artifact_dir = os.path.join(artifact_dir, name)
+            os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+            with span("archive"):
+                write_zip(artifact_dir, zip_path)
+            _save_size(self.entry_dir(key))
+            self.enforce_size_limit()
+        return zip_path
+
+    def evict(self, max_bytes: int) -> List[str]:
+        """Removes the least recently used entries and workspaces until they
+        use at most max_bytes
+
+        Entries used by this process, workspaces that are held and anything
+        used in the last EVICTION_GRACE_SECONDS are kept even if that leaves
+        the cache over the limit. Eviction is skipped while another process is
+        evicting.
+
+        Returns the keys of the removed entries and, as `workspaces/<name>`,
+        the removed workspaces.
+        """
+        removed: List[str] = []
+        with self._exclusive("evict") as acquired:
+            if not acquired:
+                return removed
+            candidates = []
+            entries_root = os.path.join(self.root, "entries")
+            for key in _list_dir(entries_root):
+                entry_dir = os.path.join(entries_root, key)
+                try:
+                    last_used = os.stat(entry_dir).st_mtime
+                except OSError:
+                    continue
+                candidates.append((last_used, key, _entry_size(entry_dir)))
+            for name in _list_dir(os.path.join(self.root, "workspaces")):
+                path = self.workspace_path(name)
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    last_used = os.stat(f"{path}.lock").st_mtime
+                except OSError:
+                    # Workspaces are created after their lock file
+                    continue
+                candidates.append(
+                    (last_used, f"workspaces/{name}", _workspace_size(path))
+                )
+
+            total = sum(size for _, _, size in candidates)
+            now = time.time()
+            for last_used, name, size in sorted(candidates):
+                if total <= max_bytes:
+                    break
+                if now - last_used < EVICTION_GRACE_SECONDS:
+                    continue
+                if name.startswith("workspaces/"):
+                    evicted = self._remove_workspace(name[len("workspaces/") :])
+                elif self.entry_dir(name) in _used:
+                    continue
+                else:
+                    evicted = self._remove_entry(name)
+                if evicted:
+                    total -= size
+                    removed.append(name)
+        return removed
+
+    def enforce_size_limit(self) -> List[str]:
+        """Evicts entries down to PULUMI_LAMBDA_BUILDERS_CACHE_MAX_SIZE_MB, if set"""
+        max_bytes = default_max_size_bytes()
+        if max_bytes is None:
+            return []
+        return self.evict(max_bytes)
+
+    def collect_garbage(self) -> int:
+        """Removes what builds that were killed left behind, then enforces the
+        size limit
+
+        Staging directories and temporary files are only removed once they are
+        older than ORPHAN_AGE_SECONDS, so builds that are still running in
+        other processes are not disturbed. Returns the number of paths removed.
+        """
+        removed = 0
+        cutoff = time.time() - ORPHAN_AGE_SECONDS
+        with self._exclusive("collect-garbage") as acquired:
+            if not acquired:
+                return removed
+            candidates: List[str] = []
+            staging_root = os.path.join(self.root, "tmp")
+            if os.path.isdir(staging_root):
+                candidates.extend(
+                    os.path.join(staging_root, name)
+                    for name in os.listdir(staging_root)
+                )
+            for subdir in ["entries", "records", "index"]:
+                for dirpath, _, filenames in os.walk(os.path.join(self.root, subdir)):
+                    candidates.extend(
+                        os.path.join(dirpath, name)
+                        for name in filenames
+                        if _is_temporary_file(name)
+                    )
+            for path in candidates:
+                try:
+                    if os.lstat(path).st_mtime > cutoff:
+                        continue
+                    remove_path(path)
+                    removed += 1
+                except OSError:
+                    continue
+        self.enforce_size_limit()
+        return removed
+
+    def _commit(self, key: str, staging: str) -> str:
+        entry_dir = self.entry_dir(key)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        _save_size(staging)
+        try:
+            os.rename(staging, entry_dir)
+        except OSError:
+            # Another build with the same key finished first. Its output is
+            # equivalent to ours, so use it and throw ours away.
+            if not self.lookup(key):
+                raise
+        self._touch(key)
+        self.enforce_size_limit()
+        return self.artifact_dir(key)
+
+    def _touch(self, key: str) -> None:
+        entry_dir = self.entry_dir(key)
+        with _used_lock:
+            _used.add(entry_dir)
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            pass
+
+    def _remove_entry(self, key: str) -> bool:
+        """Removes an entry, moving it out of entries first so that lookups
+        never see a partly removed entry"""
+        entry_dir = self.entry_dir(key)
+        trash = self._staging()
+        try:
+            with _key_lock(entry_dir):
+                os.rename(entry_dir, os.path.join(trash, "entry"))
+        except OSError:
+            return False
+        finally:
+            shutil.rmtree(trash, ignore_errors=True)
+        # The records of the entry, see entry_record
+        shutil.rmtree(
+            os.path.join(self.root, "records", "entries", key), ignore_errors=True
+        )
+        return True
+
+    def _remove_workspace(self, name: str) -> bool:
+        """Removes a workspace unless it is held, moving it out of workspaces
+        first so that a build never starts in a partly removed workspace"""
+        path = self.workspace_path(name)
+        with self._exclusive(os.path.join("workspaces", name)) as acquired:
+            if not acquired:
+                return False
+            trash = self._staging()
+            try:
+                os.rename(path, os.path.join(trash, "workspace"))
+            except OSError:
+                return False
+            finally:
+                shutil.rmtree(trash, ignore_errors=True)
+            remove_path(f"{path}.size")
+        return True
+
+    @contextmanager
+    def _exclusive(self, name: str) -> Iterator[bool]:
+        """Tries to lock name against other threads and processes without
+        waiting
+
+        Yields whether the lock was acquired.
+        """
+        path = os.path.join(self.root, f"{name}.lock")
+        lock = _key_lock(path)
+        if not lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(path, "w") as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        yield False
+                        return
+                yield True
+        finally:
+            lock.release()
+
+
+_key_locks_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+
+
+def _key_lock(entry_dir: str) -> threading.Lock:
+    with _key_locks_lock:
+        return _key_locks.setdefault(entry_dir, threading.Lock())
+
+
+_used_lock = threading.Lock()
+_used: Set[str] = set()
+"""The entries this process has built or looked up, which are referenced by
+the program being deployed and must not be evicted"""
+
+
+def entry_record(key: str, name: str) -> str:
+    """Returns the name of the record called name that describes the entry
+    for key. Such records are removed when the entry is evicted"""
+    return f"entries/{key}/{name}"
+
+
+def _save_size(entry_dir: str) -> None:
+    size_path = os.path.join(entry_dir, "size")
+    size = tree_size(entry_dir)
+    if os.path.isfile(size_path):
+        size -= os.path.getsize(size_path)
+    _write_size(size_path, size)
+
+
+def _write_size(size_path: str, size: int) -> None:
+    tmp_path = f"{size_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(size))
+    os.replace(tmp_path, size_path)
+
+
+def _read_size(size_path: str) -> Optional[int]:
+    try:
+        with open(size_path) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _entry_size(entry_dir: str) -> int:
+    size = _read_size(os.path.join(entry_dir, "size"))
+    # Entries written before sizes were recorded
+    return tree_size(entry_dir) if size is None else size
+
+
+def _workspace_size(path: str) -> int:
+    size = _read_size(f"{path}.size")
+    # Workspaces last used without a size limit
+    return tree_size(path) if size is None else size
+
+
+def _list_dir(path: str) -> List[str]:
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+
+def _is_temporary_file(name: str) -> bool:
+    # Records, sizes, the file index and zips are written to `.tmp` files that
+    # are renamed into place once they are complete
+    return name.endswith(".tmp")
+
+
+def default_max_size_bytes() -> Optional[int]:
+    configured = os.environ.get(CACHE_MAX_SIZE_ENV)
+    if configured:
+        return max(0, int(configured)) * 1024 * 1024
+    return None
+
+
+def _remote_name(key: str) -> str:
+    return f"entries/{key}.tar.gz"
+
+
+def _remote_record_name(name: str) -> str:
+    return f"records/{name}.json"
+
+
+def get_cache() -> BuildCache:
+    """Returns the build cache configured for this process"""
+    return BuildCache()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, get_args, get_type_hints
+
+import pulumi
+
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.build_custom import prepare_custom_make
+from pulumi_lambda_builders.build_dotnet import prepare_dotnet
+from pulumi_lambda_builders.build_go import prepare_go, prepare_go_handlers
+from pulumi_lambda_builders.build_java import prepare_java
+from pulumi_lambda_builders.build_many import PreparedBatch
+from pulumi_lambda_builders.build_nodejs import prepare_nodejs, prepare_nodejs_bundle
+from pulumi_lambda_builders.build_python import prepare_python
+from pulumi_lambda_builders.build_ruby import prepare_ruby
+from pulumi_lambda_builders.build_rust import prepare_rust
+from pulumi_lambda_builders.cache import get_cache
+from pulumi_lambda_builders.scheduler import start_scheduler
+
+try:
+    import yaml
+except ImportError:  # PyYAML is only needed for YAML build files
+    yaml = None  # type: ignore[assignment]
+
+BUILDERS: Dict[str, Callable[[Any], PreparedBuild]] = {
+    "custom_make": prepare_custom_make,
+    "dotnet": prepare_dotnet,
+    "go": prepare_go,
+    "go_handlers": prepare_go_handlers,
+    "java": prepare_java,
+    "nodejs": prepare_nodejs,
+    "nodejs_bundle": prepare_nodejs_bundle,
+    "python": prepare_python,
+    "ruby": prepare_ruby,
+    "rust": prepare_rust,
+}
+"""The builders a build file can use, by the key that selects them. Their
+args are the args of the matching component, e.g. BuildPythonArgs"""
+
+
+def load_build_file(path: str) -> Dict[str, Dict[str, Any]]:
+    """Reads the functions of a JSON or YAML build file
+
+    A build file maps function names to exactly one builder and its args:
+
+        functions:
+          api:
+            python:
+              code: services/api
+              runtime: python3.12
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ValueError(
+                    f"Reading {path} requires PyYAML, install it or use JSON"
+                )
+            content = yaml.safe_load(f)
+        else:
+            content = json.load(f)
+    if not isinstance(content, dict) or not isinstance(content.get("functions"), dict):
+        raise ValueError(f"{path} must contain a map of functions")
+    return content["functions"]
+
+
+def required_args(builder: str) -> List[str]:
+    """Returns the args a builder cannot do without, the fields of its args
+    type that are not Optional"""
+    args_type = get_type_hints(BUILDERS[builder])["args"]
+    return [
+        name
+        for name, hint in get_type_hints(args_type).items()
+        if type(None) not in get_args(hint)
+    ]
+
+
+def validate_functions(functions: Dict[str, Dict[str, Any]]):
+    errors: List[pulumi.InputPropertyErrorDetails] = []
+    if not functions:
+        errors.append(
+            {
+                "property_path": "functions",
+                "reason": "At least one function is required",
+            }
+        )
+    for name, function in functions.items():
+        builders = list(function) if isinstance(function, dict) else []
+        if len(builders) != 1 or builders[0] not in BUILDERS:
+            errors.append(
+                {
+                    "property_path": f"functions.{name}",
+                    "reason": "Exactly one of " + ", ".join(BUILDERS) + " must be set",
+                }
+            )
+            continue
+        builder = builders[0]
+        args = function[builder]
+        if not isinstance(args, dict):
+            errors.append(
+                {
+                    "property_path": f"functions.{name}.{builder}",
+                    "reason": "Must be a map of arguments",
+                }
+            )
+            continue
+        for arg in required_args(builder):
+            if args.get(arg) is None:
+                errors.append(
+                    {
+                        "property_path": f"functions.{name}.{builder}.{arg}",
+                        "reason": f"{arg} is required",
+                    }
+                )
+
+    for error in errors:
+        print(f"Invalid argument for {error['property_path']}: {error['reason']}")
+    if errors.__len__() > 0:
+        raise pulumi.InputPropertiesError("Invalid arguments", errors)
+
+
+def prepare_functions(functions: Dict[str, Dict[str, Any]]) -> PreparedBatch:
+    validate_functions(functions)
+    builds: Dict[str, PreparedBuild] = {}
+    for name, function in functions.items():
+        ((builder, args),) = function.items()
+        builds[name] = BUILDERS[builder](args)
+    return PreparedBatch(builds, functions)  # type: ignore[arg-type]
+
+
+def build(paths: List[str], jobs: Optional[int] = None) -> int:
+    """Builds every function in the build files and prints where each
+    artifact is. Returns the exit code"""
+    functions: Dict[str, Dict[str, Any]] = {}
+    try:
+        for path in paths:
+            for name, function in load_build_file(path).items():
+                if name in functions:
+                    raise ValueError(f"Function {name} is defined more than once")
+                functions[name] = function
+        batch = prepare_functions(functions)
+    except (
+        OSError,
+        ValueError,
+        pulumi.InputPropertiesError,
+        pulumi.InputPropertyError,
+    ) as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+
+    # --jobs caps the worker pool, the CPU and memory budgets still apply
+    start_scheduler(max_workers=jobs)
+    cache = get_cache()
+    cache.collect_garbage()
+    cached = {name for name, build in batch.builds.items() if cache.lookup(build.key)}
+
+    start = time.monotonic()
+    try:
+        assets, layers = batch.run()
+    except Exception as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+
+    for name, asset in assets.items():
+        status = "cached" if name in cached else "built"
+        # Bundles have an archive per entry
+        location = (
+            {entry: a.path for entry, a in asset.items()}
+            if isinstance(asset, dict)
+            else asset.path
+        )
+        print(f"{name}: {status} {batch.builds[name].key} {location}")
+        if name in layers:
+            print(f"{name} (layer): {layers[name].path}")
+    print(
+        f"{len(assets) - len(cached)} built, {len(cached)} cached "
+        f"in {time.monotonic() - start:.1f}s"
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m pulumi_lambda_builders",
+        description="Build Lambda functions outside of a Pulumi program, e.g. "
+        "to warm the build cache in CI before `pulumi up`",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_command = commands.add_parser(
+        "build", help="Build every function in one or more build files"
+    )
+    build_command.add_argument(
+        "files",
+        nargs="+",
+        metavar="FILE",
+        help="JSON or YAML file with a map of functions to build",
+    )
+    build_command.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of builds to run at the same time (default: "
+        "PULUMI_LAMBDA_BUILDERS_MAX_WORKERS or the number of CPUs + 4)",
+    )
+    cli_args = parser.parse_args(argv)
+    if cli_args.jobs is not None and cli_args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return build(cli_args.files, cli_args.jobs)
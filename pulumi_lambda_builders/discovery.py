@@ -0,0 +1,124 @@
+import os
+import threading
+from typing import Dict, FrozenSet, Iterator, Optional
+
+from pulumi_lambda_builders.fingerprint import DEFAULT_EXCLUDES
+from pulumi_lambda_builders.tracing import span
+
+MANIFEST_NAMES = frozenset(
+    {
+        "package.json",
+        "package-lock.json",
+        "requirements.txt",
+        "go.mod",
+        "Cargo.toml",
+        "pom.xml",
+        "build.gradle",
+        "build.gradle.kts",
+        "Gemfile",
+        "Makefile",
+    }
+)
+"""The files the index records"""
+
+SCAN_EXCLUDES = DEFAULT_EXCLUDES.union({"target", ".gradle", ".venv", "venv"})
+"""Directories the scan does not descend into"""
+
+MAX_SCANNED_DIRECTORIES = 100_000
+"""The scan stops after this many directories, e.g. when the program runs
+outside of a repository in a large home directory"""
+
+
+class ManifestIndex:
+    """The manifests in every directory of a repository, read in one scan
+
+    Builders ask for the nearest manifest of a path, e.g. the package.json of
+    an entry file. Instead of every component checking every parent directory
+    on disk, the repository is walked once and the answers come from memory.
+    Directories the scan did not cover (outside the repository, below
+    SCAN_EXCLUDES or past MAX_SCANNED_DIRECTORIES) are checked on disk.
+
+    The index is not updated after the scan. Manifests are not expected to
+    appear or disappear while a program runs.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.dirs: Dict[str, FrozenSet[str]] = {}
+        """directory -> the manifests in it, for every scanned directory"""
+
+    def scan(self) -> None:
+        with span("discover_manifests"):
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                self.dirs[dirpath] = MANIFEST_NAMES.intersection(filenames)
+                if len(self.dirs) >= MAX_SCANNED_DIRECTORIES:
+                    break
+                dirnames[:] = [d for d in dirnames if d not in SCAN_EXCLUDES]
+
+    def has(self, directory: str, filename: str) -> bool:
+        """Returns whether filename exists in directory"""
+        names = self.dirs.get(directory)
+        if names is None or filename not in MANIFEST_NAMES:
+            return os.path.exists(os.path.join(directory, filename))
+        return filename in names
+
+    def manifests(self, filename: str, path: str) -> Iterator[str]:
+        """Yields every file called filename in path and its parents, nearest
+        first"""
+        directory = os.path.abspath(path)
+        while True:
+            if self.has(directory, filename):
+                yield os.path.join(directory, filename)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return
+            directory = parent
+
+    def nearest(self, filename: str, path: str) -> Optional[str]:
+        """Returns the file called filename in path or its closest parent"""
+        return next(self.manifests(filename, path), None)
+
+
+_lock = threading.Lock()
+_indexes: Dict[str, ManifestIndex] = {}
+"""working directory -> the index of its repository"""
+
+
+def repository_root(path: str) -> str:
+    """Returns the closest directory with VCS metadata containing path, or
+    path itself"""
+    directory = os.path.abspath(path)
+    while True:
+        if any(os.path.exists(os.path.join(directory, d)) for d in [".git", ".hg"]):
+            return directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return os.path.abspath(path)
+        directory = parent
+
+
+def get_manifest_index() -> ManifestIndex:
+    """Returns the index of the repository the program runs in, scanning it
+    the first time"""
+    cwd = os.getcwd()
+    with _lock:
+        index = _indexes.get(cwd)
+        if index is None:
+            root = repository_root(cwd)
+            index = next((i for i in _indexes.values() if i.root == root), None)
+            if index is None:
+                index = ManifestIndex(root)
+                index.scan()
+            _indexes[cwd] = index
+        return index
+
+
+def reset_manifest_index() -> None:
+    """Forgets every index, so the next lookup scans the repository again"""
+    with _lock:
+        _indexes.clear()
+
+
+def find_manifest(filename: str, path: str) -> Optional[str]:
+    """Returns the file called filename in path or its closest parent"""
+    return get_manifest_index().nearest(filename, path)
@@ -0,0 +1,141 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Set
+
+from pulumi_lambda_builders.fingerprint import hash_file
+
+METAFILE_NAME = "metafile.json"
+"""The name of the esbuild metafile written to the scratch directory"""
+
+
+def read_metafile(path: str) -> Dict[str, Any]:
+    """Returns the contents of an esbuild metafile"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def metafile_inputs(metafile: Dict[str, Any], working_dir: str) -> List[str]:
+    """Returns the absolute paths of the files esbuild read to build a bundle
+
+    Input paths in the metafile are relative to the directory esbuild ran in.
+    Inputs that are not files on disk (e.g. virtual modules created by
+    plugins) are skipped.
+    """
+    inputs = []
+    for name in metafile.get("inputs", {}):
+        path = os.path.normpath(os.path.join(working_dir, name))
+        if os.path.isfile(path):
+            inputs.append(path)
+    return sorted(inputs)
+
+
+def snapshot_inputs(paths: Iterable[str]) -> Dict[str, List[Any]]:
+    """Returns the size, mtime and digest of each path"""
+    snapshot: Dict[str, List[Any]] = {}
+    for path in paths:
+        st = os.stat(path)
+        snapshot[path] = [st.st_size, st.st_mtime_ns, hash_file(path)]
+    return snapshot
+
+
+def inputs_unchanged(snapshot: Dict[str, List[Any]]) -> bool:
+    """Returns whether every file in a snapshot still has the same contents
+
+    Files whose size and mtime match the snapshot are not read again.
+    """
+    for path, (size, mtime_ns, digest) in snapshot.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size == size and st.st_mtime_ns == mtime_ns:
+            continue
+        if st.st_size != size or hash_file(path) != digest:
+            return False
+    return True
+
+
+def entry_outputs(
+    metafile: Dict[str, Any], working_dir: str, outdir: str
+) -> Dict[str, List[str]]:
+    """Returns the output files each entry point needs at runtime
+
+    The result maps the absolute path of each entry point to the paths,
+    relative to outdir, of its output file, the chunks it imports (directly
+    or through other chunks) when code splitting is enabled, and their source
+    maps.
+    """
+    outputs = {
+        os.path.normpath(os.path.join(working_dir, name)): output
+        for name, output in metafile.get("outputs", {}).items()
+    }
+
+    def collect(path: str, files: Set[str]) -> None:
+        if path in files or path not in outputs:
+            return
+        files.add(path)
+        if f"{path}.map" in outputs:
+            files.add(f"{path}.map")
+        for imported in outputs[path].get("imports", []):
+            if not imported.get("external"):
+                collect(
+                    os.path.normpath(os.path.join(working_dir, imported["path"])), files
+                )
+
+    result: Dict[str, List[str]] = {}
+    for path, output in outputs.items():
+        entry_point = output.get("entryPoint")
+        if not entry_point:
+            continue
+        files: Set[str] = set()
+        collect(path, files)
+        result[os.path.normpath(os.path.join(working_dir, entry_point))] = sorted(
+            os.path.relpath(f, outdir) for f in files
+        )
+    return result
+
+
+def package_name(input_path: str) -> str:
+    """Returns the npm package an esbuild input belongs to
+
+    The package is taken from the path below the last `node_modules`, so
+    nested and hoisted dependencies are attributed to the package that was
+    actually bundled. Inputs outside node_modules are the project's own code
+    and are attributed to ".".
+    """
+    parts = input_path.replace("\\", "/").split("/")
+    if "node_modules" not in parts:
+        return "."
+    index = len(parts) - 1 - parts[::-1].index("node_modules")
+    name = parts[index + 1 : index + 3] if index + 1 < len(parts) else []
+    if name and name[0].startswith("@"):
+        return "/".join(name)
+    return name[0] if name else "."
+
+
+def bundle_sizes(
+    metafile: Dict[str, Any], working_dir: str, outdir: str
+) -> Dict[str, Any]:
+    """Returns the size of a bundle and what contributed to it
+
+    The result has the total size in bytes of the output files, without
+    source maps, the size of each output file by its path relative to outdir,
+    and the bytes each npm package contributed to the outputs, largest first.
+    """
+    outputs: Dict[str, int] = {}
+    packages: Dict[str, int] = {}
+    for name, output in metafile.get("outputs", {}).items():
+        if name.endswith(".map"):
+            continue
+        path = os.path.normpath(os.path.join(working_dir, name))
+        outputs[os.path.relpath(path, outdir)] = output.get("bytes", 0)
+        for input_path, contribution in output.get("inputs", {}).items():
+            package = package_name(input_path)
+            packages[package] = packages.get(package, 0) + contribution.get(
+                "bytesInOutput", 0
+            )
+    return {
+        "bundle_size": sum(outputs.values()),
+        "outputs": outputs,
+        "packages": dict(sorted(packages.items(), key=lambda p: (-p[1], p[0]))),
+    }
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from pulumi_lambda_builders.tracing import span
+from pulumi_lambda_builders.utils import default_cache_dir
+
+# Directories that never contribute to the output of a build. These are either
+# VCS metadata, installed dependencies (which are covered by hashing the lock
+# file instead) or caches written by the tools themselves.
+DEFAULT_EXCLUDES = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".aws-sam",
+        ".pulumi",
+        ".pytest_cache",
+        ".mypy_cache",
+        "__pycache__",
+        "node_modules",
+    }
+)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Returns the sha256 hex digest of the contents of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_tree(root: str, excludes: Iterable[str] = ()) -> str:
+    """Returns a digest of every file below root
+
+    The digest covers the relative path, content and executable bit of each file
+    so that renames and permission changes are detected. Symlinks are hashed by
+    their target rather than followed.
+
+    File digests are kept in a persistent FileIndex, so only files whose stat
+    information changed since the last call are read again, and directories
+    whose entries are all unchanged reuse their stored digest.
+
+    :param root: the directory (or single file) to hash
+    :param excludes: extra directory or file names to skip in addition to
+    DEFAULT_EXCLUDES
+    """
+    with span("hash"):
+        if os.path.isfile(root):
+            return hash_file(root)
+
+        skip = DEFAULT_EXCLUDES.union(excludes)
+        index = FileIndex.for_tree(root, skip)
+        with index.lock:
+            digest = index.hash_tree(root, skip)
+            index.save()
+        return digest
+
+
+class FileIndex:
+    """A persistent index of file digests for one source tree
+
+    Similar to git's index, every file is recorded with its inode, size, mtime
+    and mode. A file whose stat information matches its record reuses the
+    stored digest instead of being read again. Every directory is recorded with
+    a signature of the stat information of everything below it, so a directory
+    in which nothing changed reuses its stored digest as well.
+
+    Files modified less than RACY_WINDOW_NS before they were hashed are not
+    recorded, since a second write within the same mtime tick would go
+    unnoticed. They are hashed again on the next run.
+    """
+
+    RACY_WINDOW_NS = 2 * 1_000_000_000
+    VERSION = 1
+
+    _lock = threading.Lock()
+    _loaded: Dict[str, "FileIndex"] = {}
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.files: Dict[str, List[Any]] = {}
+        """relative path -> [inode, size, mtime_ns, mode, digest]"""
+        self.dirs: Dict[str, List[str]] = {}
+        """relative path -> [signature, digest]"""
+        self._dirty = False
+
+    @classmethod
+    def for_tree(cls, root: str, skip: Iterable[str]) -> "FileIndex":
+        """Returns the index for root, loading it from disk the first time"""
+        name = fingerprint(os.path.abspath(root), sorted(skip))
+        path = os.path.join(default_cache_dir(), "index", f"{name}.json")
+        with cls._lock:
+            index = cls._loaded.get(path)
+            if index is None:
+                index = cls(path)
+                index.load()
+                cls._loaded[path] = index
+            return index
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.files = data.get("files", {})
+        self.dirs = data.get("dirs", {})
+
+    def save(self) -> None:
+        """Writes the index to disk if anything changed since it was loaded"""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"version": self.VERSION, "files": self.files, "dirs": self.dirs}, f
+            )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def hash_tree(self, root: str, skip: Iterable[str]) -> str:
+        """Returns the digest of root, updating the index along the way"""
+        files: Dict[str, List[Any]] = {}
+        dirs: Dict[str, List[str]] = {}
+        _, digest, _ = self._hash_dir(root, "", frozenset(skip), files, dirs)
+        if files != self.files or dirs != self.dirs:
+            self.files = files
+            self.dirs = dirs
+            self._dirty = True
+        return digest
+
+    def _hash_dir(
+        self,
+        path: str,
+        rel: str,
+        skip: FrozenSet[str],
+        files: Dict[str, List[Any]],
+        dirs: Dict[str, List[str]],
+    ) -> Tuple[str, str, bool]:
+        """Returns the signature and digest of a directory and whether it is racy"""
+        now = time.time_ns()
+        signature = hashlib.sha256()
+        entries: List[Tuple[str, str]] = []
+        stats: Dict[str, os.stat_result] = {}
+        racy = False
+        with os.scandir(path) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.name in skip:
+                    continue
+                child_rel = f"{rel}/{entry.name}" if rel else entry.name
+                if entry.is_symlink():
+                    target = os.readlink(entry.path)
+                    signature.update(f"{entry.name}\0l\0{target}\n".encode())
+                    entries.append((entry.name, f"link:{target}"))
+                elif entry.is_dir():
+                    child_sig, child_digest, child_racy = self._hash_dir(
+                        entry.path, child_rel, skip, files, dirs
+                    )
+                    racy = racy or child_racy
+                    signature.update(f"{entry.name}\0d\0{child_sig}\n".encode())
+                    entries.append((entry.name, f"dir:{child_digest}"))
+                elif entry.is_file():
+                    st = entry.stat()
+                    stats[entry.name] = st
+                    racy = racy or now - st.st_mtime_ns < self.RACY_WINDOW_NS
+                    signature.update(
+                        f"{entry.name}\0f\0{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{st.st_mode}\n".encode()
+                    )
+
+        sig = signature.hexdigest()
+        stored = self.dirs.get(rel)
+        if stored is not None and stored[0] == sig and not racy:
+            # Nothing below this directory changed, carry the records over
+            for name in stats:
+                child_rel = f"{rel}/{name}" if rel else name
+                if child_rel in self.files:
+                    files[child_rel] = self.files[child_rel]
+            dirs[rel] = stored
+            return sig, stored[1], racy
+
+        for name, st in stats.items():
+            child_rel = f"{rel}/{name}" if rel else name
+            executable = bool(st.st_mode & 0o111)
+            digest = self._file_digest(os.path.join(path, name), child_rel, st)
+            if now - st.st_mtime_ns >= self.RACY_WINDOW_NS:
+                files[child_rel] = [
+                    st.st_ino,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    st.st_mode,
+                    digest,
+                ]
+            entries.append((name, f"{'x' if executable else 'f'}:{digest}"))
+
+        digest = hashlib.sha256()
+        for name, entry in sorted(entries):
+            digest.update(f"{name}\0{entry}\n".encode())
+        if not racy:
+            dirs[rel] = [sig, digest.hexdigest()]
+        return sig, digest.hexdigest(), racy
+
+    def _file_digest(self, path: str, rel: str, st: os.stat_result) -> str:
+        stored = self.files.get(rel)
+        if stored is not None and stored[:4] == [
+            st.st_ino,
+            st.st_size,
+            st.st_mtime_ns,
+            st.st_mode,
+        ]:
+            return stored[4]
+        return hash_file(path)
+
+
+def fingerprint(*parts: Any) -> str:
+    """Combines arbitrary JSON serializable values into a single digest"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def hash_optional_file(path: Optional[str]) -> Optional[str]:
+    """Like hash_file, but returns None when the file does not exist"""
+    if path and os.path.isfile(path):
+        return hash_file(path)
+    return None
@@ -0,0 +1,111 @@
+import glob
+import os
+import shlex
+import shutil
+import threading
+from typing import List, Optional
+
+from pulumi_lambda_builders.cache import BuildCache
+from pulumi_lambda_builders.fingerprint import fingerprint, hash_optional_file
+
+BUILD_FILES = {
+    "gradle": [
+        "build.gradle",
+        "build.gradle.kts",
+        "settings.gradle",
+        "settings.gradle.kts",
+        "gradle.properties",
+    ],
+    "maven": ["pom.xml"],
+}
+"""The files that declare the dependencies of a project, by dependency manager"""
+
+UNRESOLVED_DEPENDENCY_MESSAGES = [
+    # Gradle: "No cached version of ... available for offline mode"
+    # Maven: "Cannot access central (...) in offline mode"
+    "offline mode",
+    # Gradle: "Could not resolve all files for configuration ..."
+    # Maven: "Could not resolve dependencies for project ..."
+    "could not resolve",
+    # Maven: "The following artifacts could not be resolved: ..."
+    "could not be resolved",
+    # Maven: "Could not find artifact ..."
+    "could not find artifact",
+    # Gradle: "Plugin [id: '...'] was not found in any of the following sources"
+    "was not found in any of the following sources",
+]
+"""Parts of the errors Gradle and Maven report when a dependency is missing
+from the local repository"""
+
+
+def dependencies_digest(code: str, dependency_manager: str) -> str:
+    """Returns a digest of the files that declare the dependencies of code"""
+    return fingerprint(
+        dependency_manager,
+        [
+            hash_optional_file(os.path.join(code, name))
+            for name in BUILD_FILES[dependency_manager]
+        ],
+    )
+
+
+def is_unresolved_dependency(message: str) -> bool:
+    """Returns whether a failed build failed because a dependency could not be
+    resolved, as opposed to e.g. a compile error"""
+    message = message.lower()
+    return any(part in message for part in UNRESOLVED_DEPENDENCY_MESSAGES)
+
+
+def launcher_search_paths(
+    cache: BuildCache, dependency_manager: str, offline: bool
+) -> Optional[List[str]]:
+    """Returns executable search paths that run the build tool warm
+
+    aws_lambda_builders runs `gradlew` (or `gradle`) and `mvn` from the
+    executable search paths, so a launcher script with the same name is
+    written to the cache that starts the real tool with extra flags:
+
+    - Gradle always runs with `--daemon`, so consecutive builds reuse a warm
+      JVM with loaded build scripts.
+    - Maven runs through the Maven daemon (`mvnd`) when it is installed.
+    - Both run with their offline flag when offline is set.
+
+    Returns None when there is no POSIX shell to run the launcher or the tool
+    is not installed, in which case the workflow runs the tool directly.
+    """
+    if os.name == "nt":
+        return None
+    if dependency_manager == "gradle":
+        name = "gradlew"
+        tool = shutil.which("gradlew") or shutil.which("gradle")
+        flags = ["--daemon"] + (["--offline"] if offline else [])
+    else:
+        name = "mvn"
+        tool = shutil.which("mvnd") or shutil.which("mvn")
+        flags = ["--offline"] if offline else []
+    if tool is None:
+        return None
+
+    bin_dir = os.path.join(cache.root, "bin", fingerprint(name, tool, flags))
+    launcher = os.path.join(bin_dir, name)
+    if not os.path.isfile(launcher):
+        os.makedirs(bin_dir, exist_ok=True)
+        tmp_path = f"{launcher}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            command = " ".join(shlex.quote(arg) for arg in [tool, *flags])
+            f.write(f'#!/bin/sh\nexec {command} "$@"\n')
+        os.chmod(tmp_path, 0o755)
+        os.replace(tmp_path, launcher)
+    return [bin_dir]
+
+
+def remove_stale_gradle_output(workspace: str) -> None:
+    """Removes the Lambda layout of the previous Gradle build in a workspace
+
+    The aws_lambda_builders init script copies the jars into
+    `build/distributions/lambda-build` without clearing it first, so jars of
+    removed dependencies would otherwise end up in the next artifact.
+    """
+    pattern = os.path.join(workspace, "*", "build", "distributions", "lambda-build")
+    for path in glob.glob(pattern):
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,115 @@
+import functools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Optional
+
+from pulumi_lambda_builders.cache import BuildCache, BuildFn, build_key
+from pulumi_lambda_builders.fingerprint import hash_file
+from pulumi_lambda_builders.utils import clone_tree
+
+NPM_FILES = ["package.json", "package-lock.json", ".npmrc"]
+"""The files in the project directory `npm ci` reads"""
+
+
+@functools.lru_cache(maxsize=None)
+def node_major_version() -> Optional[str]:
+    """Returns the major version of the local node, or None if there is none"""
+    try:
+        result = subprocess.run(
+            ["node", "--version"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip().lstrip("v").split(".")[0]
+
+
+def can_cache_node_modules(lock_file: str) -> bool:
+    """Returns whether the node_modules for a package-lock.json can be cached
+
+    Packages linked from the local file system (workspaces and `file:`
+    dependencies) are not described by the lock file, so their node_modules
+    have to be installed in place.
+    """
+    try:
+        with open(lock_file) as f:
+            lock = json.load(f)
+    except (OSError, ValueError):
+        return False
+    packages = lock.get("packages", {})
+    return not any(package.get("link") for package in packages.values())
+
+
+def node_modules_key(project_dir: str, architecture: str) -> str:
+    return build_key(
+        "nodejs/npm-ci",
+        node_major_version(),
+        architecture,
+        hash_file(os.path.join(project_dir, "package-lock.json")),
+    )
+
+
+def npm_ci(cwd: str) -> None:
+    result = subprocess.run(
+        ["npm", "ci", "--no-audit", "--no-fund"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    # npm writes node_modules/.package-lock.json once the install completed
+    completed = os.path.isfile(os.path.join(cwd, "node_modules", ".package-lock.json"))
+    if result.returncode != 0 or not completed:
+        raise ValueError(
+            f"Failed to install Node.js dependencies: {result.stderr.strip()}"
+        )
+
+
+def node_modules_installer(project_dir: str) -> BuildFn:
+    """Returns the cache build that installs node_modules for project_dir"""
+
+    def install(artifacts_dir: str, scratch_dir: str) -> None:
+        for name in NPM_FILES:
+            path = os.path.join(project_dir, name)
+            if os.path.isfile(path):
+                shutil.copy2(path, os.path.join(scratch_dir, name))
+        npm_ci(scratch_dir)
+        os.rename(
+            os.path.join(scratch_dir, "node_modules"),
+            os.path.join(artifacts_dir, "node_modules"),
+        )
+
+    return install
+
+
+def install_node_modules(
+    cache: BuildCache, project_dir: str, node_modules_path: str, architecture: str
+) -> None:
+    """Installs node_modules for project_dir from the build cache
+
+    The installed tree is stored in the cache keyed by the package-lock.json
+    digest, the major version of node and the architecture, and is only
+    installed with `npm ci` on a cache miss. It is then cloned into
+    node_modules_path, with reflinks where the file system supports them, so
+    patching a dependency in place (e.g. with patch-package or a postinstall
+    script) never changes the cached tree other projects use.
+    """
+    key = node_modules_key(project_dir, architecture)
+    installed = os.path.join(
+        cache.build(key, node_modules_installer(project_dir)), "node_modules"
+    )
+
+    # Clone into a staging directory first, so a concurrent build of the same
+    # project never sees a partial node_modules
+    parent = os.path.dirname(os.path.abspath(node_modules_path))
+    staging = tempfile.mkdtemp(dir=parent, prefix=".node_modules-")
+    try:
+        clone_tree(installed, os.path.join(staging, "node_modules"))
+        try:
+            os.rename(os.path.join(staging, "node_modules"), node_modules_path)
+        except OSError:
+            if not os.path.isdir(node_modules_path):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,314 @@
+import abc
+import argparse
+import functools
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+try:
+    import boto3
+    from botocore.config import Config as BotocoreConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 is only needed for the s3 backend
+    boto3 = None  # type: ignore[assignment]
+
+REMOTE_CACHE_ENV = "PULUMI_LAMBDA_BUILDERS_REMOTE_CACHE"
+"""Environment variable with the URL of a cache shared between machines, e.g.
+`s3://bucket/prefix`, `https://cache.example.com/prefix` or a directory"""
+
+REMOTE_CACHE_READ_ONLY_ENV = "PULUMI_LAMBDA_BUILDERS_REMOTE_CACHE_READ_ONLY"
+"""Environment variable that, when set to `true`, only fetches from the remote
+cache and never uploads to it"""
+
+REMOTE_CACHE_TOKEN_ENV = "PULUMI_LAMBDA_BUILDERS_REMOTE_CACHE_TOKEN"
+"""Environment variable with a bearer token for an HTTP remote cache"""
+
+_TIMEOUT_SECONDS = 60
+
+
+class RemoteCache(abc.ABC):
+    """A store of packed cache entries shared between machines
+
+    Entries are stored under a name derived from their cache key. Since the
+    key covers every input of the build, an entry never changes once it has
+    been uploaded, and concurrent uploads of the same entry are equivalent.
+    """
+
+    @abc.abstractmethod
+    def get(self, name: str, path: str) -> bool:
+        """Downloads the object called name to path. Returns False if there is
+        no such object"""
+
+    @abc.abstractmethod
+    def put(self, name: str, path: str) -> None:
+        """Uploads the file at path as the object called name"""
+
+
+class DirectoryRemoteCache(RemoteCache):
+    """A remote cache in a directory, e.g. a network file system mount"""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def get(self, name: str, path: str) -> bool:
+        try:
+            shutil.copyfile(os.path.join(self.root, name), path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, name: str, path: str) -> None:
+        dest = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class HttpRemoteCache(RemoteCache):
+    """A remote cache on an HTTP server that stores PUT bodies and returns
+    them on GET, like the caches of Bazel, Gradle and sccache
+
+    When PULUMI_LAMBDA_BUILDERS_REMOTE_CACHE_TOKEN is set it is sent as a
+    bearer token.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    def get(self, name: str, path: str) -> bool:
+        try:
+            with urllib.request.urlopen(
+                self._request(name, "GET"), timeout=_TIMEOUT_SECONDS
+            ) as response, open(path, "wb") as f:
+                shutil.copyfileobj(response, f)
+        except urllib.error.HTTPError as err:
+            if err.code == 404:
+                return False
+            raise
+        return True
+
+    def put(self, name: str, path: str) -> None:
+        with open(path, "rb") as f:
+            request = self._request(name, "PUT", f)
+            request.add_header("Content-Length", str(os.path.getsize(path)))
+            request.add_header("Content-Type", "application/octet-stream")
+            with urllib.request.urlopen(request, timeout=_TIMEOUT_SECONDS):
+                pass
+
+    def _request(self, name: str, method: str, data=None) -> urllib.request.Request:
+        request = urllib.request.Request(f"{self.url}/{name}", data, method=method)
+        token = os.environ.get(REMOTE_CACHE_TOKEN_ENV)
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+        return request
+
+
+class S3RemoteCache(RemoteCache):
+    """A remote cache in an S3 bucket, or a bucket of an S3 compatible store
+
+    Credentials, the region and, for other stores, the endpoint
+    (AWS_ENDPOINT_URL) come from the usual AWS configuration. Requires boto3.
+    """
+
+    def __init__(self, bucket: str, prefix: str) -> None:
+        if boto3 is None:
+            raise ValueError("The s3 remote cache requires boto3 to be installed")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        # Path style addressing and checksums only when required work with
+        # every S3 compatible store
+        self.client = boto3.client(
+            "s3",
+            config=BotocoreConfig(
+                s3={"addressing_style": "path"},
+                request_checksum_calculation="when_required",
+                response_checksum_validation="when_required",
+            ),
+        )
+
+    def get(self, name: str, path: str) -> bool:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return False
+            raise
+        with open(path, "wb") as f:
+            shutil.copyfileobj(response["Body"], f)
+        return True
+
+    def put(self, name: str, path: str) -> None:
+        with open(path, "rb") as f:
+            self.client.put_object(Bucket=self.bucket, Key=self._key(name), Body=f)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+
+@functools.lru_cache(maxsize=None)
+def remote_cache_from_url(url: str) -> RemoteCache:
+    """Returns the remote cache for a URL
+
+    - `s3://bucket/prefix` for S3 and S3 compatible stores
+    - `http://` and `https://` for an HTTP cache server
+    - `file:///path` or a plain path for a directory
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == "s3":
+        return S3RemoteCache(parsed.netloc, parsed.path)
+    if parsed.scheme in ("http", "https"):
+        return HttpRemoteCache(url)
+    if parsed.scheme == "file":
+        return DirectoryRemoteCache(urllib.request.url2pathname(parsed.path))
+    if parsed.scheme == "" or len(parsed.scheme) == 1:  # Windows drive letters
+        return DirectoryRemoteCache(url)
+    raise ValueError(f"Unsupported remote cache URL {url}")
+
+
+def get_remote_cache() -> Optional[RemoteCache]:
+    """Returns the remote cache configured for this process, if any"""
+    url = os.environ.get(REMOTE_CACHE_ENV)
+    if not url:
+        return None
+    return remote_cache_from_url(url)
+
+
+def remote_cache_read_only() -> bool:
+    return os.environ.get(REMOTE_CACHE_READ_ONLY_ENV, "").lower() in ("1", "true")
+
+
+def pack_entry(artifact_dir: str, path: str) -> None:
+    """Writes the artifact directory of an entry to a gzipped tarball
+
+    Tarballs keep the file modes and symlinks of the artifact.
+    """
+    with tarfile.open(path, "w:gz") as tar:
+        for name in sorted(os.listdir(artifact_dir)):
+            tar.add(os.path.join(artifact_dir, name), arcname=name)
+
+
+def unpack_entry(path: str, artifact_dir: str) -> None:
+    """Extracts a tarball written by pack_entry into artifact_dir
+
+    Members that would end up outside of artifact_dir are rejected.
+    """
+    root = os.path.realpath(artifact_dir)
+    with tarfile.open(path, "r:gz") as tar:
+        for member in tar.getmembers():
+            target = os.path.realpath(os.path.join(root, member.name))
+            if os.path.commonpath([root, target]) != root or not (
+                member.isfile() or member.isdir() or member.issym()
+            ):
+                raise ValueError(f"Unexpected member {member.name} in cache entry")
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(artifact_dir, filter="data")
+        else:
+            tar.extractall(artifact_dir)
+
+
+class _CacheRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 answers `Expect: 100-continue`, which S3 clients send
+    protocol_version = "HTTP/1.1"
+    server: "CacheServer"
+
+    def do_GET(self) -> None:
+        path = self._path()
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            self.send_response(200)
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def do_PUT(self) -> None:
+        path = self._path()
+        if path is None:
+            self.send_error(400)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if remaining > 0:
+            # The client disconnected early, never store a truncated object
+            os.unlink(tmp_path)
+            self.send_error(400, "Incomplete body")
+            return
+        os.replace(tmp_path, path)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _path(self) -> Optional[str]:
+        rel = urllib.parse.unquote(urllib.parse.urlparse(self.path).path).lstrip("/")
+        parts = rel.split("/")
+        if not rel or any(part in ("", ".", "..") for part in parts):
+            return None
+        return os.path.join(self.server.directory, *parts)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class CacheServer(ThreadingHTTPServer):
+    """A minimal HTTP cache server that stores objects in a directory
+
+    It answers GET and PUT for any path, which is enough for the HTTP backend
+    and for S3 clients using path style addressing. It does not check
+    credentials and is meant for tests and local experiments, not for
+    production use.
+    """
+
+    def __init__(self, directory: str, host: str = "127.0.0.1", port: int = 0):
+        self.directory = directory
+        super().__init__((host, port), _CacheRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        """Serves requests on a background thread until shutdown is called"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for a remote build cache"
+    )
+    parser.add_argument("--directory", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    cli_args = parser.parse_args()
+    server = CacheServer(cli_args.directory, cli_args.host, cli_args.port)
+    print(f"Serving {cli_args.directory} at {server.url}")
+    server.serve_forever()
@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+CPU_BUDGET_ENV = "PULUMI_LAMBDA_BUILDERS_CPU_BUDGET"
+"""Environment variable used to override the number of CPUs builds may use"""
+
+MEMORY_BUDGET_ENV = "PULUMI_LAMBDA_BUILDERS_MEMORY_BUDGET_MB"
+"""Environment variable used to override the memory (in MB) builds may use"""
+
+MAX_WORKERS_ENV = "PULUMI_LAMBDA_BUILDERS_MAX_WORKERS"
+"""Environment variable used to override the number of concurrent builds"""
+
+
+class BuildWeight:
+    """The rough amount of resources a single build of one builder needs"""
+
+    def __init__(self, cpus: float, memory_mb: int) -> None:
+        self.cpus = cpus
+        self.memory_mb = memory_mb
+
+
+LIGHT = BuildWeight(cpus=0.5, memory_mb=512)
+"""Builders that mostly copy files and install packages (Python, Node.js, Ruby)"""
+
+MEDIUM = BuildWeight(cpus=1, memory_mb=1024)
+"""Builders that compile with a single, fast toolchain (Go, Makefile)"""
+
+HEAVY = BuildWeight(cpus=2, memory_mb=2048)
+"""Builders that start a JVM or a large compiler (Java, Rust, .NET)"""
+
+
+class BuildScheduler:
+    """Runs builds on a worker pool within a CPU and memory budget
+
+    A build only starts once the sum of the weights of the running builds plus
+    its own fits the budget. Builds start in the order they asked to, so a
+    heavy build is not starved by a stream of light ones. A build that is
+    heavier than the whole budget still runs, but only on its own.
+    """
+
+    def __init__(self, cpus: float, memory_mb: int, max_workers: int) -> None:
+        self.cpus = cpus
+        self.memory_mb = memory_mb
+        self.max_workers = max_workers
+        self._used_cpus = 0.0
+        self._used_memory_mb = 0
+        self._waiting: deque = deque()
+        self._condition = threading.Condition()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="lambda-builders"
+        )
+
+    @contextmanager
+    def reserve(self, weight: BuildWeight) -> Iterator[None]:
+        """Blocks until weight fits the budget and holds it until the block exits"""
+        cpus = min(weight.cpus, self.cpus)
+        memory_mb = min(weight.memory_mb, self.memory_mb)
+        ticket = object()
+
+        def fits() -> bool:
+            return (
+                self._waiting[0] is ticket
+                and self._used_cpus + cpus <= self.cpus
+                and self._used_memory_mb + memory_mb <= self.memory_mb
+            )
+
+        with self._condition:
+            self._waiting.append(ticket)
+            self._condition.wait_for(fits)
+            self._waiting.popleft()
+            self._used_cpus += cpus
+            self._used_memory_mb += memory_mb
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._used_cpus -= cpus
+                self._used_memory_mb -= memory_mb
+                self._condition.notify_all()
+
+    def run(self, fn: Callable[[], T]) -> Awaitable[T]:
+        """Runs fn on the worker pool without blocking the event loop
+
+        fn runs in a copy of the context run was called in, so context
+        variables such as the current build trace carry over to the worker.
+        """
+        context = contextvars.copy_context()
+
+        async def run_in_pool() -> T:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, context.run, fn
+            )
+
+        return run_in_pool()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_lock = threading.Lock()
+_scheduler: Optional[BuildScheduler] = None
+
+
+def default_cpu_budget() -> float:
+    configured = os.environ.get(CPU_BUDGET_ENV)
+    if configured:
+        return max(0.5, float(configured))
+    return float(os.cpu_count() or 1)
+
+
+def default_memory_budget_mb() -> int:
+    configured = os.environ.get(MEMORY_BUDGET_ENV)
+    if configured:
+        return max(1, int(configured))
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return 4096
+    # Leave room for the Pulumi engine and the language host
+    return max(1024, int(total * 0.75) // (1024 * 1024))
+
+
+def default_max_workers() -> int:
+    configured = os.environ.get(MAX_WORKERS_ENV)
+    if configured:
+        return max(1, int(configured))
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def start_scheduler(
+    cpus: Optional[float] = None,
+    memory_mb: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> BuildScheduler:
+    """Starts the scheduler shared by every build in this process
+
+    Budgets that are not passed are read from PULUMI_LAMBDA_BUILDERS_CPU_BUDGET,
+    PULUMI_LAMBDA_BUILDERS_MEMORY_BUDGET_MB and PULUMI_LAMBDA_BUILDERS_MAX_WORKERS,
+    and default to the number of CPUs and 75% of the physical memory.
+    """
+    global _scheduler
+    with _lock:
+        if _scheduler is not None:
+            _scheduler.shutdown()
+        _scheduler = BuildScheduler(
+            cpus=cpus or default_cpu_budget(),
+            memory_mb=memory_mb or default_memory_budget_mb(),
+            max_workers=max_workers or default_max_workers(),
+        )
+        return _scheduler
+
+
+def get_scheduler() -> BuildScheduler:
+    """Returns the scheduler for this process, starting it if needed"""
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = BuildScheduler(
+                cpus=default_cpu_budget(),
+                memory_mb=default_memory_budget_mb(),
+                max_workers=default_max_workers(),
+            )
+        return _scheduler
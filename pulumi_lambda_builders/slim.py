@@ -0,0 +1,194 @@
+import ast
+import os
+import re
+import shutil
+import subprocess
+from typing import Dict, Iterable, List, Optional, Set
+
+from pulumi_lambda_builders.utils import remove_path, tree_size
+
+RUNTIME_PROVIDED_PACKAGES = ["boto3", "botocore", "s3transfer"]
+"""Packages the Lambda Python runtimes include, removed from the requirements
+by default"""
+
+REMOVED_DIRECTORIES = frozenset({"__pycache__", "tests", "test", "docs", "doc"})
+"""Directories inside installed packages that are not needed at runtime.
+Test and documentation directories that the other modules import are kept,
+e.g. `botocore.docs` is imported by `botocore.client`"""
+
+
+def slim_dependencies(
+    root: str, provided_packages: Optional[Iterable[str]] = None
+) -> int:
+    """Removes what a function does not need from installed requirements
+
+    - Distributions the runtime already provides (RUNTIME_PROVIDED_PACKAGES
+      unless provided_packages is set), with their dist-info.
+    - `__pycache__` directories, whose bytecode was compiled for the
+      interpreter that ran pip rather than the runtime, and test and
+      documentation trees, unless a module outside of them imports them.
+    - The RECORD file of every dist-info, which lists every installed file and
+      is no longer accurate afterwards.
+    - Debug symbols of native extensions, when `strip` is installed.
+
+    Returns the number of bytes removed.
+    """
+    before = tree_size(root)
+    if provided_packages is None:
+        provided_packages = RUNTIME_PROVIDED_PACKAGES
+    provided = {normalize_name(name) for name in provided_packages}
+    strip = shutil.which("strip")
+
+    for dist_info in sorted(os.listdir(root)):
+        if not dist_info.endswith(".dist-info"):
+            continue
+        dist_info_path = os.path.join(root, dist_info)
+        name = normalize_name(dist_info[: -len(".dist-info")].rsplit("-", 1)[0])
+        if name in provided:
+            for top_level in distribution_top_levels(dist_info_path):
+                remove_path(os.path.join(root, top_level))
+            remove_path(dist_info_path)
+        else:
+            remove_path(os.path.join(dist_info_path, "RECORD"))
+
+    for path in unused_directories(root):
+        remove_path(path)
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        if "__pycache__" in dirnames:
+            dirnames.remove("__pycache__")
+            remove_path(os.path.join(dirpath, "__pycache__"))
+        for name in filenames:
+            if strip and re.search(r"\.so(\.\d+)*$", name):
+                strip_debug_symbols(strip, os.path.join(dirpath, name))
+
+    return before - tree_size(root)
+
+
+def unused_directories(root: str) -> List[str]:
+    """Returns the test and documentation directories inside the packages in
+    root that no module outside of them imports
+
+    Imports are found by parsing the modules, so a directory that is only
+    imported dynamically (e.g. with importlib) is removed as well.
+    """
+    candidates: Dict[str, str] = {}
+    for dirpath, dirnames, _ in os.walk(root):
+        for name in [d for d in dirnames if d in REMOVED_DIRECTORIES]:
+            dirnames.remove(name)
+            # Top level directories are packages of their own, e.g. `test`
+            if name != "__pycache__" and dirpath != root:
+                path = os.path.join(dirpath, name)
+                candidates[module_name(root, path)] = path
+
+    imported: Set[str] = set()
+    kept: Set[str] = set()
+    # Start with every module outside of the candidates, then add the modules
+    # of each candidate that turns out to be imported
+    pending = [
+        path
+        for path in python_files(root)
+        if not any(is_inside(path, candidate) for candidate in candidates.values())
+    ]
+    pattern = re.compile(
+        r"\b(" + "|".join(sorted(REMOVED_DIRECTORIES - {"__pycache__"})) + r")\b"
+    )
+    while pending:
+        for path in pending:
+            imported.update(imported_modules(root, path, pattern))
+        pending = []
+        for module, path in candidates.items():
+            if module not in kept and any(
+                name == module or name.startswith(f"{module}.") for name in imported
+            ):
+                kept.add(module)
+                pending.extend(python_files(path))
+    return sorted(path for module, path in candidates.items() if module not in kept)
+
+
+def imported_modules(root: str, path: str, pattern: re.Pattern) -> Set[str]:
+    """Returns the absolute names of the modules the module at path imports
+
+    Modules that do not mention pattern are not parsed.
+    """
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+        if not pattern.search(source.decode("utf-8", "replace")):
+            return set()
+        tree = ast.parse(source)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    # Empty for top level modules, whose directory is root itself
+    package = [p for p in module_name(root, os.path.dirname(path)).split(".") if p]
+    names: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module.split(".") if node.module else []
+            if node.level:
+                base = package[: len(package) - node.level + 1] + base
+            module = ".".join(base)
+            names.add(module)
+            # `from package import module` imports a submodule
+            names.update(f"{module}.{alias.name}" for alias in node.names)
+    return names
+
+
+def python_files(root: str) -> List[str]:
+    return [
+        os.path.join(dirpath, name)
+        for dirpath, _, filenames in os.walk(root)
+        for name in filenames
+        if name.endswith(".py")
+    ]
+
+
+def module_name(root: str, path: str) -> str:
+    return os.path.relpath(path, root).replace(os.sep, ".")
+
+
+def is_inside(path: str, directory: str) -> bool:
+    return path.startswith(directory + os.sep)
+
+
+def distribution_top_levels(dist_info_path: str) -> List[str]:
+    """Returns the top level files and directories a distribution installed"""
+    top_levels: Set[str] = set()
+    for path in recorded_paths(dist_info_path):
+        top_level = path.split("/", 1)[0]
+        # Scripts are recorded relative to the dist-info, e.g. ../../bin
+        if top_level and top_level != ".." and not top_level.endswith(".dist-info"):
+            top_levels.add(top_level)
+    return sorted(top_levels)
+
+
+def recorded_paths(dist_info_path: str) -> List[str]:
+    """Returns the paths in the RECORD of a distribution, relative to the
+    directory it was installed to"""
+    try:
+        with open(os.path.join(dist_info_path, "RECORD")) as f:
+            return [line.split(",", 1)[0] for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def strip_debug_symbols(strip: str, path: str) -> None:
+    """Strips the debug symbols of a shared library in place
+
+    Libraries `strip` cannot handle (e.g. one built for another architecture)
+    are left as they are.
+    """
+    if os.path.islink(path):
+        return
+    subprocess.run(
+        [strip, "--strip-debug", path],
+        capture_output=True,
+        stdin=subprocess.DEVNULL,
+    )
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes a distribution name as described in PEP 503"""
+    return re.sub(r"[-_.]+", "-", name).lower()
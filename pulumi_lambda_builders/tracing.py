@@ -0,0 +1,108 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_FILE_ENV = "PULUMI_LAMBDA_BUILDERS_TRACE_FILE"
+"""Environment variable with the path to write a Chrome trace of the builds to"""
+
+
+class BuildTrace:
+    """The time spent in each phase of the builds of one component
+
+    Phases nest, e.g. `install_dependencies` runs within `build`, so the
+    totals of different phases overlap.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._totals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self._totals[phase] = self._totals.get(phase, 0.0) + seconds
+
+    def totals(self) -> Dict[str, float]:
+        """Returns the seconds spent in each phase so far"""
+        with self._lock:
+            return {phase: round(s, 6) for phase, s in sorted(self._totals.items())}
+
+
+_current: contextvars.ContextVar[Optional[BuildTrace]] = contextvars.ContextVar(
+    "build_trace", default=None
+)
+_events_lock = threading.Lock()
+_events: List[Dict[str, Any]] = []
+
+
+@contextmanager
+def traced(name: str) -> Iterator[BuildTrace]:
+    """Attributes the spans started in the block to the component called name
+
+    Builds submitted to the scheduler in the block keep the trace, since the
+    scheduler runs them in a copy of the current context.
+    """
+    trace = BuildTrace(name)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(phase: str) -> Iterator[None]:
+    """Measures the block as a phase of the current component's build
+
+    The duration is added to the totals of the current BuildTrace, and, when
+    PULUMI_LAMBDA_BUILDERS_TRACE_FILE is set, recorded as a trace event.
+    """
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        trace = _current.get()
+        if trace is not None:
+            trace.add(phase, (end - start) / 1e9)
+        if os.environ.get(TRACE_FILE_ENV):
+            event = {
+                "name": phase,
+                "cat": "build",
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"component": trace.name if trace else None},
+            }
+            with _events_lock:
+                _events.append(event)
+
+
+def flush() -> None:
+    """Writes the events recorded so far to PULUMI_LAMBDA_BUILDERS_TRACE_FILE
+
+    The file is in the Chrome trace event format, which chrome://tracing and
+    Perfetto can open. Every flush rewrites the whole file, so it runs when
+    the process exits and after each batch of builds rather than after every
+    build.
+    """
+    path = os.environ.get(TRACE_FILE_ENV)
+    if not path:
+        return
+    with _events_lock:
+        events = list(_events)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_path, path)
+
+
+atexit.register(flush)
@@ -1,23 +1,111 @@
+import contextvars
 import os
-from typing import Optional
+import shutil
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
 
-def find_up(filename: str, dir: str) -> Optional[str]:
-    print(f"dir: {dir}")
-    if os.path.exists(os.path.join(dir, filename)):
-        return os.path.join(dir, filename)
-    if dir == get_root_directory(dir):
-        return None
-    return find_up(filename, os.path.dirname(dir))
+CACHE_DIR_ENV = "PULUMI_LAMBDA_BUILDERS_CACHE_DIR"
+"""Environment variable used to override the location of the build cache"""
 
+_subprocess_environment: contextvars.ContextVar[Dict[str, str]] = (
+    contextvars.ContextVar("subprocess_environment", default={})
+)
+_popen_lock = threading.Lock()
 
-def get_root_directory(path: str) -> str:
-    # Split the drive and path
-    drive, _ = os.path.splitdrive(path)
+_FICLONE = 0x40049409
+"""The Linux ioctl that makes a file a reflink of another file"""
 
-    # For Unix-like systems, the root is simply '/'
-    if path.startswith("/"):
-        return "/"
 
-    # For Windows, return the drive as the root
-    return drive
+def default_cache_dir() -> str:
+    """Returns the directory used for the build cache
+
+    This is the value of PULUMI_LAMBDA_BUILDERS_CACHE_DIR if it is set, otherwise
+    a `pulumi-lambda-builders` directory in the user cache directory.
+    """
+    configured = os.environ.get(CACHE_DIR_ENV)
+    if configured:
+        return configured
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "pulumi-lambda-builders")
+
+
+def remove_path(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+def tree_size(root: str) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if not os.path.islink(path):
+                size += os.path.getsize(path)
+    return size
+
+
+def clone_tree(src: str, dest: str) -> None:
+    """Recreates the directory tree at src at dest with copies of its files
+
+    On file systems with copy on write (e.g. Btrfs and XFS) the files are
+    reflinks, which share their data with src until either copy is modified.
+    Elsewhere they are plain copies. Either way, editing a file in dest never
+    changes src. Symlinks are recreated, not followed.
+    """
+
+    def clone(src_file: str, dest_file: str) -> None:
+        if fcntl is not None and sys.platform.startswith("linux"):
+            try:
+                with open(src_file, "rb") as s, open(dest_file, "wb") as d:
+                    fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+                shutil.copystat(src_file, dest_file)
+                return
+            except OSError:
+                pass
+        shutil.copy2(src_file, dest_file)
+
+    shutil.copytree(src, dest, symlinks=True, copy_function=clone)
+
+
+class _Popen(subprocess.Popen):
+    """subprocess.Popen that adds the variables of subprocess_environment"""
+
+    def __init__(self, args, *popen_args, **kwargs) -> None:
+        values = _subprocess_environment.get()
+        if values:
+            env = kwargs.get("env")
+            kwargs["env"] = {**values, **(os.environ if env is None else env)}
+        super().__init__(args, *popen_args, **kwargs)
+
+
+@contextmanager
+def subprocess_environment(values: Dict[str, str]) -> Iterator[None]:
+    """Adds environment variables to the subprocesses started while the block
+    runs, e.g. to point a tool at a cache inside the build cache
+
+    The aws_lambda_builders workflows start their tools with a copy of
+    os.environ and take no environment of their own. The values are kept in a
+    context variable instead of os.environ, so they only reach subprocesses
+    started by the current build and not those of builds running on other
+    threads. Variables that are already set for the subprocess are kept.
+    """
+    with _popen_lock:
+        if subprocess.Popen is not _Popen:
+            subprocess.Popen = _Popen  # type: ignore[misc]
+    token = _subprocess_environment.set({**_subprocess_environment.get(), **values})
+    try:
+        yield
+    finally:
+        _subprocess_environment.reset(token)
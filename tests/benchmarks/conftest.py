@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from pulumi_lambda_builders.fingerprint import FileIndex
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skips the benchmarks unless they were asked for
+
+    A plain test run only runs the functional tests. Run the benchmarks with
+    `pytest tests/benchmarks --benchmark-only`.
+    """
+    if config.getoption("benchmark_only", False) or config.getoption(
+        "benchmark_enable", False
+    ):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark-only")
+    for item in items:
+        if str(item.fspath).startswith(BENCHMARKS_DIR):
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def fresh_cache(tmp_path, monkeypatch):
+    """Returns a function that points the build cache at an empty directory
+
+    The function returns None so it can be used as the setup of
+    `benchmark.pedantic`.
+    """
+    for name in [
+        "PIP_CACHE_DIR",
+        "GOCACHE",
+        "GOMODCACHE",
+        "NUGET_PACKAGES",
+        "CARGO_TARGET_DIR",
+    ]:
+        monkeypatch.delenv(name, raising=False)
+    count = 0
+
+    def fresh() -> None:
+        nonlocal count
+        count += 1
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / f"cache{count}"))
+        FileIndex._loaded.clear()
+
+    fresh()
+    return fresh
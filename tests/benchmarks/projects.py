@@ -0,0 +1,260 @@
+"""Generators for synthetic projects of a given size
+
+Every generator writes a project with `files` source files and `dependencies`
+dependencies that can be built without network access: Python dependencies
+are local wheels, Node.js dependencies are packages in node_modules, Go and
+Rust dependencies are local modules and crates, Java and .NET dependencies are
+projects of the same build and Ruby dependencies are path gems.
+"""
+
+import json
+import os
+import time
+import zipfile
+
+
+def write(path: str, contents: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(contents)
+
+
+def age(root: str, seconds: int = 60) -> None:
+    """Moves the mtime of every file below root into the past
+
+    The file index does not record files modified in the last few seconds, so
+    freshly generated projects would be hashed again on every run.
+    """
+    past = time.time() - seconds
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (past, past))
+
+
+def source_tree(root: str, files: int, extension: str, line: str) -> None:
+    """Writes files source files spread over directories of 100 files each"""
+    for i in range(files):
+        write(
+            os.path.join(root, f"pkg{i // 100}", f"module{i}{extension}"),
+            line.format(i=i) * 20,
+        )
+
+
+def python_wheel(wheels_dir: str, name: str) -> str:
+    """Writes a pure Python wheel for a package called name"""
+    path = os.path.join(wheels_dir, f"{name}-1.0.0-py3-none-any.whl")
+    dist_info = f"{name}-1.0.0.dist-info"
+    os.makedirs(wheels_dir, exist_ok=True)
+    with zipfile.ZipFile(path, "w") as wheel:
+        wheel.writestr(f"{name}/__init__.py", f"NAME = {name!r}\n" * 50)
+        wheel.writestr(
+            f"{dist_info}/METADATA",
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0.0\n",
+        )
+        wheel.writestr(
+            f"{dist_info}/WHEEL",
+            "Wheel-Version: 1.0\nGenerator: benchmarks\n"
+            "Root-Is-Purelib: true\nTag: py3-none-any\n",
+        )
+        wheel.writestr(
+            f"{dist_info}/RECORD",
+            f"{name}/__init__.py,,\n{dist_info}/METADATA,,\n"
+            f"{dist_info}/WHEEL,,\n{dist_info}/RECORD,,\n",
+        )
+    return path
+
+
+def python_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the code directory of a synthetic Python project"""
+    code = os.path.join(root, "app")
+    write(os.path.join(code, "main.py"), "def handler(event, context):\n    pass\n")
+    source_tree(code, files, ".py", "VALUE_{i} = {i}\n")
+    wheels = [
+        python_wheel(os.path.join(root, "wheels"), f"dep{i}")
+        for i in range(dependencies)
+    ]
+    write(
+        os.path.join(code, "requirements.txt"),
+        "".join(f"{wheel}\n" for wheel in wheels),
+    )
+    return code
+
+
+def nodejs_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the entry file of a synthetic Node.js project"""
+    write(os.path.join(root, "package.json"), json.dumps({"name": "bench"}))
+    source_tree(root, files, ".ts", "export const value{i} = {i};\n")
+    imports = [f'import "./pkg{i // 100}/module{i}";\n' for i in range(files)]
+    for i in range(dependencies):
+        package = os.path.join(root, "node_modules", f"dep{i}")
+        write(
+            os.path.join(package, "package.json"),
+            json.dumps({"name": f"dep{i}", "version": "1.0.0", "main": "index.js"}),
+        )
+        write(os.path.join(package, "index.js"), f"exports.dep{i} = {i};\n" * 50)
+        imports.append(f'import "dep{i}";\n')
+    os.makedirs(os.path.join(root, "node_modules"), exist_ok=True)
+    entry = os.path.join(root, "index.ts")
+    write(entry, "".join(imports) + "export const handler = async () => {};\n")
+    return entry
+
+
+def go_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the directory of a synthetic Go module"""
+    requires = []
+    for i in range(dependencies):
+        module = os.path.join(root, "deps", f"dep{i}")
+        write(os.path.join(module, "go.mod"), f"module example.com/dep{i}\n\ngo 1.20\n")
+        write(
+            os.path.join(module, f"dep{i}.go"),
+            f"package dep{i}\n\nconst Value = {i}\n",
+        )
+        requires.append(f"example.com/dep{i}")
+    write(
+        os.path.join(root, "go.mod"),
+        "module example.com/bench\n\ngo 1.20\n\n"
+        + "".join(f"require {r} v0.0.0\n" for r in requires)
+        + "".join(f"replace {r} => ./deps/{os.path.basename(r)}\n" for r in requires),
+    )
+    for i in range(files):
+        write(
+            os.path.join(root, f"file{i}.go"),
+            f"package main\n\nconst value{i} = {i}\n",
+        )
+    imports = "".join(f'\t_ "{r}"\n' for r in requires)
+    write(
+        os.path.join(root, "main.go"),
+        (
+            f"package main\n\nimport (\n{imports})\n\nfunc main() {{}}\n"
+            if requires
+            else "package main\n\nfunc main() {}\n"
+        ),
+    )
+    return root
+
+
+def java_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the directory of a synthetic Gradle project"""
+    deps = [f"dep{i}" for i in range(dependencies)]
+    write(
+        os.path.join(root, "settings.gradle"),
+        "rootProject.name = 'bench'\n" + "".join(f"include '{d}'\n" for d in deps),
+    )
+    write(
+        os.path.join(root, "build.gradle"),
+        "plugins { id 'java' }\n\ndependencies {\n"
+        + "".join(f"    implementation project(':{d}')\n" for d in deps)
+        + "}\n",
+    )
+    for i, dep in enumerate(deps):
+        write(os.path.join(root, dep, "build.gradle"), "plugins { id 'java' }\n")
+        write(
+            os.path.join(root, dep, f"src/main/java/{dep}/Dep.java"),
+            f"package {dep};\n\npublic class Dep {{ public static final int VALUE = {i}; }}\n",
+        )
+    for i in range(files):
+        write(
+            os.path.join(root, f"src/main/java/pkg{i // 100}/Module{i}.java"),
+            f"package pkg{i // 100};\n\n"
+            f"public class Module{i} {{ public static final int VALUE = {i}; }}\n",
+        )
+    write(
+        os.path.join(root, "src/main/java/bench/Handler.java"),
+        "package bench;\n\npublic class Handler {\n"
+        '    public String handleRequest(Object event) { return "ok"; }\n}\n',
+    )
+    return root
+
+
+def rust_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the directory of a synthetic Cargo package"""
+    deps = [f"dep{i}" for i in range(dependencies)]
+    write(
+        os.path.join(root, "Cargo.toml"),
+        '[package]\nname = "bench"\nversion = "0.1.0"\nedition = "2021"\n\n'
+        "[dependencies]\n" + "".join(f'{d} = {{ path = "deps/{d}" }}\n' for d in deps),
+    )
+    for i, dep in enumerate(deps):
+        write(
+            os.path.join(root, "deps", dep, "Cargo.toml"),
+            f'[package]\nname = "{dep}"\nversion = "0.1.0"\nedition = "2021"\n',
+        )
+        write(
+            os.path.join(root, "deps", dep, "src/lib.rs"),
+            f"pub const VALUE: i32 = {i};\n",
+        )
+    for i in range(files):
+        write(
+            os.path.join(root, "src", f"module{i}.rs"),
+            f"pub const VALUE: i32 = {i};\n",
+        )
+    write(
+        os.path.join(root, "src/main.rs"),
+        "".join(f"mod module{i};\n" for i in range(files))
+        + "".join(f"use {d} as _;\n" for d in deps)
+        + "\nfn main() {}\n",
+    )
+    return root
+
+
+def dotnet_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the directory of a synthetic .NET project"""
+    deps = [f"Dep{i}" for i in range(dependencies)]
+    project = os.path.join(root, "Bench")
+    write(
+        os.path.join(project, "Bench.csproj"),
+        '<Project Sdk="Microsoft.NET.Sdk">\n'
+        "  <PropertyGroup><TargetFramework>net8.0</TargetFramework></PropertyGroup>\n"
+        "  <ItemGroup>\n"
+        + "".join(
+            f'    <ProjectReference Include="../{d}/{d}.csproj" />\n' for d in deps
+        )
+        + "  </ItemGroup>\n</Project>\n",
+    )
+    for i, dep in enumerate(deps):
+        write(
+            os.path.join(root, dep, f"{dep}.csproj"),
+            '<Project Sdk="Microsoft.NET.Sdk">\n'
+            "  <PropertyGroup><TargetFramework>net8.0</TargetFramework></PropertyGroup>\n"
+            "</Project>\n",
+        )
+        write(
+            os.path.join(root, dep, "Dep.cs"),
+            f"namespace {dep};\n\npublic static class Dep {{ public const int Value = {i}; }}\n",
+        )
+    for i in range(files):
+        write(
+            os.path.join(project, f"Pkg{i // 100}", f"Module{i}.cs"),
+            f"namespace Bench.Pkg{i // 100};\n\n"
+            f"public static class Module{i} {{ public const int Value = {i}; }}\n",
+        )
+    write(
+        os.path.join(project, "Function.cs"),
+        "namespace Bench;\n\n"
+        "public class Function { public string Handler(string input) => input; }\n",
+    )
+    return project
+
+
+def ruby_project(root: str, files: int, dependencies: int) -> str:
+    """Returns the directory of a synthetic Ruby project"""
+    deps = [f"dep{i}" for i in range(dependencies)]
+    write(
+        os.path.join(root, "Gemfile"),
+        'source "https://rubygems.org"\n'
+        + "".join(f'gem "{d}", path: "deps/{d}"\n' for d in deps),
+    )
+    for i, dep in enumerate(deps):
+        write(
+            os.path.join(root, "deps", dep, f"{dep}.gemspec"),
+            "Gem::Specification.new do |s|\n"
+            f'  s.name = "{dep}"\n  s.version = "1.0.0"\n  s.summary = "{dep}"\n'
+            f'  s.authors = ["bench"]\n  s.files = ["lib/{dep}.rb"]\nend\n',
+        )
+        write(os.path.join(root, "deps", dep, f"lib/{dep}.rb"), f"DEP{i} = {i}\n")
+    source_tree(os.path.join(root, "lib"), files, ".rb", "VALUE_{i} = {i}\n")
+    write(
+        os.path.join(root, "app.rb"),
+        "def handler(event:, context:)\n  {}\nend\n",
+    )
+    return root
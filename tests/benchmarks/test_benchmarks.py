@@ -0,0 +1,252 @@
+import os
+import shutil
+
+import pytest
+
+from pulumi_lambda_builders.archive import write_zip
+from pulumi_lambda_builders.build_dotnet import BuildDotnetArgs, build_dotnet
+from pulumi_lambda_builders.build_go import BuildGoArgs, build_go
+from pulumi_lambda_builders.build_java import BuildJavaArgs, build_java
+from pulumi_lambda_builders.build_nodejs import BuildNodejsArgs, build_nodejs
+from pulumi_lambda_builders.build_python import BuildPythonArgs, build_python
+from pulumi_lambda_builders.build_ruby import BuildRubyArgs, build_ruby
+from pulumi_lambda_builders.build_rust import BuildRustArgs, build_rust
+from pulumi_lambda_builders.fingerprint import hash_tree
+
+from .projects import (
+    age,
+    dotnet_project,
+    go_project,
+    java_project,
+    nodejs_project,
+    python_project,
+    ruby_project,
+    rust_project,
+    source_tree,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [(10, 0), (100, 5), (1000, 20)]
+"""(source files, dependencies) of the synthetic projects"""
+
+requires_go = pytest.mark.skipif(not shutil.which("go"), reason="go is not installed")
+requires_esbuild = pytest.mark.skipif(
+    not shutil.which("esbuild"), reason="esbuild is not installed"
+)
+requires_gradle = pytest.mark.skipif(
+    not (shutil.which("gradlew") or shutil.which("gradle")),
+    reason="gradle is not installed",
+)
+requires_cargo_lambda = pytest.mark.skipif(
+    not shutil.which("cargo-lambda"), reason="cargo-lambda is not installed"
+)
+requires_dotnet_lambda = pytest.mark.skipif(
+    not (shutil.which("dotnet") and shutil.which("dotnet-lambda")),
+    reason="dotnet and Amazon.Lambda.Tools are not installed",
+)
+requires_bundler = pytest.mark.skipif(
+    not shutil.which("bundle"), reason="bundler is not installed"
+)
+
+
+def size_id(size):
+    return f"{size[0]}files-{size[1]}deps"
+
+
+@pytest.fixture
+def tree(tmp_path, request):
+    root = str(tmp_path / "tree")
+    source_tree(root, request.param, ".py", "VALUE_{i} = {i}\n")
+    age(root)
+    return root
+
+
+@pytest.mark.benchmark(group="hash_tree")
+@pytest.mark.parametrize("tree", [100, 1000, 5000], indirect=True)
+def test_hash_tree_cold(benchmark, fresh_cache, tree):
+    benchmark.pedantic(hash_tree, args=(tree,), setup=fresh_cache, rounds=5)
+
+
+@pytest.mark.benchmark(group="hash_tree")
+@pytest.mark.parametrize("tree", [100, 1000, 5000], indirect=True)
+def test_hash_tree_warm(benchmark, fresh_cache, tree):
+    hash_tree(tree)
+    benchmark(hash_tree, tree)
+
+
+@pytest.mark.benchmark(group="write_zip")
+@pytest.mark.parametrize("tree", [100, 1000, 5000], indirect=True)
+def test_write_zip(benchmark, tmp_path, tree):
+    zip_path = str(tmp_path / "tree.zip")
+
+    def setup():
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+
+    benchmark.pedantic(write_zip, args=(tree, zip_path), setup=setup, rounds=5)
+
+
+@pytest.fixture
+def python_args(tmp_path, request):
+    files, dependencies = request.param
+    code = python_project(str(tmp_path / "project"), files, dependencies)
+    age(code)
+    return BuildPythonArgs(code=code, runtime="python3.12", architecture="x86_64")
+
+
+@pytest.mark.benchmark(group="build_python")
+@pytest.mark.parametrize("python_args", SIZES, ids=size_id, indirect=True)
+def test_build_python_cold(benchmark, fresh_cache, python_args):
+    benchmark.pedantic(build_python, args=(python_args,), setup=fresh_cache, rounds=3)
+
+
+@pytest.mark.benchmark(group="build_python")
+@pytest.mark.parametrize("python_args", SIZES, ids=size_id, indirect=True)
+def test_build_python_warm(benchmark, fresh_cache, python_args):
+    build_python(python_args)
+    benchmark(build_python, python_args)
+
+
+@pytest.fixture
+def go_args(tmp_path, request):
+    files, dependencies = request.param
+    code = go_project(str(tmp_path / "project"), files, dependencies)
+    age(code)
+    return BuildGoArgs(code=code, architecture="x86_64")
+
+
+@requires_go
+@pytest.mark.benchmark(group="build_go")
+@pytest.mark.parametrize("go_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_go_cold(benchmark, fresh_cache, go_args, tmp_path, monkeypatch):
+    # Keep Go's compiler cache outside of the fresh build caches, so the cold
+    # builds measure a changed project rather than a compiler without a cache
+    monkeypatch.setenv("GOCACHE", str(tmp_path / "gocache"))
+    build_go(go_args)
+    benchmark.pedantic(build_go, args=(go_args,), setup=fresh_cache, rounds=3)
+
+
+@requires_go
+@pytest.mark.benchmark(group="build_go")
+@pytest.mark.parametrize("go_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_go_warm(benchmark, fresh_cache, go_args):
+    build_go(go_args)
+    benchmark(build_go, go_args)
+
+
+@pytest.fixture
+def nodejs_args(tmp_path, request):
+    files, dependencies = request.param
+    root = str(tmp_path / "project")
+    entry = nodejs_project(root, files, dependencies)
+    age(root)
+    return BuildNodejsArgs(entry=entry, runtime="nodejs18.x")
+
+
+@requires_esbuild
+@pytest.mark.benchmark(group="build_nodejs")
+@pytest.mark.parametrize("nodejs_args", SIZES, ids=size_id, indirect=True)
+def test_build_nodejs_cold(benchmark, fresh_cache, nodejs_args):
+    benchmark.pedantic(build_nodejs, args=(nodejs_args,), setup=fresh_cache, rounds=3)
+
+
+@requires_esbuild
+@pytest.mark.benchmark(group="build_nodejs")
+@pytest.mark.parametrize("nodejs_args", SIZES, ids=size_id, indirect=True)
+def test_build_nodejs_warm(benchmark, fresh_cache, nodejs_args):
+    build_nodejs(nodejs_args)
+    benchmark(build_nodejs, nodejs_args)
+
+
+@pytest.fixture
+def java_args(tmp_path, request):
+    files, dependencies = request.param
+    code = java_project(str(tmp_path / "project"), files, dependencies)
+    age(code)
+    return BuildJavaArgs(code=code, runtime="java21", architecture="x86_64")
+
+
+@requires_gradle
+@pytest.mark.benchmark(group="build_java")
+@pytest.mark.parametrize("java_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_java_cold(benchmark, fresh_cache, java_args):
+    benchmark.pedantic(build_java, args=(java_args,), setup=fresh_cache, rounds=3)
+
+
+@requires_gradle
+@pytest.mark.benchmark(group="build_java")
+@pytest.mark.parametrize("java_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_java_warm(benchmark, fresh_cache, java_args):
+    build_java(java_args)
+    benchmark(build_java, java_args)
+
+
+@pytest.fixture
+def rust_args(tmp_path, request):
+    files, dependencies = request.param
+    code = rust_project(str(tmp_path / "project"), files, dependencies)
+    age(code)
+    return BuildRustArgs(code=code, architecture="x86_64")
+
+
+@requires_cargo_lambda
+@pytest.mark.benchmark(group="build_rust")
+@pytest.mark.parametrize("rust_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_rust_cold(benchmark, fresh_cache, rust_args):
+    benchmark.pedantic(build_rust, args=(rust_args,), setup=fresh_cache, rounds=3)
+
+
+@requires_cargo_lambda
+@pytest.mark.benchmark(group="build_rust")
+@pytest.mark.parametrize("rust_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_rust_warm(benchmark, fresh_cache, rust_args):
+    build_rust(rust_args)
+    benchmark(build_rust, rust_args)
+
+
+@pytest.fixture
+def dotnet_args(tmp_path, request):
+    files, dependencies = request.param
+    root = str(tmp_path / "project")
+    code = dotnet_project(root, files, dependencies)
+    age(root)
+    return BuildDotnetArgs(code=code, runtime="dotnet8", architecture="x86_64")
+
+
+@requires_dotnet_lambda
+@pytest.mark.benchmark(group="build_dotnet")
+@pytest.mark.parametrize("dotnet_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_dotnet_cold(benchmark, fresh_cache, dotnet_args):
+    benchmark.pedantic(build_dotnet, args=(dotnet_args,), setup=fresh_cache, rounds=3)
+
+
+@requires_dotnet_lambda
+@pytest.mark.benchmark(group="build_dotnet")
+@pytest.mark.parametrize("dotnet_args", SIZES[:2], ids=size_id, indirect=True)
+def test_build_dotnet_warm(benchmark, fresh_cache, dotnet_args):
+    build_dotnet(dotnet_args)
+    benchmark(build_dotnet, dotnet_args)
+
+
+@pytest.fixture
+def ruby_args(tmp_path, request):
+    files, dependencies = request.param
+    code = ruby_project(str(tmp_path / "project"), files, dependencies)
+    age(code)
+    return BuildRubyArgs(code=code, runtime="ruby3.3", architecture="x86_64")
+
+
+@requires_bundler
+@pytest.mark.benchmark(group="build_ruby")
+@pytest.mark.parametrize("ruby_args", SIZES, ids=size_id, indirect=True)
+def test_build_ruby_cold(benchmark, fresh_cache, ruby_args):
+    benchmark.pedantic(build_ruby, args=(ruby_args,), setup=fresh_cache, rounds=3)
+
+
+@requires_bundler
+@pytest.mark.benchmark(group="build_ruby")
+@pytest.mark.parametrize("ruby_args", SIZES, ids=size_id, indirect=True)
+def test_build_ruby_warm(benchmark, fresh_cache, ruby_args):
+    build_ruby(ruby_args)
+    benchmark(build_ruby, ruby_args)
@@ -0,0 +1,39 @@
+import os
+import time
+import zipfile
+
+from pulumi_lambda_builders.archive import ZIP_EPOCH, write_zip
+
+
+def create_artifact(root):
+    os.makedirs(root / "lib", exist_ok=True)
+    (root / "index.js").write_text("exports.handler = () => {}")
+    (root / "lib" / "util.js").write_text("module.exports = {}")
+    (root / "bootstrap").write_text("#!/bin/sh")
+    os.chmod(root / "bootstrap", 0o700)
+
+
+def test_write_zip_is_reproducible(tmp_path):
+    create_artifact(tmp_path / "a")
+    first = write_zip(str(tmp_path / "a"), str(tmp_path / "first.zip"))
+
+    time.sleep(0.01)
+    create_artifact(tmp_path / "b")
+    os.utime(tmp_path / "b" / "index.js", (0, 0))
+    second = write_zip(str(tmp_path / "b"), str(tmp_path / "second.zip"))
+
+    with open(first, "rb") as f1, open(second, "rb") as f2:
+        assert f1.read() == f2.read()
+
+
+def test_write_zip_normalizes_entries(tmp_path):
+    create_artifact(tmp_path / "src")
+    os.chmod(tmp_path / "src" / "index.js", 0o600)
+    zip_path = write_zip(str(tmp_path / "src"), str(tmp_path / "out.zip"))
+
+    with zipfile.ZipFile(zip_path) as zf:
+        infos = zf.infolist()
+        assert [i.filename for i in infos] == ["bootstrap", "index.js", "lib/util.js"]
+        modes = {i.filename: (i.external_attr >> 16) & 0o777 for i in infos}
+        assert modes == {"bootstrap": 0o755, "index.js": 0o644, "lib/util.js": 0o644}
+        assert all(i.date_time == ZIP_EPOCH for i in infos)
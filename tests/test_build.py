@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pulumi
+import pytest
+
+from pulumi_lambda_builders import scheduler
+from pulumi_lambda_builders.build import PreparedBuild
+from pulumi_lambda_builders.build_go import BuildGo, BuildGoArgs, build_go
+from pulumi_lambda_builders.cache import get_cache
+from pulumi_lambda_builders.scheduler import HEAVY, LIGHT, BuildScheduler
+from pulumi_lambda_builders.tracing import TRACE_FILE_ENV, flush
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+
+class Mocks(pulumi.runtime.Mocks):
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        return [f"{args.name}_id", args.inputs]
+
+    def call(self, args: pulumi.runtime.MockCallArgs):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def code(tmp_path):
+    code = tmp_path / "src"
+    os.makedirs(code)
+    (code / "main.go").write_text("package main")
+    return str(code)
+
+
+def fake_build(**kwargs):
+    with open(os.path.join(kwargs["artifacts_dir"], "bootstrap"), "w") as f:
+        f.write("binary")
+
+
+@pytest.fixture
+def mock_build():
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ) as mock_build:
+        yield mock_build
+
+
+def set_mocks(preview: bool):
+    pulumi.runtime.set_mocks(Mocks(), preview=preview)
+
+
+@pulumi.runtime.test
+def test_preview_does_not_build(code, mock_build):
+    set_mocks(preview=True)
+    component = BuildGo("go", BuildGoArgs(code=code))
+    mock_build.assert_not_called()
+
+    async def check():
+        assert not await component.asset.is_known()
+        assert len(await component.fingerprint.future()) == 64
+
+    return pulumi.Output.from_input(check())
+
+
+@pulumi.runtime.test
+def test_preview_uses_cached_asset(code, mock_build):
+    built = build_go(BuildGoArgs(code=code))
+    mock_build.reset_mock()
+
+    set_mocks(preview=True)
+    previewed = BuildGo("previewed", BuildGoArgs(code=code))
+    mock_build.assert_not_called()
+
+    def check(asset):
+        assert asset.path == built.path
+
+    return previewed.asset.apply(check)
+
+
+@pulumi.runtime.test
+def test_components_build_concurrently(tmp_path, monkeypatch, mock_build):
+    monkeypatch.setattr(
+        scheduler, "_scheduler", BuildScheduler(cpus=3, memory_mb=4096, max_workers=3)
+    )
+    set_mocks(preview=False)
+    barrier = threading.Barrier(3, timeout=10)
+
+    def build(**kwargs):
+        # Only passes if all three builds are running at the same time
+        barrier.wait()
+        fake_build(**kwargs)
+
+    mock_build.side_effect = build
+    components = []
+    for i in range(3):
+        code = tmp_path / f"src{i}"
+        os.makedirs(code)
+        (code / "main.go").write_text(f"package main // {i}")
+        components.append(BuildGo(f"go{i}", BuildGoArgs(code=str(code))))
+
+    def check(assets):
+        assert len({asset.path for asset in assets}) == 3
+
+    return pulumi.Output.all(*[c.asset for c in components]).apply(check)
+
+
+def test_builds_waiting_for_a_workspace_hold_no_budget(monkeypatch):
+    monkeypatch.setattr(
+        scheduler, "_scheduler", BuildScheduler(cpus=1, memory_mb=1024, max_workers=4)
+    )
+
+    def build(artifacts_dir: str, scratch_dir: str) -> None:
+        pass
+
+    waiting = PreparedBuild("waiting", build, weight=HEAVY, workspace="shared")
+    other = PreparedBuild("other", build, weight=HEAVY)
+    with get_cache().workspace("shared"):
+        waiting_thread = threading.Thread(target=waiting.run)
+        waiting_thread.start()
+        waiting_thread.join(timeout=0.2)
+        assert waiting_thread.is_alive()
+
+        # Only finishes if the waiting build did not reserve the budget
+        other_thread = threading.Thread(target=other.run)
+        other_thread.start()
+        other_thread.join(timeout=10)
+        assert not other_thread.is_alive()
+
+    waiting_thread.join(timeout=10)
+    assert not waiting_thread.is_alive()
+
+
+def test_shared_builds_do_not_deadlock_with_builds_that_nest_them(monkeypatch):
+    monkeypatch.setattr(
+        scheduler, "_scheduler", BuildScheduler(cpus=0.5, memory_mb=512, max_workers=4)
+    )
+    reserved = threading.Event()
+
+    def install(artifacts_dir: str, scratch_dir: str) -> None:
+        pass
+
+    def build(artifacts_dir: str, scratch_dir: str) -> None:
+        reserved.set()
+        # Give the shared build time to start while the budget is used up
+        time.sleep(0.5)
+        get_cache().build("dependencies", install)
+
+    dependencies = PreparedBuild("dependencies", install, weight=LIGHT)
+    function = PreparedBuild("function", build, weight=LIGHT)
+    function_thread = threading.Thread(target=function.run, daemon=True)
+    function_thread.start()
+    assert reserved.wait(timeout=10)
+    dependencies_thread = threading.Thread(target=dependencies.run_shared, daemon=True)
+    dependencies_thread.start()
+
+    function_thread.join(timeout=10)
+    dependencies_thread.join(timeout=10)
+    assert not function_thread.is_alive()
+    assert not dependencies_thread.is_alive()
+
+
+@pulumi.runtime.test
+def test_component_timings_and_trace_file(tmp_path, monkeypatch, code, mock_build):
+    trace_file = tmp_path / "trace.json"
+    monkeypatch.setenv(TRACE_FILE_ENV, str(trace_file))
+    set_mocks(preview=False)
+    component = BuildGo("traced", BuildGoArgs(code=code, zip_archive=True))
+
+    def check(timings):
+        assert {"hash", "queue", "build", "compile", "archive"} <= set(timings)
+        assert timings["build"] >= timings["compile"]
+
+        # Single components write the trace file when the program exits
+        assert not trace_file.exists()
+        flush()
+        with open(trace_file) as f:
+            events = json.load(f)["traceEvents"]
+        compile_events = [e for e in events if e["name"] == "compile"]
+        assert len(compile_events) == 1
+        assert compile_events[0]["ph"] == "X"
+        assert compile_events[0]["args"] == {"component": "traced"}
+
+    return component.timings.apply(check)
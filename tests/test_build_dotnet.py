@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pulumi
+import pytest
+
+from pulumi_lambda_builders import build_dotnet as build_dotnet_module
+from pulumi_lambda_builders.build_dotnet import BuildDotnetArgs, build_dotnet
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.setenv("NUGET_PACKAGES", str(tmp_path / "nuget"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def code(tmp_path):
+    code = tmp_path / "src"
+    os.makedirs(code)
+    (code / "Function.csproj").write_text("<Project />")
+    return str(code)
+
+
+def fake_build(**kwargs):
+    # dotnet is started with the environment of the process
+    nuget_packages = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.environ['NUGET_PACKAGES'])"],
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    with open(os.path.join(kwargs["artifacts_dir"], "nuget_packages"), "w") as f:
+        f.write(nuget_packages)
+    with open(os.path.join(kwargs["artifacts_dir"], "bootstrap"), "w") as f:
+        f.write("binary")
+
+
+@pytest.fixture
+def mock_build():
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ) as mock_build:
+        yield mock_build
+
+
+def test_ready_to_run(code, mock_build, cache_dir, monkeypatch):
+    monkeypatch.delenv("NUGET_PACKAGES")
+    asset = build_dotnet(
+        BuildDotnetArgs(
+            code=code,
+            runtime="dotnet8",
+            architecture="arm64",
+            publish_mode="ready_to_run",
+            build_options={"--msbuild-parameters": "/p:Version=1.2.3"},
+        )
+    )
+
+    options = mock_build.call_args.kwargs["options"]
+    assert options == {
+        "--msbuild-parameters": "--runtime linux-arm64 /p:PublishReadyToRun=true /p:Version=1.2.3"
+    }
+    with open(os.path.join(asset.path, "nuget_packages")) as f:
+        assert f.read() == os.path.join(cache_dir, "nuget")
+    assert "NUGET_PACKAGES" not in os.environ
+
+
+def test_existing_nuget_packages_is_kept(code, mock_build, tmp_path):
+    asset = build_dotnet(BuildDotnetArgs(code=code, runtime="dotnet8"))
+
+    with open(os.path.join(asset.path, "nuget_packages")) as f:
+        assert f.read() == str(tmp_path / "nuget")
+
+
+def test_default_mode_passes_build_options_through(code, mock_build):
+    build_dotnet(
+        BuildDotnetArgs(
+            code=code, runtime="dotnet8", build_options={"--configuration": "Release"}
+        )
+    )
+
+    assert mock_build.call_args.kwargs["options"] == {"--configuration": "Release"}
+
+
+def test_native_aot(code, mock_build, monkeypatch):
+    monkeypatch.setattr(build_dotnet_module.platform, "system", lambda: "Linux")
+    monkeypatch.setattr(build_dotnet_module.platform, "machine", lambda: "x86_64")
+
+    build_dotnet(
+        BuildDotnetArgs(code=code, runtime="provided.al2023", publish_mode="native_aot")
+    )
+
+    assert mock_build.call_args.kwargs["runtime"] == "provided.al2023"
+    assert mock_build.call_args.kwargs["options"] == {
+        "--msbuild-parameters": "--runtime linux-x64 /p:PublishAot=true /p:StripSymbols=true",
+        "--function-runtime": "provided.al2023",
+    }
+
+
+def test_publish_mode_is_part_of_the_fingerprint(code, mock_build):
+    build_dotnet(BuildDotnetArgs(code=code, runtime="dotnet8"))
+    build_dotnet(BuildDotnetArgs(code=code, runtime="dotnet8", publish_mode="default"))
+    assert mock_build.call_count == 1
+
+    build_dotnet(
+        BuildDotnetArgs(code=code, runtime="dotnet8", publish_mode="ready_to_run")
+    )
+    assert mock_build.call_count == 2
+
+
+def test_native_aot_validates_runtime_and_architecture(code, mock_build, monkeypatch):
+    monkeypatch.setattr(build_dotnet_module.platform, "system", lambda: "Linux")
+    monkeypatch.setattr(build_dotnet_module.platform, "machine", lambda: "x86_64")
+
+    with pytest.raises(pulumi.InputPropertiesError) as err:
+        build_dotnet(
+            BuildDotnetArgs(
+                code=code,
+                runtime="dotnet8",
+                architecture="arm64",
+                publish_mode="native_aot",
+            )
+        )
+
+    assert {e["property_path"] for e in err.value.errors} == {
+        "runtime",
+        "architecture",
+    }
+    mock_build.assert_not_called()
+
+
+def test_ready_to_run_requires_a_dotnet_runtime(code, mock_build):
+    with pytest.raises(pulumi.InputPropertiesError) as err:
+        build_dotnet(
+            BuildDotnetArgs(
+                code=code, runtime="provided.al2023", publish_mode="ready_to_run"
+            )
+        )
+
+    assert [e["property_path"] for e in err.value.errors] == ["runtime"]
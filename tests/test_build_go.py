@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from pulumi_lambda_builders.build_go import (
+    BuildGoArgs,
+    BuildGoHandlersArgs,
+    build_go,
+    build_go_handlers,
+)
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.setenv("GOCACHE", str(tmp_path / "go/build"))
+    monkeypatch.setenv("GOMODCACHE", str(tmp_path / "go/mod"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def module(tmp_path):
+    module = tmp_path / "module"
+    os.makedirs(module / "internal/greet")
+    (module / "go.mod").write_text("module example.com/handlers\n\ngo 1.20\n")
+    (module / "internal/greet/greet.go").write_text(
+        'package greet\n\nfunc Hello() string { return "hello" }\n'
+    )
+    for name in ["get", "put"]:
+        os.makedirs(module / "cmd" / name)
+        (module / "cmd" / name / "main.go").write_text(
+            "package main\n\n"
+            'import "example.com/handlers/internal/greet"\n\n'
+            "func main() { println(greet.Hello()) }\n"
+        )
+    return module
+
+
+def go_env(name: str) -> str:
+    """Returns a variable as seen by a subprocess like the ones the go
+    workflow starts"""
+    return subprocess.run(
+        [sys.executable, "-c", f"import os; print(os.environ.get({name!r}))"],
+        env=dict(os.environ),
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def test_go_caches_are_kept_in_the_build_cache(cache_dir, module, monkeypatch):
+    monkeypatch.delenv("GOCACHE")
+    monkeypatch.delenv("GOMODCACHE")
+    environments = []
+
+    def build(**kwargs):
+        environments.append((go_env("GOCACHE"), go_env("GOMODCACHE")))
+        with open(os.path.join(kwargs["artifacts_dir"], "bootstrap"), "w") as f:
+            f.write("binary")
+
+    with patch("aws_lambda_builders.builder.LambdaBuilder.build", side_effect=build):
+        build_go(BuildGoArgs(code=str(module / "cmd/get")))
+
+    [(gocache, gomodcache)] = environments
+    assert gocache.startswith(str(cache_dir))
+    assert gomodcache.startswith(str(cache_dir))
+    assert "GOCACHE" not in os.environ
+    assert "GOMODCACHE" not in os.environ
+
+
+def test_existing_go_caches_are_kept(tmp_path, module):
+    environments = []
+
+    def build(**kwargs):
+        environments.append(go_env("GOCACHE"))
+        with open(os.path.join(kwargs["artifacts_dir"], "bootstrap"), "w") as f:
+            f.write("binary")
+
+    with patch("aws_lambda_builders.builder.LambdaBuilder.build", side_effect=build):
+        build_go(BuildGoArgs(code=str(module / "cmd/get")))
+
+    assert environments == [str(tmp_path / "go/build")]
+
+
+@pytest.mark.skipif(not shutil.which("go"), reason="go is not installed")
+def test_handlers_are_built_in_one_go_build(cache_dir, module, monkeypatch):
+    monkeypatch.delenv("GOCACHE")
+    assets = build_go_handlers(BuildGoHandlersArgs(code=str(module)))
+
+    assert sorted(assets) == ["get", "put"]
+    for asset in assets.values():
+        assert os.listdir(asset.path) == ["bootstrap"]
+        with open(os.path.join(asset.path, "bootstrap"), "rb") as f:
+            assert f.read(4) == b"\x7fELF"
+    assert os.path.isdir(os.path.join(cache_dir, "go", "build"))
+
+
+def test_handler_names_must_be_unique(module):
+    os.makedirs(module / "tools/get")
+    with pytest.raises(ValueError, match="Handler names must be unique"):
+        build_go_handlers(
+            BuildGoHandlersArgs(code=str(module), handlers=["cmd/get", "tools/get"])
+        )
@@ -0,0 +1,97 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from aws_lambda_builders.exceptions import WorkflowFailedError
+
+from pulumi_lambda_builders.build_java import BuildJavaArgs, build_java
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def code(tmp_path):
+    code = tmp_path / "src"
+    os.makedirs(code / "src/main/java")
+    (code / "build.gradle").write_text("plugins { id 'java' }")
+    (code / "src/main/java/Handler.java").write_text("class Handler {}")
+    return code
+
+
+def fake_gradle_build(**kwargs):
+    with open(os.path.join(kwargs["artifacts_dir"], "Handler.class"), "w") as f:
+        f.write("class")
+
+
+def launcher(call) -> str:
+    [bin_dir] = call.kwargs["executable_search_paths"]
+    with open(os.path.join(bin_dir, "gradlew")) as f:
+        return f.read()
+
+
+@patch("pulumi_lambda_builders.java.shutil.which", return_value="/usr/bin/gradle")
+@patch("aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_gradle_build)
+def test_gradle_builds_reuse_workspace_and_go_offline(mock_build, _, code):
+    args = BuildJavaArgs(code=str(code), runtime="java21")
+    build_java(args)
+
+    (code / "src/main/java/Handler.java").write_text("class Handler { }")
+    build_java(args)
+
+    first, second = mock_build.call_args_list
+    assert first.kwargs["scratch_dir"] == second.kwargs["scratch_dir"]
+    assert "--daemon" in launcher(first)
+    assert "--offline" not in launcher(first)
+    # The dependencies were resolved by the first build
+    assert "--offline" in launcher(second)
+
+    (code / "build.gradle").write_text("plugins { id 'java'; id 'application' }")
+    build_java(args)
+    assert "--offline" not in launcher(mock_build.call_args)
+
+
+@patch("pulumi_lambda_builders.java.shutil.which", return_value="/usr/bin/gradle")
+@patch("aws_lambda_builders.builder.LambdaBuilder.build")
+def test_failed_offline_build_is_retried_online(mock_build, _, code):
+    args = BuildJavaArgs(code=str(code), runtime="java21")
+    mock_build.side_effect = fake_gradle_build
+    build_java(args)
+
+    def build(**kwargs):
+        if "--offline" in launcher(mock_build.call_args):
+            raise WorkflowFailedError(
+                workflow_name="JavaGradleWorkflow",
+                action_name="GradleBuild",
+                reason="Could not resolve all dependencies",
+            )
+        fake_gradle_build(**kwargs)
+
+    mock_build.side_effect = build
+    (code / "src/main/java/Handler.java").write_text("class Handler { }")
+    asset = build_java(args)
+
+    assert mock_build.call_count == 3
+    assert os.listdir(asset.path) == ["Handler.class"]
+
+
+@patch("pulumi_lambda_builders.java.shutil.which", return_value="/usr/bin/gradle")
+@patch("aws_lambda_builders.builder.LambdaBuilder.build")
+def test_failed_offline_compile_is_not_retried(mock_build, _, code):
+    args = BuildJavaArgs(code=str(code), runtime="java21")
+    mock_build.side_effect = fake_gradle_build
+    build_java(args)
+
+    mock_build.side_effect = WorkflowFailedError(
+        workflow_name="JavaGradleWorkflow",
+        action_name="GradleBuild",
+        reason="Compilation failed; see the compiler error output for details.",
+    )
+    (code / "src/main/java/Handler.java").write_text("class Handler {")
+    with pytest.raises(ValueError, match="Compilation failed"):
+        build_java(args)
+
+    assert mock_build.call_count == 2
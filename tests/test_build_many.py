@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+from unittest.mock import patch
+
+import pulumi
+import pytest
+
+from pulumi_lambda_builders.build_many import (
+    BuildFunctionArgs,
+    BuildMany,
+    BuildManyArgs,
+    build_many,
+    prepare_many,
+)
+from pulumi_lambda_builders.build_python import BuildPythonArgs
+from pulumi_lambda_builders.tracing import TRACE_FILE_ENV, flush
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+from tests.test_build import Mocks
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+
+
+def python_function(root, name: str, requirements: str) -> BuildFunctionArgs:
+    code = root / name
+    os.makedirs(code)
+    (code / "main.py").write_text(f"NAME = {name!r}\n")
+    (code / "requirements.txt").write_text(requirements)
+    return BuildFunctionArgs(
+        python=BuildPythonArgs(code=str(code), runtime="python3.12")
+    )
+
+
+def fake_pip_build(installs):
+    def build(**kwargs):
+        dependencies_dir = kwargs["dependencies_dir"]
+        if kwargs["download_dependencies"] and dependencies_dir:
+            installs.append(kwargs["manifest_path"])
+            os.makedirs(dependencies_dir, exist_ok=True)
+            with open(os.path.join(dependencies_dir, "dep.py"), "w") as f:
+                f.write("installed")
+        shutil.copytree(
+            kwargs["source_dir"], kwargs["artifacts_dir"], dirs_exist_ok=True
+        )
+        if dependencies_dir and kwargs["combine_dependencies"]:
+            shutil.copytree(
+                dependencies_dir, kwargs["artifacts_dir"], dirs_exist_ok=True
+            )
+
+    return build
+
+
+def test_functions_with_the_same_requirements_install_once(tmp_path):
+    args = BuildManyArgs(
+        functions={
+            "get": python_function(tmp_path, "get", "requests==2.32.3\n"),
+            "put": python_function(tmp_path, "put", "requests==2.32.3\n"),
+            "worker": python_function(tmp_path, "worker", "boto3==1.35.0\n"),
+        }
+    )
+    installs = []
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_pip_build(installs),
+    ):
+        groups = prepare_many(args).dependency_groups()
+        assets = build_many(args)
+
+    assert sorted(groups.values()) == [["get", "put"], ["worker"]]
+    assert len(installs) == 2
+    assert sorted(assets) == ["get", "put", "worker"]
+    for name, asset in assets.items():
+        assert sorted(os.listdir(asset.path)) == [
+            "dep.py",
+            "main.py",
+            "requirements.txt",
+        ]
+        with open(os.path.join(asset.path, "main.py")) as f:
+            assert name in f.read()
+
+
+def test_batches_write_the_trace_file_once(tmp_path, monkeypatch):
+    trace_file = tmp_path / "trace.json"
+    monkeypatch.setenv(TRACE_FILE_ENV, str(trace_file))
+    args = BuildManyArgs(
+        functions={
+            "get": python_function(tmp_path, "get", "requests==2.32.3\n"),
+            "put": python_function(tmp_path, "put", "boto3==1.35.0\n"),
+        }
+    )
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_pip_build([]),
+    ), patch("pulumi_lambda_builders.build_many.flush", wraps=flush) as mock_flush:
+        build_many(args)
+
+    assert mock_flush.call_count == 1
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    assert any(e["name"] == "build" for e in events)
+
+
+def test_every_function_needs_exactly_one_language(tmp_path):
+    function = python_function(tmp_path, "get", "")
+    with pytest.raises(pulumi.InputPropertiesError):
+        build_many(BuildManyArgs(functions={}))
+    with pytest.raises(pulumi.InputPropertiesError):
+        build_many(
+            BuildManyArgs(
+                functions={"get": BuildFunctionArgs(python=None, nodejs=None)}
+            )
+        )
+    with pytest.raises(pulumi.InputPropertiesError):
+        build_many(
+            BuildManyArgs(
+                functions={
+                    "get": BuildFunctionArgs(
+                        python=function["python"], nodejs={"entry": "index.ts"}
+                    )
+                }
+            )
+        )
+
+
+@pulumi.runtime.test
+def test_component_outputs_an_asset_per_function(tmp_path):
+    pulumi.runtime.set_mocks(Mocks(), preview=False)
+    args = BuildManyArgs(
+        functions={
+            "get": python_function(tmp_path, "get", "requests==2.32.3\n"),
+            "put": python_function(tmp_path, "put", "requests==2.32.3\n"),
+        }
+    )
+    installs = []
+    mock = patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_pip_build(installs),
+    )
+    mock.start()
+    component = BuildMany("functions", args)
+
+    def check(outputs):
+        mock.stop()
+        assets, groups, timings = outputs
+        assert sorted(assets) == ["get", "put"]
+        assert list(groups.values()) == [["get", "put"]]
+        assert len(installs) == 1
+        assert timings["build"] > 0
+
+    return pulumi.Output.all(
+        component.assets, component.dependency_groups, component.timings
+    ).apply(check)
@@ -1,3 +1,5 @@
+import json
+import time
 from typing import Optional
 import pytest
 from unittest.mock import patch, ANY
@@ -5,12 +7,30 @@ from unittest.mock import patch, ANY
 import pulumi
 from pyfakefs.fake_filesystem_unittest import TestCase
 import os
-from pulumi_lambda_builders.build_nodejs import build_nodejs, BuildNodejsArgs
+from pulumi_lambda_builders.fingerprint import hash_tree
+from pulumi_lambda_builders.build_nodejs import (
+    build_nodejs,
+    build_nodejs_bundle,
+    prepare_nodejs,
+    BuildNodejsArgs,
+    BuildNodejsBundleArgs,
+    check_bundle_size,
+)
+from pulumi_lambda_builders.discovery import reset_manifest_index
+from pulumi_lambda_builders.npm import can_cache_node_modules
+from pulumi_lambda_builders.remote_cache import REMOTE_CACHE_ENV
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
 from tests.utils import assert_input_properties_error
 
 TEST_DATA_FOLDER = os.path.join(os.path.dirname(__file__), "testdata/simple-nodejs")
 
 
+@pytest.fixture(autouse=True)
+def manifest_index():
+    # The fake file systems of the tests below differ under the same paths
+    reset_manifest_index()
+
+
 def get_build_args(
     entry: str,
     runtime: str,
@@ -46,6 +66,287 @@ def test_esbuild():
     assert "index.js" in files
 
 
+def fake_esbuild(**kwargs):
+    """Writes the bundle and a metafile listing the entry and its imports"""
+    options = kwargs["options"]
+    inputs = {entry: {} for entry in options["entry_points"]}
+    inputs["lib/shared.ts"] = {}
+    with open(options["metafile"], "w") as f:
+        json.dump({"inputs": inputs, "outputs": {}}, f)
+    with open(os.path.join(kwargs["artifacts_dir"], "index.js"), "w") as f:
+        f.write("bundle")
+
+
+def test_rebuilds_only_when_metafile_inputs_change(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    project = tmp_path / "project"
+    for name in ["app/index.ts", "lib/shared.ts", "other/unrelated.ts"]:
+        os.makedirs(project / os.path.dirname(name), exist_ok=True)
+        (project / name).write_text(name)
+    (project / "package.json").write_text("{}")
+    os.makedirs(project / "node_modules")
+    past = time.time() - 60
+    for root, _, files in os.walk(project):
+        for name in files:
+            os.utime(os.path.join(root, name), (past, past))
+
+    args = get_build_args(
+        entry=str(project / "app/index.ts"),
+        runtime="nodejs18.x",
+        lock_path=str(project / "package.json"),
+    )
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_esbuild
+    ) as mock_build, patch(
+        "pulumi_lambda_builders.build_nodejs.hash_tree", side_effect=hash_tree
+    ) as mock_hash_tree:
+        first = prepare_nodejs(dict(args))
+        first.run()
+        assert mock_build.call_count == 1
+        mock_hash_tree.reset_mock()
+
+        # A file the bundle does not import changed
+        (project / "other/unrelated.ts").write_text("changed")
+        unrelated = prepare_nodejs(dict(args))
+        assert unrelated.key == first.key
+        mock_hash_tree.assert_not_called()
+        unrelated.run()
+        assert mock_build.call_count == 1
+
+        # A file the bundle imports changed
+        (project / "lib/shared.ts").write_text("changed")
+        imported = prepare_nodejs(dict(args))
+        assert imported.key != first.key
+        imported.run()
+        assert mock_build.call_count == 2
+
+
+def fake_esbuild_bundle(**kwargs):
+    """Writes one output per entry, all importing a shared chunk"""
+    options = kwargs["options"]
+    outdir = os.path.relpath(kwargs["artifacts_dir"], kwargs["source_dir"])
+    os.makedirs(kwargs["artifacts_dir"])
+    chunk = os.path.join(outdir, "chunk-shared.mjs")
+    outputs = {chunk: {"imports": []}}
+    for entry in options["entry_points"]:
+        name = os.path.splitext(os.path.basename(entry))[0]
+        output = os.path.join(outdir, f"{name}.mjs")
+        outputs[output] = {
+            "entryPoint": entry,
+            "imports": [
+                {"path": chunk, "kind": "import-statement"},
+                {
+                    "path": "@aws-sdk/client-s3",
+                    "kind": "import-statement",
+                    "external": True,
+                },
+            ],
+        }
+    for output in outputs:
+        with open(os.path.join(kwargs["source_dir"], output), "w") as f:
+            f.write(output)
+    with open(options["metafile"], "w") as f:
+        json.dump({"inputs": {}, "outputs": outputs}, f)
+
+
+def test_bundle_builds_every_entry_in_one_run(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    project = tmp_path / "project"
+    os.makedirs(project / "handlers")
+    os.makedirs(project / "node_modules")
+    (project / "package.json").write_text("{}")
+    for name in ["get", "put"]:
+        (project / f"handlers/{name}.ts").write_text(name)
+
+    args = BuildNodejsBundleArgs(
+        entries={
+            "get": str(project / "handlers/get.ts"),
+            "put": str(project / "handlers/put.ts"),
+        },
+        runtime="nodejs18.x",
+        package_json_path=str(project / "package.json"),
+        format="esm",
+        splitting=True,
+    )
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_esbuild_bundle,
+    ) as mock_build:
+        assets = build_nodejs_bundle(args)
+
+        mock_build.assert_called_once()
+        options = mock_build.call_args.kwargs["options"]
+        assert options["entry_points"] == ["handlers/get.ts", "handlers/put.ts"]
+        assert options["splitting"] is True
+        assert sorted(assets) == ["get", "put"]
+        assert sorted(os.listdir(assets["get"].path)) == ["chunk-shared.mjs", "get.mjs"]
+        assert sorted(os.listdir(assets["put"].path)) == ["chunk-shared.mjs", "put.mjs"]
+
+        zipped = build_nodejs_bundle({**args, "zip_archive": True})
+        mock_build.assert_called_once()
+        assert zipped["get"].path.endswith("get.zip")
+
+
+def test_bundle_splitting_requires_esm(tmp_path):
+    (tmp_path / "index.ts").write_text("")
+    args = BuildNodejsBundleArgs(
+        entries={"index": str(tmp_path / "index.ts")},
+        runtime="nodejs18.x",
+        splitting=True,
+    )
+    with pytest.raises(pulumi.InputPropertiesError) as exc_info:
+        build_nodejs_bundle(args)
+    assert_input_properties_error(
+        exc_info, "splitting", "Code splitting is only supported with the 'esm' format"
+    )
+
+
+def fake_esbuild_with_sizes(**kwargs):
+    """Writes a bundle whose metafile attributes bytes to packages"""
+    outdir = os.path.relpath(kwargs["artifacts_dir"], kwargs["source_dir"])
+    output = {
+        "bytes": 1600,
+        "inputs": {
+            "index.ts": {"bytesInOutput": 100},
+            "node_modules/lodash/lodash.js": {"bytesInOutput": 1000},
+            "node_modules/@middy/core/index.js": {"bytesInOutput": 300},
+            "node_modules/@middy/core/node_modules/ms/index.js": {"bytesInOutput": 200},
+        },
+    }
+    with open(kwargs["options"]["metafile"], "w") as f:
+        json.dump(
+            {
+                "inputs": {},
+                "outputs": {
+                    os.path.join(outdir, "index.js"): output,
+                    os.path.join(outdir, "index.js.map"): {"bytes": 5000},
+                },
+            },
+            f,
+        )
+    with open(os.path.join(kwargs["artifacts_dir"], "index.js"), "w") as f:
+        f.write("bundle")
+
+
+def test_bundle_size_report_and_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    os.makedirs(tmp_path / "node_modules")
+    (tmp_path / "package.json").write_text("{}")
+    (tmp_path / "index.ts").write_text("")
+    args = get_build_args(
+        entry=str(tmp_path / "index.ts"),
+        runtime="nodejs18.x",
+        lock_path=str(tmp_path / "package.json"),
+    )
+    report_path = tmp_path / "reports/bundle.json"
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_esbuild_with_sizes,
+    ) as mock_build:
+        build_nodejs(
+            BuildNodejsArgs(
+                **args, max_bundle_size=2000, bundle_report_path=str(report_path)
+            )
+        )
+        # A cached build is checked against the budget as well
+        with pytest.raises(ValueError, match="exceeds max_bundle_size of 1500 bytes"):
+            build_nodejs(BuildNodejsArgs(**args, max_bundle_size=1500))
+        assert mock_build.call_count == 1
+
+    with open(report_path) as f:
+        report = json.load(f)
+    assert report["bundle_size"] == 1600
+    assert report["outputs"] == {"index.js": 1600}
+    assert list(report["packages"].items()) == [
+        ("lodash", 1000),
+        ("@middy/core", 300),
+        ("ms", 200),
+        (".", 100),
+    ]
+
+
+def test_bundle_size_report_is_shared_with_the_entry(tmp_path, monkeypatch):
+    monkeypatch.setenv(REMOTE_CACHE_ENV, str(tmp_path / "shared"))
+    project = tmp_path / "project"
+    os.makedirs(project / "node_modules")
+    (project / "package.json").write_text("{}")
+    (project / "index.ts").write_text("")
+    args = get_build_args(
+        entry=str(project / "index.ts"),
+        runtime="nodejs18.x",
+        lock_path=str(project / "package.json"),
+    )
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_esbuild_with_sizes,
+    ) as mock_build:
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "runner1"))
+        build_nodejs(args)
+        # Another machine fetches the entry and its size report
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "runner2"))
+        key = prepare_nodejs(args).key
+        with pytest.raises(ValueError, match="No build artifact found"):
+            check_bundle_size(args, "missing")
+        build_nodejs(BuildNodejsArgs(**args, max_bundle_size=2000))
+        assert mock_build.call_count == 1
+
+    assert check_bundle_size(args, key)["packages"]["lodash"] == 1000
+
+
+def fake_npm_ci(cwd):
+    os.makedirs(os.path.join(cwd, "node_modules/left-pad"))
+    with open(os.path.join(cwd, "node_modules/left-pad/index.js"), "w") as f:
+        f.write("module.exports = {}")
+
+
+def test_node_modules_installed_once_per_lock_file(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    lock = {"lockfileVersion": 3, "packages": {"node_modules/left-pad": {}}}
+    projects = [tmp_path / "stack1", tmp_path / "stack2"]
+    for project in projects:
+        os.makedirs(project / "app")
+        (project / "app/index.ts").write_text(f"export const name = '{project.name}'")
+        (project / "package.json").write_text("{}")
+        (project / "package-lock.json").write_text(json.dumps(lock))
+
+    with patch(
+        "pulumi_lambda_builders.npm.npm_ci", side_effect=fake_npm_ci
+    ) as mock_npm_ci, patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_esbuild
+    ) as mock_build:
+        for project in projects:
+            build_nodejs(
+                get_build_args(
+                    entry=str(project / "app/index.ts"),
+                    runtime="nodejs18.x",
+                    lock_path=str(project / "package.json"),
+                )
+            )
+            mock_build.assert_called_with(
+                **build_nodejs_call_args(
+                    download_dependencies=False,
+                    dependencies_dir=str(project / "node_modules"),
+                )
+            )
+
+    mock_npm_ci.assert_called_once()
+    # Patching a dependency in one project leaves the cache and the others alone
+    (projects[0] / "node_modules/left-pad/index.js").write_text("patched")
+    assert (
+        projects[1] / "node_modules/left-pad/index.js"
+    ).read_text() == "module.exports = {}"
+
+
+def test_linked_packages_are_not_cached(tmp_path):
+    lock = {
+        "packages": {"node_modules/shared": {"resolved": "../shared", "link": True}}
+    }
+    (tmp_path / "package-lock.json").write_text(json.dumps(lock))
+    assert not can_cache_node_modules(str(tmp_path / "package-lock.json"))
+
+
 def build_nodejs_call_args(
     source_dir=ANY,
     runtime=ANY,
@@ -187,6 +488,7 @@ class TestBuildNodejs(TestCase):
                         "minify": True,
                         "format": "cjs",
                         "target": "node18",
+                        "metafile": ANY,
                     },
                 )
             )
@@ -215,6 +517,7 @@ class TestBuildNodejs(TestCase):
                         "minify": True,
                         "format": "cjs",
                         "target": "node18",
+                        "metafile": ANY,
                     },
                 )
             )
@@ -243,6 +546,7 @@ class TestBuildNodejs(TestCase):
                         "minify": True,
                         "format": "cjs",
                         "target": "node18",
+                        "metafile": ANY,
                     },
                 )
             )
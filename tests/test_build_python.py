@@ -4,14 +4,30 @@ import pulumi
 from pyfakefs.fake_filesystem_unittest import TestCase
 import pytest
 import os
+import shutil
+import subprocess
+import sys
 
-from pulumi_lambda_builders.build_python import build_python, BuildPythonArgs
+from pulumi_lambda_builders.build_python import (
+    build_python,
+    prepare_python,
+    BuildPythonArgs,
+)
+from pulumi_lambda_builders.discovery import reset_manifest_index
+from pulumi_lambda_builders.slim import slim_dependencies
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
 from tests.utils import assert_input_properties_error
 
-
 TEST_DATA_FOLDER = os.path.join(os.path.dirname(__file__), "testdata/simple-python")
 
 
+
+@pytest.fixture(autouse=True)
+def manifest_index():
+    # The fake file systems of the tests below differ under the same paths
+    reset_manifest_index()
+
+
 def get_build_args(
     code: str, runtime: str, lock_path: Optional[str] = None, arch: Optional[str] = None
 ) -> BuildPythonArgs:
@@ -28,6 +44,9 @@ def build_python_call_args(
     runtime=ANY,
     manifest_path=ANY,
     architecture=ANY,
+    download_dependencies=ANY,
+    dependencies_dir=ANY,
+    combine_dependencies=True,
 ):
     return {
         "source_dir": source_dir,
@@ -36,6 +55,9 @@ def build_python_call_args(
         "scratch_dir": ANY,
         "manifest_path": manifest_path,
         "architecture": architecture,
+        "download_dependencies": download_dependencies,
+        "dependencies_dir": dependencies_dir,
+        "combine_dependencies": combine_dependencies,
     }
 
 
@@ -146,3 +168,302 @@ class TestBuildPython(TestCase):
                     manifest_path="/fake_dir/project/app/requirements.txt",
                 )
             )
+
+    def test_build_python_reuses_installed_requirements(self):
+        self.fs.create_file("/fake_dir/project/requirements.txt", contents="numpy")
+        self.fs.create_file("/fake_dir/project/app/main.py", contents="test")
+        args = get_build_args(
+            code="/fake_dir/project/app",
+            runtime="python3.8",
+        )
+
+        with patch("aws_lambda_builders.builder.LambdaBuilder.build") as mock_build:
+            build_python(args)
+            mock_build.assert_called_with(
+                **build_python_call_args(download_dependencies=True)
+            )
+            dependencies_dir = mock_build.call_args.kwargs["dependencies_dir"]
+
+            # Only the handler code changed, so pip does not run again
+            with open("/fake_dir/project/app/main.py", "w") as f:
+                f.write("changed")
+            build_python(args)
+            assert mock_build.call_count == 2
+            mock_build.assert_called_with(
+                **build_python_call_args(download_dependencies=False)
+            )
+            cached_dir = mock_build.call_args.kwargs["dependencies_dir"]
+            assert os.path.basename(cached_dir) == os.path.basename(dependencies_dir)
+            assert os.path.isdir(cached_dir)
+
+    def test_build_python_dependencies_layer(self):
+        self.fs.create_file("/fake_dir/project/requirements.txt", contents="numpy")
+        self.fs.create_file("/fake_dir/project/app/main.py", contents="test")
+        args = get_build_args(
+            code="/fake_dir/project/app",
+            runtime="python3.8",
+        )
+        args["dependencies_layer"] = True
+
+        def fake_build(**kwargs):
+            if kwargs["dependencies_dir"]:
+                self.fs.create_file(
+                    os.path.join(kwargs["dependencies_dir"], "numpy/__init__.py")
+                )
+            self.fs.create_file(os.path.join(kwargs["artifacts_dir"], "main.py"))
+
+        with patch(
+            "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+        ) as mock_build:
+            build = prepare_python(args)
+            assert build.layer is not None
+            code = build.run()
+            layer = build.layer.run()
+
+            assert os.listdir(code.path) == ["main.py"]
+            assert os.listdir(layer.path) == ["python"]
+            assert os.listdir(os.path.join(layer.path, "python")) == ["numpy"]
+            mock_build.assert_any_call(
+                **build_python_call_args(
+                    download_dependencies=False,
+                    dependencies_dir=None,
+                    combine_dependencies=False,
+                )
+            )
+            mock_build.assert_any_call(
+                **build_python_call_args(
+                    download_dependencies=True, combine_dependencies=False
+                )
+            )
+
+            # Only a change to requirements.txt changes the layer
+            with open("/fake_dir/project/app/main.py", "w") as f:
+                f.write("changed")
+            changed_code = prepare_python(args)
+            assert changed_code.key != build.key
+            assert changed_code.layer.key == build.layer.key
+
+            with open("/fake_dir/project/requirements.txt", "w") as f:
+                f.write("numpy\npandas")
+            assert prepare_python(args).layer.key != build.layer.key
+
+    def test_build_python_dependencies_layer_without_requirements(self):
+        self.fs.create_file("/fake_dir/project/app/main.py", contents="test")
+        args = get_build_args(
+            code="/fake_dir/project/app",
+            runtime="python3.8",
+        )
+        args["dependencies_layer"] = True
+
+        assert prepare_python(args).layer is None
+
+
+@pytest.mark.skipif(not shutil.which("python3.12"), reason="python3.12 is not installed")
+def test_compile_bytecode_strips_sources(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    code = tmp_path / "project/app"
+    os.makedirs(code)
+    (tmp_path / "project/requirements.txt").write_text("legacy")
+    (code / "main.py").write_text("def handler(event, context):\n    return 1\n")
+
+    def fake_build(**kwargs):
+        artifacts_dir = kwargs["artifacts_dir"]
+        shutil.copy(code / "main.py", os.path.join(artifacts_dir, "main.py"))
+        os.makedirs(os.path.join(artifacts_dir, "legacy"), exist_ok=True)
+        with open(os.path.join(artifacts_dir, "legacy/__init__.py"), "w") as f:
+            f.write("print 'python 2'\n")
+
+    args = get_build_args(code=str(code), runtime="python3.12", arch="x86_64")
+    args["compile_bytecode"] = True
+    args["strip_sources"] = True
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ):
+        asset = build_python(args)
+
+    assert sorted(os.listdir(asset.path)) == ["legacy", "main.pyc"]
+    # Files that do not compile keep their source
+    assert os.listdir(os.path.join(asset.path, "legacy")) == ["__init__.py"]
+    result = subprocess.run(
+        ["python3.12", "-c", "import main; print(main.handler(None, None))"],
+        cwd=asset.path,
+        capture_output=True,
+        text=True,
+    )
+    assert result.stdout.strip() == "1"
+
+
+def test_strip_sources_requires_compile_bytecode():
+    args = get_build_args(code=TEST_DATA_FOLDER, runtime="python3.12", arch="x86_64")
+    args["strip_sources"] = True
+    with pytest.raises(pulumi.InputPropertiesError) as exc_info:
+        build_python(args)
+    assert_input_properties_error(
+        exc_info, "strip_sources", "Stripping sources requires compile_bytecode"
+    )
+
+
+def test_slim_dependencies(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    code = tmp_path / "project/app"
+    os.makedirs(code)
+    (tmp_path / "project/requirements.txt").write_text("boto3\nrequests")
+    (code / "main.py").write_text("test")
+    os.makedirs(code / "tests")
+    (code / "tests/test_main.py").write_text("test")
+
+    def write(path, contents="x" * 100):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+
+    def fake_build(**kwargs):
+        deps = kwargs["dependencies_dir"]
+        if kwargs["download_dependencies"]:
+            write(os.path.join(deps, "boto3/__init__.py"))
+            write(
+                os.path.join(deps, "boto3-1.34.0.dist-info/RECORD"),
+                "boto3/__init__.py,,\nboto3-1.34.0.dist-info/RECORD,,\n",
+            )
+            write(os.path.join(deps, "requests/__init__.py"))
+            write(os.path.join(deps, "requests/tests/test_api.py"))
+            write(os.path.join(deps, "requests/__pycache__/api.cpython-312.pyc"))
+            write(os.path.join(deps, "requests/_speedups.so"))
+            write(os.path.join(deps, "requests-2.31.0.dist-info/METADATA"))
+            write(os.path.join(deps, "requests-2.31.0.dist-info/RECORD"))
+        artifacts_dir = kwargs["artifacts_dir"]
+        shutil.copytree(code, artifacts_dir, dirs_exist_ok=True)
+        if kwargs["combine_dependencies"] and deps:
+            shutil.copytree(deps, artifacts_dir, dirs_exist_ok=True)
+
+    args = get_build_args(code=str(code), runtime="python3.12", arch="x86_64")
+    args["slim_dependencies"] = True
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ) as mock_build:
+        asset = build_python(args)
+        mock_build.assert_called_with(
+            **build_python_call_args(download_dependencies=False)
+        )
+
+    files = sorted(
+        os.path.relpath(os.path.join(root, name), asset.path)
+        for root, _, names in os.walk(asset.path)
+        for name in names
+    )
+    # The code keeps its tests, only the requirements are slimmed
+    assert files == [
+        "main.py",
+        "requests-2.31.0.dist-info/METADATA",
+        "requests/__init__.py",
+        "requests/_speedups.so",
+        "tests/test_main.py",
+    ]
+
+
+def test_slim_options_change_the_artifact(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    code = tmp_path / "project"
+    os.makedirs(code)
+    (code / "requirements.txt").write_text("requests")
+    (code / "main.py").write_text("test")
+
+    def fake_build(**kwargs):
+        deps = kwargs["dependencies_dir"]
+        if kwargs["download_dependencies"]:
+            for path in ["requests/__init__.py", "requests/tests/test_api.py"]:
+                os.makedirs(os.path.dirname(os.path.join(deps, path)), exist_ok=True)
+                with open(os.path.join(deps, path), "w") as f:
+                    f.write("x")
+            os.makedirs(os.path.join(deps, "requests-2.31.0.dist-info"))
+            with open(os.path.join(deps, "requests-2.31.0.dist-info/RECORD"), "w") as f:
+                f.write("requests/__init__.py,,\nrequests/tests/test_api.py,,\n")
+        shutil.copytree(code, kwargs["artifacts_dir"], dirs_exist_ok=True)
+        if kwargs["combine_dependencies"] and deps:
+            shutil.copytree(deps, kwargs["artifacts_dir"], dirs_exist_ok=True)
+
+    def build(**options):
+        args = get_build_args(code=str(code), runtime="python3.12", arch="x86_64")
+        asset = build_python(BuildPythonArgs(**args, **options))
+        return sorted(
+            os.path.relpath(os.path.join(root, name), asset.path)
+            for root, _, names in os.walk(asset.path)
+            for name in names
+        )
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ):
+        assert "requests/tests/test_api.py" in build()
+        slimmed = build(slim_dependencies=True)
+        provided = build(slim_dependencies=True, provided_packages=["requests"])
+
+    assert "requests/tests/test_api.py" not in slimmed
+    assert "requests/__init__.py" in slimmed
+    assert "requests/__init__.py" not in provided
+
+
+def test_slim_dependencies_keeps_imported_test_and_doc_packages(tmp_path):
+    files = {
+        "fakecore/__init__.py": "",
+        "fakecore/client.py": "from fakecore.docs.docstring import DOC\n"
+        "from .tests import fixtures\n",
+        "fakecore/docs/__init__.py": "",
+        "fakecore/docs/docstring.py": "from ..doc import TEMPLATE\nDOC = 'doc'\n",
+        "fakecore/doc/__init__.py": "TEMPLATE = 'template'\n",
+        # A namespace package
+        "fakecore/tests/fixtures.py": "FIXTURE = 'fixture'\n",
+        "fakecore/test/__init__.py": "",
+        "fakecore/test/test_client.py": "import fakecore.client\n",
+        "fakecore/extras/docs/index.rst": "Documentation\n",
+    }
+    for path, contents in files.items():
+        os.makedirs(os.path.dirname(tmp_path / path), exist_ok=True)
+        (tmp_path / path).write_text(contents)
+    os.makedirs(tmp_path / "fakecore-1.0.dist-info")
+    # Like a real wheel, the RECORD lists every file
+    (tmp_path / "fakecore-1.0.dist-info/RECORD").write_text(
+        "".join(f"{path},,\n" for path in files)
+    )
+
+    slim_dependencies(str(tmp_path), [])
+
+    assert not os.path.exists(tmp_path / "fakecore/test")
+    assert not os.path.exists(tmp_path / "fakecore/extras/docs")
+    result = subprocess.run(
+        [sys.executable, "-c", "import fakecore.client"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_pip_cache_is_only_set_for_the_install(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.delenv("PIP_CACHE_DIR", raising=False)
+    code = tmp_path / "project"
+    os.makedirs(code)
+    (code / "requirements.txt").write_text("requests")
+    (code / "main.py").write_text("test")
+    environments = []
+
+    def fake_build(**kwargs):
+        # pip runs in a subprocess started with a copy of os.environ
+        result = subprocess.run(
+            [sys.executable, "-c", "import os; print(os.environ.get('PIP_CACHE_DIR'))"],
+            env=dict(os.environ),
+            capture_output=True,
+            text=True,
+        )
+        environments.append((kwargs["download_dependencies"], result.stdout.strip()))
+        shutil.copytree(code, kwargs["artifacts_dir"], dirs_exist_ok=True)
+
+    args = get_build_args(code=str(code), runtime="python3.12", arch="x86_64")
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ):
+        build_python(args)
+
+    assert environments == [(True, str(tmp_path / "cache" / "pip"))]
+    assert "PIP_CACHE_DIR" not in os.environ
@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from pulumi_lambda_builders.build_rust import BuildRustArgs, build_rust
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.delenv("CARGO_TARGET_DIR", raising=False)
+    monkeypatch.delenv("RUSTC_WRAPPER", raising=False)
+    monkeypatch.delenv("SCCACHE_DIR", raising=False)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "workspace"
+    os.makedirs(root)
+    (root / "Cargo.toml").write_text('[workspace]\nmembers = ["get", "put"]\n')
+    (root / "Cargo.lock").write_text("version = 3\n")
+    for member in ["get", "put"]:
+        os.makedirs(root / member / "src")
+        (root / member / "Cargo.toml").write_text(f'[package]\nname = "{member}"\n')
+        (root / member / "src/main.rs").write_text("fn main() {}")
+    return root
+
+
+@pytest.fixture
+def cargo_lambda(workspace):
+    """Fakes cargo metadata and cargo lambda, and returns the environment of
+    every cargo lambda build"""
+    environments = []
+
+    def run(command, cwd, env, **kwargs):
+        if command[1] == "metadata":
+            name = os.path.basename(cwd)
+            metadata = {
+                "packages": [
+                    {
+                        "manifest_path": os.path.join(cwd, "Cargo.toml"),
+                        "targets": [{"name": name, "kind": ["bin"]}],
+                    }
+                ]
+            }
+            return subprocess.CompletedProcess(command, 0, json.dumps(metadata), "")
+        environments.append(env)
+        binary = os.path.join(
+            env["CARGO_TARGET_DIR"], "lambda", os.path.basename(cwd), "bootstrap"
+        )
+        os.makedirs(os.path.dirname(binary), exist_ok=True)
+        with open(binary, "w") as f:
+            f.write(cwd)
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    with patch(
+        "pulumi_lambda_builders.build_rust.subprocess.run", side_effect=run
+    ), patch(
+        "pulumi_lambda_builders.build_rust.shutil.which",
+        side_effect=lambda name: f"/usr/bin/{name}",
+    ):
+        yield environments
+
+
+def test_members_share_a_target_dir_per_architecture(workspace, cargo_lambda):
+    get = build_rust(BuildRustArgs(code=str(workspace / "get")))
+    put = build_rust(BuildRustArgs(code=str(workspace / "put")))
+    build_rust(BuildRustArgs(code=str(workspace / "get"), architecture="arm64"))
+
+    get_dir, put_dir, get_arm_dir = [env["CARGO_TARGET_DIR"] for env in cargo_lambda]
+    assert get_dir == put_dir
+    assert get_dir != get_arm_dir
+    assert os.path.isdir(get_dir) and os.path.isdir(get_arm_dir)
+    assert "CARGO_TARGET_DIR" not in os.environ
+    with open(os.path.join(get.path, "bootstrap")) as f:
+        assert f.read() == str(workspace / "get")
+    with open(os.path.join(put.path, "bootstrap")) as f:
+        assert f.read() == str(workspace / "put")
+
+
+def test_compiler_cache(workspace, cargo_lambda):
+    build_rust(BuildRustArgs(code=str(workspace / "get"), compiler_cache=True))
+
+    [env] = cargo_lambda
+    assert env["RUSTC_WRAPPER"] == "/usr/bin/sccache"
+    assert env["SCCACHE_DIR"].startswith(os.environ[CACHE_DIR_ENV])
+    assert "RUSTC_WRAPPER" not in os.environ
+
+
+def test_workspace_changes_rebuild_members(workspace, cargo_lambda):
+    args = BuildRustArgs(code=str(workspace / "get"))
+    build_rust(args)
+    build_rust(args)
+    assert len(cargo_lambda) == 1
+
+    (workspace / "Cargo.lock").write_text("version = 4\n")
+    build_rust(args)
+    assert len(cargo_lambda) == 2
+
+    # Output in the target directory does not change the fingerprint
+    os.makedirs(workspace / "target")
+    (workspace / "target/output").write_text("binary")
+    build_rust(args)
+    assert len(cargo_lambda) == 2
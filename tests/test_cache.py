@@ -0,0 +1,254 @@
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from pulumi_lambda_builders.build_go import build_go, BuildGoArgs
+from pulumi_lambda_builders import cache as cache_module
+from pulumi_lambda_builders.cache import CACHE_MAX_SIZE_ENV, BuildCache, entry_record
+from pulumi_lambda_builders.fingerprint import FileIndex, hash_file, hash_tree
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(cache_dir))
+    return cache_dir
+
+
+def write_file(path, contents: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(contents)
+
+
+def test_hash_tree_is_stable(tmp_path):
+    write_file(tmp_path / "src" / "main.go", "package main")
+    write_file(tmp_path / "src" / "go.mod", "module example")
+
+    assert hash_tree(str(tmp_path / "src")) == hash_tree(str(tmp_path / "src"))
+
+
+def test_hash_tree_detects_changes(tmp_path):
+    write_file(tmp_path / "src" / "main.go", "package main")
+    before = hash_tree(str(tmp_path / "src"))
+
+    write_file(tmp_path / "src" / "main.go", "package main\n")
+    assert hash_tree(str(tmp_path / "src")) != before
+
+
+def test_hash_tree_ignores_excluded_dirs(tmp_path):
+    write_file(tmp_path / "src" / "index.js", "export {}")
+    before = hash_tree(str(tmp_path / "src"))
+
+    write_file(tmp_path / "src" / "node_modules" / "dep" / "index.js", "export {}")
+    write_file(tmp_path / "src" / "target" / "out", "binary")
+    assert hash_tree(str(tmp_path / "src"), excludes=("target",)) == before
+
+
+def test_cache_only_builds_once(cache_dir):
+    cache = BuildCache(str(cache_dir))
+    calls = []
+
+    def build(artifacts_dir: str, scratch_dir: str):
+        calls.append(artifacts_dir)
+        write_file(os.path.join(artifacts_dir, "bootstrap"), "binary")
+
+    first = cache.build("key", build)
+    second = cache.build("key", build)
+
+    assert len(calls) == 1
+    assert first == second
+    assert os.listdir(first) == ["bootstrap"]
+
+
+def test_cache_does_not_store_failed_builds(cache_dir):
+    cache = BuildCache(str(cache_dir))
+
+    def build(artifacts_dir: str, scratch_dir: str):
+        raise ValueError("Failed to build code")
+
+    with pytest.raises(ValueError):
+        cache.build("key", build)
+    assert cache.lookup("key") is None
+
+
+def test_build_go_uses_cache(tmp_path):
+    write_file(tmp_path / "src" / "main.go", "package main")
+    args = BuildGoArgs(code=str(tmp_path / "src"), architecture="arm64")
+
+    with patch("aws_lambda_builders.builder.LambdaBuilder.build") as mock_build:
+        first = build_go(args)
+        second = build_go(args)
+        mock_build.assert_called_once()
+        assert first.path == second.path
+
+        write_file(tmp_path / "src" / "main.go", "package main\n")
+        build_go(args)
+        assert mock_build.call_count == 2
+
+
+def test_build_go_zip_archive(tmp_path):
+    write_file(tmp_path / "src" / "main.go", "package main")
+    args = BuildGoArgs(code=str(tmp_path / "src"), zip_archive=True)
+
+    def fake_build(**kwargs):
+        write_file(os.path.join(kwargs["artifacts_dir"], "bootstrap"), "binary")
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build", side_effect=fake_build
+    ):
+        first = build_go(args)
+        second = build_go(args)
+
+    assert first.path.endswith(".zip")
+    assert first.path == second.path
+
+
+def age_files(root, seconds=60):
+    # Files modified within the last couple of seconds are never trusted by the
+    # index, so move the mtimes of the test files into the past
+    past = time.time() - seconds
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (past, past))
+
+
+def test_hash_tree_only_rehashes_changed_files(tmp_path):
+    for i in range(5):
+        write_file(tmp_path / "src" / f"pkg{i}" / "mod.py", f"x = {i}")
+    age_files(tmp_path / "src")
+    first = hash_tree(str(tmp_path / "src"))
+
+    with patch(
+        "pulumi_lambda_builders.fingerprint.hash_file", side_effect=hash_file
+    ) as mock_hash:
+        assert hash_tree(str(tmp_path / "src")) == first
+        mock_hash.assert_not_called()
+
+        write_file(tmp_path / "src" / "pkg3" / "mod.py", "x = 33")
+        age_files(tmp_path / "src" / "pkg3", seconds=30)
+        changed = hash_tree(str(tmp_path / "src"))
+        assert changed != first
+        assert [c.args[0] for c in mock_hash.call_args_list] == [
+            str(tmp_path / "src" / "pkg3" / "mod.py")
+        ]
+
+
+def test_hash_tree_index_is_persisted(tmp_path):
+    write_file(tmp_path / "src" / "main.py", "print('hello')")
+    age_files(tmp_path / "src")
+    digest = hash_tree(str(tmp_path / "src"))
+
+    # Drop the in-memory indexes so the next call has to load it from disk
+    FileIndex._loaded.clear()
+    with patch(
+        "pulumi_lambda_builders.fingerprint.hash_file", side_effect=hash_file
+    ) as mock_hash:
+        assert hash_tree(str(tmp_path / "src")) == digest
+        mock_hash.assert_not_called()
+
+
+def test_hash_tree_rehashes_racy_files(tmp_path):
+    write_file(tmp_path / "src" / "main.py", "print('hello')")
+    hash_tree(str(tmp_path / "src"))
+
+    with patch(
+        "pulumi_lambda_builders.fingerprint.hash_file", side_effect=hash_file
+    ) as mock_hash:
+        hash_tree(str(tmp_path / "src"))
+        mock_hash.assert_called_once()
+
+
+def build_entries(cache, keys, size=1000):
+    for i, key in enumerate(keys):
+        cache.build(
+            key,
+            lambda artifacts_dir, _: write_file(
+                os.path.join(artifacts_dir, "bootstrap"), "x" * size
+            ),
+        )
+        # Pretend the entries were used an hour or more ago, oldest first
+        last_used = time.time() - 2 * 60 * 60 + i
+        os.utime(cache.entry_dir(key), (last_used, last_used))
+
+
+def test_evict_removes_least_recently_used_entries(cache_dir, monkeypatch):
+    cache = BuildCache(str(cache_dir))
+    build_entries(cache, ["a", "b", "c", "d"])
+    monkeypatch.setattr(cache_module, "_used", set())
+
+    # Used by a deployment a minute ago
+    recent = time.time() - 60
+    os.utime(cache.entry_dir("a"), (recent, recent))
+
+    assert cache.evict(2500) == ["b", "c"]
+    assert cache.lookup("a") and cache.lookup("d")
+    assert not cache.lookup("b") and not cache.lookup("c")
+
+
+def test_evict_keeps_entries_used_by_this_process(cache_dir):
+    cache = BuildCache(str(cache_dir))
+    build_entries(cache, ["a", "b"])
+
+    assert cache.evict(0) == []
+
+
+def test_size_limit_is_enforced_after_builds(cache_dir, monkeypatch):
+    cache = BuildCache(str(cache_dir))
+    build_entries(cache, ["a", "b"], size=600 * 1024)
+    monkeypatch.setattr(cache_module, "_used", set())
+
+    monkeypatch.setenv(CACHE_MAX_SIZE_ENV, "1")
+    build_entries(cache, ["c"], size=10)
+
+    assert not cache.lookup("a")
+    assert cache.lookup("b") and cache.lookup("c")
+
+
+def test_evict_removes_workspaces_and_records(cache_dir, monkeypatch):
+    monkeypatch.setenv(CACHE_MAX_SIZE_ENV, "1")
+    cache = BuildCache(str(cache_dir))
+    build_entries(cache, ["a", "b"])
+    cache.save_record(entry_record("a", "report"), {"size": 1000})
+    last_used = time.time() - 3 * 60 * 60
+    for name in ["old", "held"]:
+        with cache.workspace(name) as path:
+            write_file(os.path.join(path, "target/output"), "x" * 1000)
+        os.utime(f"{cache.workspace_path(name)}.lock", (last_used, last_used))
+    monkeypatch.setattr(cache_module, "_used", set())
+
+    with cache.workspace("held"):
+        # A build holding the workspace for hours
+        os.utime(f"{cache.workspace_path('held')}.lock", (last_used, last_used))
+        assert cache.evict(2000) == ["workspaces/old", "a"]
+
+    assert not os.path.exists(cache.workspace_path("old"))
+    assert os.path.isfile(os.path.join(cache.workspace_path("held"), "target/output"))
+    assert cache.load_record(entry_record("a", "report")) is None
+    assert cache.lookup("b")
+
+
+def test_collect_garbage_removes_orphans(cache_dir):
+    cache = BuildCache(str(cache_dir))
+    build_entries(cache, ["a"])
+    old = time.time() - 2 * 24 * 60 * 60
+    orphans = [
+        cache_dir / "tmp" / "tmpkilled",
+        cache_dir / "records" / "nodejs" / "x.json.tmp",
+        cache_dir / "entries" / "a" / "tmpabc.zip.tmp",
+    ]
+    write_file(orphans[0] / "artifact" / "bootstrap", "binary")
+    for orphan in orphans[1:]:
+        write_file(orphan, "partial")
+    for orphan in orphans:
+        os.utime(orphan, (old, old))
+    # A build that is still running
+    write_file(cache_dir / "tmp" / "tmprunning" / "artifact" / "bootstrap", "")
+
+    assert cache.collect_garbage() == 3
+    assert not any(os.path.exists(orphan) for orphan in orphans)
+    assert os.path.isdir(cache_dir / "tmp" / "tmprunning")
+    assert cache.lookup("a")
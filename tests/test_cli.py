@@ -0,0 +1,146 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from pulumi_lambda_builders.cli import main
+from pulumi_lambda_builders.scheduler import get_scheduler
+from pulumi_lambda_builders.utils import CACHE_DIR_ENV
+from tests.test_build_many import fake_pip_build
+
+
+@pytest.fixture(autouse=True)
+def project(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.chdir(tmp_path)
+    for name in ["get", "put"]:
+        os.makedirs(tmp_path / name)
+        (tmp_path / name / "main.py").write_text(f"NAME = {name!r}\n")
+        (tmp_path / name / "requirements.txt").write_text("requests==2.32.3\n")
+    return tmp_path
+
+
+def python_function(name: str):
+    return {"python": {"code": name, "runtime": "python3.12"}}
+
+
+def test_builds_every_function_and_warms_the_cache(project, capsys):
+    (project / "functions.json").write_text(
+        json.dumps(
+            {
+                "functions": {
+                    "get": python_function("get"),
+                    "put": python_function("put"),
+                }
+            }
+        )
+    )
+    installs = []
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_pip_build(installs),
+    ):
+        assert main(["build", "functions.json", "--jobs", "2"]) == 0
+        first = capsys.readouterr().out
+        assert get_scheduler().max_workers == 2
+        assert main(["build", "functions.json"]) == 0
+        second = capsys.readouterr().out
+
+    assert len(installs) == 1
+    assert "get: built" in first and "put: built" in first
+    assert "2 built, 0 cached" in first
+    assert "get: cached" in second and "put: cached" in second
+    assert "0 built, 2 cached" in second
+
+
+def test_reads_yaml_build_files(project, capsys):
+    pytest.importorskip("yaml")
+    (project / "functions.yaml").write_text(
+        "functions:\n"
+        "  get:\n"
+        "    python:\n"
+        "      code: get\n"
+        "      runtime: python3.12\n"
+    )
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=fake_pip_build([]),
+    ):
+        assert main(["build", "functions.yaml"]) == 0
+
+    assert "1 built, 0 cached" in capsys.readouterr().out
+
+
+def test_invalid_build_files_fail(project, capsys):
+    (project / "unknown.json").write_text(
+        json.dumps({"functions": {"get": {"pyhton": {"code": "get"}}}})
+    )
+    (project / "get.json").write_text(
+        json.dumps({"functions": {"get": python_function("get")}})
+    )
+    (project / "empty.json").write_text("{}")
+
+    assert main(["build", "unknown.json"]) == 1
+    assert main(["build", "get.json", "get.json"]) == 1
+    assert main(["build", "empty.json"]) == 1
+    assert main(["build", "missing.json"]) == 1
+    err = capsys.readouterr().err
+    assert "Function get is defined more than once" in err
+    assert "must contain a map of functions" in err
+
+
+def test_malformed_builder_args_fail(project, capsys):
+    (project / "missing.json").write_text(
+        json.dumps({"functions": {"get": {"python": {"runtime": "python3.12"}}}})
+    )
+    (project / "string.json").write_text(
+        json.dumps({"functions": {"get": {"python": "oops"}}})
+    )
+
+    assert main(["build", "missing.json"]) == 1
+    assert main(["build", "string.json"]) == 1
+    captured = capsys.readouterr()
+    assert captured.err == "error: Invalid arguments\n" * 2
+    assert "functions.get.python.code: code is required" in captured.out
+    assert "functions.get.python: Must be a map of arguments" in captured.out
+
+
+def test_invalid_builder_args_fail(project, capsys):
+    (project / "api").mkdir()
+    (project / "api" / "index.ts").write_text("")
+    (project / "functions.json").write_text(
+        json.dumps(
+            {
+                "functions": {
+                    "api": {
+                        "nodejs": {
+                            "entry": str(project / "api" / "index.ts"),
+                            "runtime": "nodejs20.x",
+                        }
+                    }
+                }
+            }
+        )
+    )
+
+    assert main(["build", "functions.json"]) == 1
+    err = capsys.readouterr().err
+    assert err.startswith("error: ")
+    assert "Cannot find package.json file" in err
+
+
+def test_build_failures_fail(project, capsys):
+    (project / "functions.json").write_text(
+        json.dumps({"functions": {"get": python_function("get")}})
+    )
+
+    with patch(
+        "aws_lambda_builders.builder.LambdaBuilder.build",
+        side_effect=RuntimeError("pip failed"),
+    ):
+        assert main(["build", "functions.json"]) == 1
+
+    assert "pip failed" in capsys.readouterr().err
@@ -0,0 +1,66 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from pulumi_lambda_builders.discovery import (
+    find_manifest,
+    get_manifest_index,
+    reset_manifest_index,
+)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    for path in [
+        ".git/HEAD",
+        "package.json",
+        "services/api/package.json",
+        "services/api/src/index.ts",
+        "services/api/node_modules/dep/package.json",
+        "services/worker/requirements.txt",
+        "services/worker/app/main.py",
+    ]:
+        os.makedirs(os.path.dirname(repo / path), exist_ok=True)
+        (repo / path).write_text("")
+    monkeypatch.chdir(repo / "services")
+    reset_manifest_index()
+    yield repo
+    reset_manifest_index()
+
+
+def test_finds_the_nearest_manifest(repo):
+    assert find_manifest("package.json", str(repo / "services/api/src")) == str(
+        repo / "services/api/package.json"
+    )
+    assert find_manifest("package.json", str(repo / "services/worker")) == str(
+        repo / "package.json"
+    )
+    assert find_manifest("requirements.txt", str(repo / "services/worker/app")) == str(
+        repo / "services/worker/requirements.txt"
+    )
+    assert find_manifest("go.mod", str(repo / "services")) is None
+
+
+def test_scans_the_repository_once(repo):
+    index = get_manifest_index()
+    assert index.root == str(repo)
+
+    with patch("os.path.exists", side_effect=AssertionError("not indexed")):
+        for _ in range(100):
+            find_manifest("package.json", str(repo / "services/api/src"))
+            find_manifest("requirements.txt", str(repo / "services/worker/app"))
+    assert get_manifest_index() is index
+
+
+def test_unscanned_directories_are_checked_on_disk(repo):
+    dep = repo / "services/api/node_modules/dep"
+    assert find_manifest("package.json", str(dep)) == str(dep / "package.json")
+
+    manifests = get_manifest_index().manifests("package.json", str(dep / "lib"))
+    assert list(manifests) == [
+        str(dep / "package.json"),
+        str(repo / "services/api/package.json"),
+        str(repo / "package.json"),
+    ]
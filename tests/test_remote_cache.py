@@ -0,0 +1,114 @@
+import os
+import socket
+import stat
+
+import pytest
+
+from pulumi_lambda_builders.cache import BuildCache
+from pulumi_lambda_builders.remote_cache import (
+    REMOTE_CACHE_ENV,
+    REMOTE_CACHE_READ_ONLY_ENV,
+    CacheServer,
+    RemoteCache,
+)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = CacheServer(str(tmp_path / "server"))
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def build(calls):
+    def build(artifacts_dir: str, scratch_dir: str):
+        calls.append(artifacts_dir)
+        bootstrap = os.path.join(artifacts_dir, "bootstrap")
+        with open(bootstrap, "w") as f:
+            f.write("binary")
+        os.chmod(bootstrap, 0o755)
+        os.symlink("bootstrap", os.path.join(artifacts_dir, "handler"))
+
+    return build
+
+
+def assert_shared(tmp_path):
+    """Builds on one machine and checks that another one reuses the build"""
+    calls = []
+    first = BuildCache(str(tmp_path / "runner1")).build("key", build(calls))
+    second = BuildCache(str(tmp_path / "runner2")).build("key", build(calls))
+
+    assert calls == [calls[0]]
+    assert first != second
+    assert sorted(os.listdir(second)) == ["bootstrap", "handler"]
+    assert os.stat(os.path.join(second, "bootstrap")).st_mode & stat.S_IXUSR
+    assert os.readlink(os.path.join(second, "handler")) == "bootstrap"
+
+
+def test_directory_remote_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(REMOTE_CACHE_ENV, str(tmp_path / "shared"))
+    assert_shared(tmp_path)
+
+
+def test_http_remote_cache(tmp_path, monkeypatch, server):
+    monkeypatch.setenv(REMOTE_CACHE_ENV, f"{server.url}/cache")
+    assert_shared(tmp_path)
+    assert os.listdir(tmp_path / "server" / "cache" / "entries") == ["key.tar.gz"]
+
+
+def test_s3_remote_cache(tmp_path, monkeypatch, server):
+    pytest.importorskip("boto3")
+    monkeypatch.setenv("AWS_ENDPOINT_URL", server.url)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv(REMOTE_CACHE_ENV, "s3://bucket/prefix")
+    assert_shared(tmp_path)
+    assert os.listdir(tmp_path / "server" / "bucket" / "prefix" / "entries") == [
+        "key.tar.gz"
+    ]
+
+
+def test_read_only_remote_cache_does_not_upload(tmp_path, monkeypatch):
+    monkeypatch.setenv(REMOTE_CACHE_ENV, str(tmp_path / "shared"))
+    monkeypatch.setenv(REMOTE_CACHE_READ_ONLY_ENV, "true")
+    BuildCache(str(tmp_path / "runner1")).build("key", build([]))
+
+    assert not os.path.exists(tmp_path / "shared")
+
+
+def test_unreachable_remote_cache_falls_back_to_building(tmp_path, monkeypatch):
+    monkeypatch.setenv(REMOTE_CACHE_ENV, "http://127.0.0.1:9/cache")
+    calls = []
+    artifact_dir = BuildCache(str(tmp_path / "runner1")).build("key", build(calls))
+
+    assert len(calls) == 1
+    assert os.path.isfile(os.path.join(artifact_dir, "bootstrap"))
+
+
+def test_remote_caches_implement_get_and_put():
+    class GetOnly(RemoteCache):
+        def get(self, name: str, path: str) -> bool:
+            return False
+
+    with pytest.raises(TypeError):
+        GetOnly()  # type: ignore[abstract]
+
+
+def test_server_drops_incomplete_uploads(tmp_path, server):
+    host, port = server.server_address[:2]
+    with socket.create_connection((host, port), timeout=10) as conn:
+        conn.sendall(
+            b"PUT /cache/entries/key.tar.gz HTTP/1.1\r\n"
+            b"Host: localhost\r\n"
+            b"Content-Length: 100\r\n\r\n"
+            b"partial"
+        )
+        # The client goes away before sending the whole body
+        conn.shutdown(socket.SHUT_WR)
+        response = conn.makefile("rb").readline()
+
+    assert response.startswith(b"HTTP/1.1 400")
+    assert os.listdir(tmp_path / "server" / "cache" / "entries") == []
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from pulumi_lambda_builders.scheduler import HEAVY, LIGHT, BuildScheduler
+
+
+def run_concurrently(scheduler: BuildScheduler, weights):
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work(weight):
+        with scheduler.reserve(weight):
+            with lock:
+                running.append(weight)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(weight)
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in weights]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return max(peak)
+
+
+def test_light_builds_share_the_budget():
+    scheduler = BuildScheduler(cpus=2, memory_mb=8192, max_workers=8)
+    assert run_concurrently(scheduler, [LIGHT] * 4) == 4
+
+
+def test_heavy_builds_are_limited_by_cpu():
+    scheduler = BuildScheduler(cpus=4, memory_mb=8192, max_workers=8)
+    assert run_concurrently(scheduler, [HEAVY] * 4) == 2
+
+
+def test_heavy_builds_are_limited_by_memory():
+    scheduler = BuildScheduler(cpus=16, memory_mb=4096, max_workers=8)
+    assert run_concurrently(scheduler, [HEAVY] * 4) == 2
+
+
+def test_build_heavier_than_budget_runs_alone():
+    scheduler = BuildScheduler(cpus=1, memory_mb=1024, max_workers=8)
+    assert run_concurrently(scheduler, [HEAVY] * 3) == 1